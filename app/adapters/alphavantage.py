@@ -1,53 +1,111 @@
-
+import csv
+import io
+import json
 import os
-import time
 from datetime import datetime, timezone
 from typing import List, Dict
 
-import requests
-
+from app.adapters.circuit import CircuitBreaker
+from app.adapters.http_client import get_async_client, get_sync_client
+from app.adapters.ratelimit import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_HISTORY,
+    PRIORITY_QUOTE,
+    PRIORITY_SEARCH,
+    TokenBucketScheduler,
+)
+
+HOST = "alphavantage"
 BASE = "https://www.alphavantage.co/query"
 API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
 
+# Free tier budget: a handful of calls per minute, shared by every caller.
+ALPHAVANTAGE_CALLS_PER_MINUTE = float(os.getenv("ALPHAVANTAGE_CALLS_PER_MINUTE", "5"))
+ALPHAVANTAGE_BURST = float(os.getenv("ALPHAVANTAGE_BURST", "5"))
+
+scheduler = TokenBucketScheduler(
+    HOST,
+    rate=ALPHAVANTAGE_CALLS_PER_MINUTE / 60,
+    burst=ALPHAVANTAGE_BURST,
+    # seconds each class may queue for a token before failing fast
+    max_wait={PRIORITY_QUOTE: 15, PRIORITY_HISTORY: 10, PRIORITY_SEARCH: 1, PRIORITY_BACKGROUND: 0},
+    # tokens lower classes must leave for quotes
+    reserve={PRIORITY_HISTORY: 1, PRIORITY_SEARCH: 2, PRIORITY_BACKGROUND: 2},
+)
+
+breaker = CircuitBreaker(HOST)
+
 
 class AlphaVantageError(Exception):
     pass
 
 
-# ---- Realtime quote (used by /aggregate and stocks UI) ----
-def fetch_quote(symbol: str) -> Dict:
-    """
-    GLOBAL_QUOTE -> returns dict for the symbol, tolerant to slight schema changes.
-    """
+class UnknownSymbol(AlphaVantageError):
+    """Alpha Vantage rejected the symbol itself ("Error Message"), not the call or the budget."""
+
+
+def _require_key():
     if not API_KEY:
         raise AlphaVantageError("Missing ALPHAVANTAGE_API_KEY in environment.")
 
-    params = {
+
+def _check_rate_limit(data: dict):
+    # Alpha Vantage may return "Note" on rate-limit
+    if data.get("Note"):
+        scheduler.drain()  # our budget estimate was off; stop spending calls
+        raise AlphaVantageError("Alpha Vantage rate limit hit. Try again in a minute.")
+
+
+def _get_response(params: dict, priority: int, timeout: float = 15):
+    breaker.check()  # don't spend a token on a call that would be short-circuited
+    scheduler.try_acquire(priority)
+    with breaker.guard():
+        r = get_sync_client(HOST).get(BASE, params=params, timeout=timeout)
+        r.raise_for_status()
+    return r
+
+
+async def _get_async(params: dict, priority: int) -> dict:
+    breaker.check()
+    await scheduler.acquire(priority)
+    client = get_async_client(HOST)
+    async with breaker.guard():
+        r = await client.get(BASE, params=params, timeout=15)
+        r.raise_for_status()
+    return r.json()
+
+
+# ---- Realtime quote (used by /aggregate and stocks UI) ----
+def _quote_params(symbol: str) -> dict:
+    return {
         "function": "GLOBAL_QUOTE",
         "symbol": symbol,
         "apikey": API_KEY,
     }
-    r = requests.get(BASE, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
 
-    # Alpha Vantage may return "Note" on rate-limit
-    if data.get("Note"):
-        raise AlphaVantageError("Alpha Vantage rate limit hit. Try again in a minute.")
+
+def _parse_quote(data: dict) -> Dict:
+    _check_rate_limit(data)
 
     quote = data.get("Global Quote") or data.get("GlobalQuote") or {}
     if not quote:
         # Sometimes they send "Information" or "Error Message"
-        info = data.get("Information") or data.get("Error Message")
-        if info:
-            raise AlphaVantageError(info)
+        if data.get("Error Message"):
+            raise UnknownSymbol(data["Error Message"])
+        if data.get("Information"):
+            raise AlphaVantageError(data["Information"])
     return quote
 
 
-# ---- Daily history (last 30 points) for charts ----
-_daily_cache: Dict[str, Dict] = {}  # {symbol: {"ts": epoch, "data": [{t,y}, ...]}}
+async def fetch_quote_async(symbol: str, priority: int = PRIORITY_QUOTE) -> Dict:
+    """
+    GLOBAL_QUOTE -> returns dict for the symbol, tolerant to slight schema changes.
+    """
+    _require_key()
+    return _parse_quote(await _get_async(_quote_params(symbol), priority))
 
 
+# ---- Daily history (fills the history store) ----
 def _pick_series_block(data: dict):
     """Return the first available daily series block from the payload."""
     return (
@@ -58,43 +116,21 @@ def _pick_series_block(data: dict):
     )
 
 
-def fetch_daily_series(symbol: str, compact: bool = True):
-    """
-    Returns list of points: [{t: unix_ms, y: close}], ascending, last ~30 pts.
-    Handles Adjusted/Daily, rate limits, and caches for 60s.
-    """
-    if not API_KEY:
-        raise AlphaVantageError("Missing ALPHAVANTAGE_API_KEY in environment.")
-
-    key = symbol.upper()
-    now = time.time()
-    cached = _daily_cache.get(key)
-    if cached and now - cached["ts"] < 60:
-        return cached["data"]
-
-    params = {
+def _daily_params(key: str, compact: bool) -> dict:
+    return {
         "function": "TIME_SERIES_DAILY_ADJUSTED",
         "symbol": key,
         "outputsize": "compact" if compact else "full",
         "apikey": API_KEY,
     }
-    r = requests.get(BASE, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
 
-    # Rate-limit?
-    if data.get("Note"):
-        raise AlphaVantageError("Alpha Vantage rate limit hit. Try again in a minute.")
 
-    # Fallback to non-adjusted if needed
-    if not _pick_series_block(data) and (data.get("Information") or data.get("Error Message")):
-        params["function"] = "TIME_SERIES_DAILY"
-        r2 = requests.get(BASE, params=params, timeout=15)
-        r2.raise_for_status()
-        data = r2.json()
-        if data.get("Note"):
-            raise AlphaVantageError("Alpha Vantage rate limit hit. Try again in a minute.")
+def _needs_unadjusted_fallback(data: dict) -> bool:
+    return not _pick_series_block(data) and bool(data.get("Information") or data.get("Error Message"))
 
+
+def _parse_daily_points(key: str, data: dict) -> List[Dict]:
+    """Every daily close in the payload as [{t: unix_ms, y: close}], ascending."""
     series = _pick_series_block(data)
     if not series:
         raise AlphaVantageError(f"No daily series for {key}")
@@ -112,20 +148,31 @@ def fetch_daily_series(symbol: str, compact: bool = True):
         points.append({"t": int(dt.timestamp() * 1000), "y": float(price_str)})
 
     points.sort(key=lambda p: p["t"])
-    points = points[-30:]  # last ~30 days
-
-    _daily_cache[key] = {"ts": now, "data": points}
     return points
 
 
+async def fetch_daily_bars_async(symbol: str, full: bool = False, priority: int = PRIORITY_HISTORY) -> List[Dict]:
+    """
+    Every daily bar Alpha Vantage returns (~100 compact, 20+ years full),
+    uncached; used to fill the history store (see services/history_service.py).
+    """
+    _require_key()
+    key = symbol.upper()
+    params = _daily_params(key, compact=not full)
+    data = await _get_async(params, priority)
+    _check_rate_limit(data)
+
+    if _needs_unadjusted_fallback(data):
+        params["function"] = "TIME_SERIES_DAILY"
+        data = await _get_async(params, priority)
+        _check_rate_limit(data)
+
+    return _parse_daily_points(key, data)
+
+
 # ---- Symbol search (typeahead) ----
-def symbol_search(q: str) -> List[Dict]:
-    if not API_KEY:
-        raise AlphaVantageError("Missing ALPHAVANTAGE_API_KEY in environment.")
-    params = {"function": "SYMBOL_SEARCH", "keywords": q, "apikey": API_KEY}
-    r = requests.get(BASE, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
+def _parse_matches(data: dict) -> List[Dict]:
+    _check_rate_limit(data)
     best = data.get("bestMatches") or []
     # normalize a tiny bit
     out = []
@@ -133,9 +180,43 @@ def symbol_search(q: str) -> List[Dict]:
         out.append({
             "symbol": m.get("1. symbol") or "",
             "name": m.get("2. name") or "",
+            "type": m.get("3. type") or "",
             "region": m.get("4. region") or "",
             "currency": m.get("8. currency") or "",
         })
     return out
 
 
+async def symbol_search_async(q: str, priority: int = PRIORITY_SEARCH) -> List[Dict]:
+    _require_key()
+    return _parse_matches(await _get_async({"function": "SYMBOL_SEARCH", "keywords": q, "apikey": API_KEY}, priority))
+
+
+# ---- Listings (local ticker index for typeahead) ----
+def _parse_listings(text: str) -> List[Dict]:
+    if text.lstrip().startswith("{"):
+        # errors and rate-limit notes come back as JSON instead of CSV
+        data = json.loads(text)
+        _check_rate_limit(data)
+        raise AlphaVantageError(data.get("Information") or data.get("Error Message") or "Unexpected LISTING_STATUS response")
+    out = []
+    for row in csv.DictReader(io.StringIO(text)):
+        if not row.get("symbol") or (row.get("status") or "Active") != "Active":
+            continue
+        out.append({
+            "symbol": row["symbol"],
+            "name": row.get("name") or "",
+            "exchange": row.get("exchange") or "",
+            "type": row.get("assetType") or "",
+        })
+    return out
+
+
+def fetch_listing_status(priority: int = PRIORITY_BACKGROUND) -> List[Dict]:
+    """
+    LISTING_STATUS -> every active US-listed ticker as
+    [{symbol, name, exchange, type}]. One call, CSV body of a few hundred KB.
+    """
+    _require_key()
+    r = _get_response({"function": "LISTING_STATUS", "state": "active", "apikey": API_KEY}, priority, timeout=60)
+    return _parse_listings(r.text)
@@ -0,0 +1,179 @@
+"""
+Per-upstream circuit breaker.
+
+Tracks the outcome and latency of the last `window` calls. When enough of
+them failed or were slow, the circuit opens. Calls then fail immediately with
+CircuitOpen instead of waiting out the HTTP timeout. After `open_seconds` one
+probe call is let through (half-open): success closes the circuit, failure
+opens it again.
+
+Only upstream health counts as failure: transport errors, timeouts, 5xx and
+429. A 404 for an unknown coin or an Alpha Vantage "Error Message" is the
+caller's problem, not an outage.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Tuple
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATIO = float(os.getenv("CIRCUIT_FAILURE_RATIO", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "5"))
+CIRCUIT_SLOW_RATIO = float(os.getenv("CIRCUIT_SLOW_RATIO", "0.8"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = Gauge(
+    "upstream_circuit_state",
+    "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).",
+    ["upstream"],
+)
+CIRCUIT_SHORT_CIRCUITS = Counter(
+    "upstream_circuit_short_circuits_total",
+    "Calls rejected without contacting the upstream because its circuit was open.",
+    ["upstream"],
+)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"{upstream} is unavailable (circuit open). Retry in {self.retry_after}s.")
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """True for errors that say the upstream itself is unhealthy."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code >= 500 or code == 429
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """Wrap each upstream call in `breaker.guard()`."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = CIRCUIT_WINDOW,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        failure_ratio: float = CIRCUIT_FAILURE_RATIO,
+        slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+        slow_ratio: float = CIRCUIT_SLOW_RATIO,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_ratio = slow_ratio
+        self.open_seconds = open_seconds
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._cooldown_left() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def _cooldown_left(self) -> float:
+        return self.open_seconds - (time.monotonic() - self._opened_at)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUE[state])
+
+    def _reject(self) -> CircuitOpen:
+        CIRCUIT_SHORT_CIRCUITS.labels(self.name).inc()
+        return CircuitOpen(self.name, max(0.0, self._cooldown_left()))
+
+    def check(self) -> None:
+        """Raise CircuitOpen if a call made now would be short-circuited (no side effects)."""
+        with self._lock:
+            if self._state == OPEN and self._cooldown_left() > 0:
+                raise self._reject()
+            if self._state == HALF_OPEN and self._probe_in_flight:
+                raise self._reject()
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                if self._cooldown_left() > 0:
+                    raise self._reject()
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    raise self._reject()
+                self._probe_in_flight = True
+
+    def record(self, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._calls.clear()
+                if failed or slow:
+                    self._opened_at = time.monotonic()
+                    self._set_state(OPEN)
+                else:
+                    self._set_state(CLOSED)
+                return
+            self._calls.append((failed, slow))
+            n = len(self._calls)
+            if n < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._calls if f)
+            slows = sum(1 for _, s in self._calls if s)
+            if failures / n >= self.failure_ratio or slows / n >= self.slow_ratio:
+                self._opened_at = time.monotonic()
+                self._calls.clear()
+                self._set_state(OPEN)
+
+    def _release(self) -> None:
+        """Give up a half-open probe slot without a verdict (e.g. the call was cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def guard(self) -> "_Guard":
+        """Per-call context manager: `with breaker.guard():` / `async with breaker.guard():`."""
+        return _Guard(self)
+
+
+class _Guard:
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.start = 0.0
+
+    def __enter__(self):
+        self.breaker._admit()
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.monotonic() - self.start
+        if exc is not None and not isinstance(exc, Exception):
+            self.breaker._release()  # cancelled / interrupted
+        else:
+            # a bad request still means the upstream answered
+            self.breaker.record(exc is not None and is_upstream_failure(exc), duration)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
@@ -1,59 +1,71 @@
-import requests
-
+from app.adapters.circuit import CircuitBreaker
+from app.adapters.http_client import get_async_client, get_sync_client
 
+HOST = "coingecko"
 BASE = "https://api.coingecko.com/api/v3/simple/price"
 
-def fetch_simple_price(ids, vs_currencies):
-    params = {
+breaker = CircuitBreaker(HOST)
+
+def _simple_price_params(ids, vs_currencies):
+    return {
         "ids": ",".join(ids),
         "vs_currencies": ",".join(vs_currencies)
     }
-    r = requests.get(BASE, params=params, timeout=10)
-    r.raise_for_status()
+
+async def fetch_simple_price_async(ids, vs_currencies):
+    client = get_async_client(HOST)
+    async with breaker.guard():
+        r = await client.get(BASE, params=_simple_price_params(ids, vs_currencies), timeout=10)
+        r.raise_for_status()
     return r.json()
 
 
-# for suggestions
-import time
-_coin_list_cache = {"items": [], "ts": 0}
+# ---- coin list + market ranks (suggestions; see services/coin_list_service.py) ----
+COIN_LIST_URL = "https://api.coingecko.com/api/v3/coins/list?include_platform=false"
 
-def _fetch_coin_list():
-    url = "https://api.coingecko.com/api/v3/coins/list?include_platform=false"
-    r = requests.get(url, timeout=15)
-    r.raise_for_status()
+def fetch_coin_list(etag=None, last_modified=None):
+    """
+    GET /coins/list, revalidated with If-None-Match / If-Modified-Since when
+    the validators of the previous download are given.
+    Returns (items, validators); items is None when the upstream answers 304.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    with breaker.guard():
+        r = get_sync_client(HOST).get(COIN_LIST_URL, headers=headers, timeout=15)
+        if r.status_code != 304:
+            r.raise_for_status()
+    validators = {
+        "etag": r.headers.get("etag") or etag,
+        "lastModified": r.headers.get("last-modified") or last_modified,
+    }
+    if r.status_code == 304:
+        return None, validators
     # items look like: {"id":"bitcoin","symbol":"btc","name":"Bitcoin"}
-    return r.json()
+    return r.json(), validators
+
+def fetch_market_ranks(top: int = 250):
+    """{coin id: market-cap rank} for the top coins; used to rank suggestions."""
+    url = "https://api.coingecko.com/api/v3/coins/markets"
+    params = {"vs_currency": "usd", "order": "market_cap_desc", "per_page": top, "page": 1}
+    with breaker.guard():
+        r = get_sync_client(HOST).get(url, params=params, timeout=15)
+        r.raise_for_status()
+    return {m["id"]: m.get("market_cap_rank") or n for n, m in enumerate(r.json(), start=1)}
+
+# ---- history (fills the history store; see services/history_service.py) ----
+def _market_chart_url(coin_id: str) -> str:
+    return f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
+
+def _parse_market_chart(data):
+    return [{"t": int(p[0]), "y": float(p[1])} for p in data.get("prices", [])]
 
-def get_coin_list_cached(max_age_sec: int = 6*3600):
-    now = time.time()
-    if not _coin_list_cache["items"] or now - _coin_list_cache["ts"] > max_age_sec:
-        _coin_list_cache["items"] = _fetch_coin_list()
-        _coin_list_cache["ts"] = now
-    return _coin_list_cache["items"]
-
-def suggest_crypto(prefix: str, limit: int = 10):
-    prefix = prefix.lower().strip()
-    if not prefix:
-        return []
-    items = get_coin_list_cached()
-    # match by name or symbol starting with prefix
-    matches = []
-    for it in items:
-        if it["name"].lower().startswith(prefix) or it["symbol"].lower().startswith(prefix):
-            matches.append({
-                "id": it["id"],           
-                "symbol": it["symbol"].upper(),
-                "name": it["name"]
-            })
-            if len(matches) >= limit:
-                break
-    return matches
-
-# ---- history (last 30 days) ----
-def fetch_market_chart(coin_id: str, days: int = 30, vs: str = "usd"):
-    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-    r = requests.get(url, params={"vs_currency": vs, "days": days}, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    
-    return [{"t": int(p[0]), "y": float(p[1])} for p in data.get("prices", [])]
\ No newline at end of file
+async def fetch_market_chart_async(coin_id: str, days: int = 30, vs: str = "usd"):
+    client = get_async_client(HOST)
+    async with breaker.guard():
+        r = await client.get(_market_chart_url(coin_id), params={"vs_currency": vs, "days": days}, timeout=15)
+        r.raise_for_status()
+    return _parse_market_chart(r.json())
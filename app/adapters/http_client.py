@@ -0,0 +1,70 @@
+"""
+Shared, pooled HTTP clients for the upstream adapters.
+
+Each upstream host gets its own keep-alive connection pool, so connection
+limits and timeouts apply per host and one slow upstream cannot exhaust the
+sockets of the other. Clients are created lazily and closed by the app
+lifespan (see app/main.py).
+"""
+import importlib.util
+import os
+from typing import Dict
+
+import httpx
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+# HTTP/2 needs the optional `h2` package (httpx[http2]); without it we still
+# get HTTP/1.1 keep-alive.
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "1") == "1"
+    and importlib.util.find_spec("h2") is not None
+)
+
+_async_clients: Dict[str, httpx.AsyncClient] = {}  # {host_name: client}
+_sync_clients: Dict[str, httpx.Client] = {}
+
+
+def _client_options() -> Dict:
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "http2": HTTP2_ENABLED,
+        "headers": {"Accept": "application/json"},
+    }
+
+
+def get_async_client(host: str) -> httpx.AsyncClient:
+    """Return the shared async client for an upstream (e.g. "coingecko")."""
+    client = _async_clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[host] = client
+    return client
+
+
+def get_sync_client(host: str) -> httpx.Client:
+    """Blocking counterpart of get_async_client, for code still running in threads."""
+    client = _sync_clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.Client(**_client_options())
+        _sync_clients[host] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    """Close every pooled client. Called on app shutdown."""
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    _async_clients.clear()
+    for client in list(_sync_clients.values()):
+        client.close()
+    _sync_clients.clear()
@@ -0,0 +1,187 @@
+"""
+Token-bucket scheduler with priority classes for rate-limited upstreams.
+
+Callers acquire a token before each upstream call. Tokens refill at `rate`
+per second up to `burst`. When none is free, callers queue and are served
+highest priority first. A caller whose expected wait exceeds its class's
+max wait fails fast with RateLimited(retry_after) instead of burning a call
+that the upstream would reject anyway.
+
+Lower classes can also be kept off the last few tokens (`reserve`), so a
+burst of typeahead calls cannot use up the budget that quotes need.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Priority classes, most important first.
+PRIORITY_QUOTE = 0
+PRIORITY_HISTORY = 1
+PRIORITY_SEARCH = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = {
+    PRIORITY_QUOTE: "quote",
+    PRIORITY_HISTORY: "history",
+    PRIORITY_SEARCH: "search",
+    PRIORITY_BACKGROUND: "background",
+}
+
+RATELIMIT_QUEUE_DEPTH = Gauge(
+    "upstream_ratelimit_queue_depth",
+    "Calls waiting for an upstream rate-limit token.",
+    ["upstream", "priority"],
+)
+RATELIMIT_WAIT_SECONDS = Histogram(
+    "upstream_ratelimit_wait_seconds",
+    "Time spent waiting for an upstream rate-limit token.",
+    ["upstream", "priority"],
+    buckets=(0.005, 0.05, 0.25, 1, 2.5, 5, 10, 15, 30, 60),
+)
+RATELIMIT_REJECTED = Counter(
+    "upstream_ratelimit_rejected_total",
+    "Calls failed fast because no token would be free within their max wait.",
+    ["upstream", "priority"],
+)
+
+
+class RateLimited(Exception):
+    """No upstream budget within the caller's max wait; retry after `retry_after` seconds."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(f"{upstream} rate limit budget exhausted. Retry in {self.retry_after}s.")
+
+
+class TokenBucketScheduler:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_wait: Dict[int, float],
+        reserve: Optional[Dict[int, float]] = None,
+    ):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_wait = max_wait
+        self.reserve = reserve or {}
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()  # sync callers run in worker threads
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # ---- bookkeeping (call with self._lock held) ----
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _floor(self, priority: int) -> float:
+        """Tokens a call of this class must leave in the bucket."""
+        return min(self.reserve.get(priority, 0.0), self.burst - 1)
+
+    def _ahead(self, priority: int) -> int:
+        return sum(1 for p, _, f in self._waiters if p <= priority and not f.done())
+
+    def _estimate_wait(self, priority: int) -> float:
+        needed = self._ahead(priority) + 1 + self._floor(priority) - self._tokens
+        return max(0.0, needed) / self.rate
+
+    def _track_depth(self, priority: int, delta: int) -> None:
+        RATELIMIT_QUEUE_DEPTH.labels(self.name, PRIORITY_NAMES.get(priority, str(priority))).inc(delta)
+
+    def _reject(self, priority: int, retry_after: float) -> RateLimited:
+        RATELIMIT_REJECTED.labels(self.name, PRIORITY_NAMES.get(priority, str(priority))).inc()
+        return RateLimited(self.name, retry_after)
+
+    # ---- public API ----
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the upstream itself reported a rate limit."""
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+
+    def try_acquire(self, priority: int) -> None:
+        """Non-blocking acquire for sync callers: take a token now or raise RateLimited."""
+        with self._lock:
+            self._refill()
+            if self._ahead(priority) == 0 and self._tokens - 1 >= self._floor(priority):
+                self._tokens -= 1
+                return
+            raise self._reject(priority, self._estimate_wait(priority))
+
+    async def acquire(self, priority: int, max_wait: Optional[float] = None) -> None:
+        """Wait for a token, in priority order, for at most `max_wait` seconds."""
+        label = PRIORITY_NAMES.get(priority, str(priority))
+        limit = self.max_wait.get(priority, 0.0) if max_wait is None else max_wait
+        with self._lock:
+            self._refill()
+            if self._ahead(priority) == 0 and self._tokens - 1 >= self._floor(priority):
+                self._tokens -= 1
+                RATELIMIT_WAIT_SECONDS.labels(self.name, label).observe(0)
+                return
+            wait = self._estimate_wait(priority)
+            if wait > limit:
+                raise self._reject(priority, wait)
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+
+        self._track_depth(priority, 1)
+        self._wake_dispatcher()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=limit)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                # overtaken by higher-priority calls; give up the slot
+                fut.cancel()
+                raise self._reject(priority, self._estimate_wait(priority))
+        except BaseException:
+            fut.cancel()
+            raise
+        finally:
+            self._track_depth(priority, -1)
+        RATELIMIT_WAIT_SECONDS.labels(self.name, label).observe(time.monotonic() - start)
+
+    def _wake_dispatcher(self) -> None:
+        """(Re)start the dispatcher so it re-plans around the newest waiter."""
+        d = self._dispatcher
+        if d is not None and not d.done() and d.get_loop() is asyncio.get_running_loop():
+            d.cancel()  # only ever parked in asyncio.sleep
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        """Hand tokens to queued callers, highest priority first, as they refill."""
+        while True:
+            with self._lock:
+                while self._waiters and self._waiters[0][2].done():
+                    heapq.heappop(self._waiters)
+                if not self._waiters:
+                    return
+                priority, _, fut = self._waiters[0]
+                self._refill()
+                short = 1 + self._floor(priority) - self._tokens
+                if short <= 0:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    fut.set_result(None)
+                    continue
+            await asyncio.sleep(short / self.rate)
@@ -1,15 +1,27 @@
+from typing import Optional
 
-from fastapi import APIRouter, Query, HTTPException
-from app.services.aggregator import aggregate_with_cache
+from fastapi import APIRouter, Header, Query, HTTPException
+from app.services.aggregator import aggregate_versioned
+from app.adapters.circuit import CircuitOpen
+from app.adapters.ratelimit import RateLimited
+from app.core.http_cache import conditional, strong_etag
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
 @router.get("/aggregate")
-def aggregate_endpoint(
+async def aggregate_endpoint(
     symbols: str = Query(..., description="CSV of symbols, e.g. bitcoin,AAPL"),
     window: int = Query(60, description="Cache TTL seconds"),
+    if_none_match: Optional[str] = Header(None),
 ):
     try:
-        return aggregate_with_cache(symbols, window=window)
+        result = await aggregate_versioned(symbols, window=window)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
+    return conditional(if_none_match, strong_etag("aggregate", result.version), result.freshness,
+                       lambda: FastJSONResponse(result.payload))
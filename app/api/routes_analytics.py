@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Query, HTTPException
+from app.services.analytics_service import analyze
+from app.adapters.alphavantage import AlphaVantageError
+from app.adapters.circuit import CircuitOpen
+from app.adapters.ratelimit import RateLimited
+
+router = APIRouter()
+
+@router.get("/analytics")
+async def analytics_endpoint(
+    symbols: str = Query(..., description="CSV of symbols, e.g. bitcoin,AAPL"),
+    days: int = Query(90, ge=2, le=3650, description="window, in days back from today"),
+    vol_window: int = Query(20, ge=2, description="rolling volatility window, in calendar rows"),
+):
+    try:
+        return await analyze(symbols, days=days, vol_window=vol_window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except AlphaVantageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
@@ -1,35 +1,39 @@
 from fastapi import APIRouter, Body, HTTPException
 from typing import List, Optional
-from app.db.mongo import get_db
+from app.db.mongo import get_async_db
+from app.services.cache_service import cache_stats, invalidate_local
 
 router = APIRouter()
 
 @router.get("/cache/status")
-def cache_status(sample: int = 5):
-    db = get_db()
-    count = db.cache.count_documents({})
+async def cache_status(sample: int = 5):
+    db = get_async_db()
+    count = await db.cache.count_documents({})
     keys = []
-    for doc in db.cache.find({}, {"_id": 0, "key": 1}).limit(max(sample, 0)):
+    async for doc in db.cache.find({}, {"_id": 0, "key": 1}).limit(max(sample, 0)):
         keys.append(doc["key"])
     return {
         "count": count,
         "keysSample": keys,
-        "ttlDefaultNote": "TTL is set on expiresAt via index; entries auto-expire."
+        "ttlDefaultNote": "TTL is set on expiresAt via index; entries auto-expire.",
+        **cache_stats(),
     }
 
 @router.post("/cache/clear")
-def cache_clear(
+async def cache_clear(
     all: Optional[bool] = Body(default=False),
     keys: Optional[List[str]] = Body(default=None),
 ):
-    db = get_db()
+    db = get_async_db()
 
     if all:
-        res = db.cache.delete_many({})
+        res = await db.cache.delete_many({})
+        invalidate_local()
         return {"cleared": res.deleted_count, "mode": "all"}
 
     if keys:
-        res = db.cache.delete_many({"key": {"$in": keys}})
+        res = await db.cache.delete_many({"key": {"$in": keys}})
+        invalidate_local(keys)
         return {"cleared": res.deleted_count, "mode": "keys", "keys": keys}
 
     raise HTTPException(status_code=400, detail="Provide 'all': true or a 'keys' list.")
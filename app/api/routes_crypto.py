@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Header, Query, HTTPException
 from typing import Optional
-from app.adapters.coingecko import fetch_simple_price
+from app.adapters.circuit import CircuitOpen
+from app.adapters.coingecko import fetch_simple_price_async
+from app.core.http_cache import Freshness, conditional, strong_etag
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
 @router.get("/crypto/price")
-def crypto_price(ids: str = Query(...), vs: str = Query("usd")):
+async def crypto_price(ids: str = Query(...), vs: str = Query("usd"), if_none_match: Optional[str] = Header(None)):
     try:
-        data = fetch_simple_price(ids.split(","), vs.split(","))
-        return {"ids": ids, "vs": vs, "data": data}
+        data = await fetch_simple_price_async(ids.split(","), vs.split(","))
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
+    body = {"ids": ids, "vs": vs, "data": data}
+    # live upstream prices, nothing to derive a lifetime from: revalidate every time
+    return conditional(if_none_match, strong_etag("crypto-price", body), Freshness(), lambda: FastJSONResponse(body))
@@ -1,23 +1,104 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.adapters.coingecko import fetch_market_chart
-from app.adapters.alphavantage import fetch_daily_series, AlphaVantageError
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, HTTPException
+from fastapi.responses import Response
+from app.adapters.alphavantage import AlphaVantageError
+from app.adapters.circuit import CircuitOpen
+from app.adapters.ratelimit import RateLimited
+from app.core.downsample import downsample
+from app.core.http_cache import Freshness, conditional, strong_etag
+from app.core.responses import FastJSONResponse
+from app.core.series import FORMAT_PATTERN, MEDIA_TYPES, Series, encode, negotiate
+from app.services import history_service
+
+# Series longer than this are reduced with LTTB unless the client asks for a size.
+HISTORY_DEFAULT_MAX_POINTS = int(os.getenv("HISTORY_DEFAULT_MAX_POINTS", "1000"))
+HISTORY_MAX_POINTS_LIMIT = 10000
+# Cache lifetime of windows that ended before any new bar could fall in them.
+HISTORY_CLOSED_WINDOW_MAX_AGE_SECONDS = int(os.getenv("HISTORY_CLOSED_WINDOW_MAX_AGE_SECONDS", "86400"))
 
 router = APIRouter()
 
+_MAX_POINTS = Query(None, ge=3, le=HISTORY_MAX_POINTS_LIMIT, description="downsample (LTTB) to at most this many points")
+_POINTS = Query(None, ge=3, le=HISTORY_MAX_POINTS_LIMIT, description="alias of max_points")
+_FORMAT = Query(None, pattern=FORMAT_PATTERN, description="points | columnar | delta | binary (default: from Accept)")
+
+
+def _freshness(series: Series, interval: str, end: Optional[int]) -> Freshness:
+    """
+    Fresh until the bar after the newest one served closes, then servable for
+    one resync interval (the store won't ask upstream sooner). Stored bars
+    never change, so a window ending before the next bar starts is final.
+    """
+    if not len(series):
+        return Freshness()
+    step = history_service.INTERVAL_MS[interval]
+    next_start = int(series.t[-1]) + step
+    if end is not None and end < next_start:
+        return Freshness(HISTORY_CLOSED_WINDOW_MAX_AGE_SECONDS)
+    fresh_ms = next_start + step - int(time.time() * 1000)
+    return Freshness(max(0, fresh_ms // 1000), history_service.HISTORY_RESYNC_SECONDS[interval])
+
+
+def _respond(symbol: str, interval: str, series: Series, max_points: Optional[int], points: Optional[int],
+             fmt: Optional[str], accept: Optional[str], end: Optional[int], if_none_match: Optional[str]) -> Response:
+    series = downsample(series, max_points or points or HISTORY_DEFAULT_MAX_POINTS)
+    fmt = negotiate(fmt, accept)
+    # stored bars are immutable, so the arrays themselves are the version
+    etag = strong_etag("history", symbol, interval, fmt, series.t.tobytes(), series.y.tobytes())
+
+    def render() -> Response:
+        if fmt == "binary":
+            headers = {"X-Symbol": symbol, "X-Currency": "usd", "X-Interval": interval}
+            return Response(encode(series, fmt), media_type=MEDIA_TYPES[fmt], headers=headers)
+        body = {"symbol": symbol, "series": encode(series, fmt), "currency": "usd", "interval": interval, "format": fmt}
+        return FastJSONResponse(body, media_type=MEDIA_TYPES[fmt])
+
+    return conditional(if_none_match, etag, _freshness(series, interval, end), render, {"Vary": "Accept"})
+
+
 @router.get("/history/crypto")
-def crypto_history(id: str = Query(..., description="coingecko id, e.g. bitcoin"), days: int = 30):
+async def crypto_history(
+    id: str = Query(..., description="coingecko id, e.g. bitcoin"),
+    days: int = Query(30, ge=1),
+    start: Optional[int] = Query(None, description="window start, unix ms (overrides days)"),
+    end: Optional[int] = Query(None, description="window end, unix ms (default now)"),
+    max_points: Optional[int] = _MAX_POINTS,
+    points: Optional[int] = _POINTS,
+    format: Optional[str] = _FORMAT,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     try:
-        series = fetch_market_chart(id, days=days, vs="usd")
-        return {"symbol": id, "series": series, "currency": "usd"}
+        interval, series = await history_service.crypto_history(id, days=days, start=start, end=end)
+        return _respond(id, interval, series, max_points, points, format, accept, end, if_none_match)
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 @router.get("/history/stock")
-def stock_history(symbol: str = Query(..., description="ticker, e.g. AAPL")):
+async def stock_history(
+    symbol: str = Query(..., description="ticker, e.g. AAPL"),
+    days: Optional[int] = Query(None, ge=1, description="default: the last 30 trading days"),
+    start: Optional[int] = Query(None, description="window start, unix ms (overrides days)"),
+    end: Optional[int] = Query(None, description="window end, unix ms (default now)"),
+    max_points: Optional[int] = _MAX_POINTS,
+    points: Optional[int] = _POINTS,
+    format: Optional[str] = _FORMAT,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     try:
-        series = fetch_daily_series(symbol)
-        return {"symbol": symbol.upper(), "series": series, "currency": "usd"}
+        series = await history_service.stock_history(symbol, days=days, start=start, end=end)
+        return _respond(symbol.upper(), "1d", series, max_points, points, format, accept, end, if_none_match)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except AlphaVantageError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
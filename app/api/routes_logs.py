@@ -1,11 +1,29 @@
-from fastapi import APIRouter
-from app.db.mongo import get_db
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from app.core.request_metrics import latency_summary
+from app.db.mongo import get_async_db
 
 router = APIRouter()
 
 @router.get("/logs/status")
-def logs_status():
-    db = get_db()
-    c = db.req_logs.count_documents({})
-    latest = db.req_logs.find({}, {"_id":0}).sort("createdAt", -1).limit(3)
-    return {"count": c, "latest": list(latest)}
+async def logs_status():
+    db = get_async_db()
+    # collection metadata, not a scan of the 7-day log
+    c = await db.req_logs.estimated_document_count()
+    latest = await db.req_logs.find({}, {"_id":0}).sort("createdAt", -1).limit(3).to_list(3)
+    return {"count": c, "latest": latest}
+
+@router.get("/logs/latency")
+async def logs_latency(
+    minutes: int = Query(60, ge=1, le=30 * 24 * 60, description="window ending now (ignored if start is given)"),
+    start: Optional[datetime] = Query(None, description="ISO 8601, inclusive"),
+    end: Optional[datetime] = Query(None, description="ISO 8601, exclusive (default now)"),
+    method: Optional[str] = None,
+    route: Optional[str] = Query(None, description="path template, e.g. /history/stock"),
+    status: Optional[int] = None,
+):
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(minutes=minutes)
+    return await latency_summary(start, end, method=method.upper() if method else None, route=route, status=status)
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Query, HTTPException
-from app.adapters.alphavantage import fetch_quote as fetch_global_quote, AlphaVantageError
+from app.adapters.alphavantage import fetch_quote_async as fetch_global_quote, AlphaVantageError
+from app.adapters.circuit import CircuitOpen
+from app.adapters.ratelimit import RateLimited
 
 
 router = APIRouter()
 
 @router.get("/stocks/quote")
-def stocks_quote(symbol: str = Query(..., min_length=1)):
+async def stocks_quote(symbol: str = Query(..., min_length=1)):
     try:
-        quote = fetch_global_quote(symbol.upper())
+        quote = await fetch_global_quote(symbol.upper())
         return {"symbol": symbol.upper(), "data": quote}
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except AlphaVantageError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
@@ -0,0 +1,44 @@
+import os
+
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.responses import json_bytes
+from app.services.price_stream import hub
+
+# Comment lines sent while nothing changes, so proxies keep the stream open.
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+router = APIRouter()
+
+
+async def _events(request: Request, sub):
+    try:
+        yield b"retry: 3000\n\n"
+        while not await request.is_disconnected():
+            updates = await sub.next(timeout=STREAM_HEARTBEAT_SECONDS)
+            if not updates:
+                yield b": keep-alive\n\n"
+            for update in updates:
+                yield b"event: price\ndata: " + json_bytes(update) + b"\n\n"
+    finally:
+        hub.unsubscribe(sub)
+
+
+@router.get("/stream/prices")
+async def stream_prices(
+    request: Request,
+    symbols: str = Query(..., description="CSV of symbols, e.g. bitcoin,AAPL"),
+):
+    """
+    Server-sent events: a `price` event ({symbol, type, price, source, asOf})
+    with the latest known price of each symbol, then one whenever it changes.
+    """
+    try:
+        sub = hub.subscribe(symbols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        _events(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
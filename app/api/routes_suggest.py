@@ -1,34 +1,37 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.adapters.coingecko import suggest_crypto
-import os, requests
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, HTTPException
+from app.services import coin_list_service, stock_list_service
+from app.services.coin_list_service import suggest_crypto
+from app.services.stock_list_service import suggest_stocks
+from app.adapters.alphavantage import AlphaVantageError
+from app.adapters.circuit import CircuitOpen
+from app.adapters.ratelimit import RateLimited
+from app.core.http_cache import conditional, strong_etag
+from app.core.responses import FastJSONResponse
+
+# Typeahead lists are short; a larger limit only makes bigger cache entries.
+SUGGEST_MAX_LIMIT = 50
 
 router = APIRouter()
 
 @router.get("/suggest/crypto")
-def suggest_crypto_route(q: str = Query(..., min_length=1), limit: int = 10):
-    return suggest_crypto(q, limit=limit)
+def suggest_crypto_route(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT), if_none_match: Optional[str] = Header(None)):
+    matches = suggest_crypto(q, limit=limit)
+    return conditional(if_none_match, strong_etag("suggest", "crypto", matches), coin_list_service.freshness(),
+                       lambda: FastJSONResponse(matches))
 
 @router.get("/suggest/stocks")
-def suggest_stocks_route(q: str = Query(..., min_length=1), limit: int = 10):
-    api_key = os.getenv("ALPHAVANTAGE_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=400, detail="Alpha Vantage API key missing")
-    url = "https://www.alphavantage.co/query"
-    params = {"function": "SYMBOL_SEARCH", "keywords": q, "apikey": api_key}
+async def suggest_stocks_route(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT), if_none_match: Optional[str] = Header(None)):
     try:
-        r = requests.get(url, params=params, timeout=12)
-        r.raise_for_status()
-        data = r.json().get("bestMatches", [])
-        out = []
-        for m in data:
-            out.append({
-                "symbol": m.get("1. symbol"),
-                "name": m.get("2. name"),
-                "type": m.get("3. type"),
-                "region": m.get("4. region")
-            })
-            if len(out) >= limit:
-                break
-        return out
+        matches = await suggest_stocks(q, limit=limit)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except AlphaVantageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
+    return conditional(if_none_match, strong_etag("suggest", "stocks", matches), stock_list_service.freshness(),
+                       lambda: FastJSONResponse(matches))
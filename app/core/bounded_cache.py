@@ -0,0 +1,138 @@
+"""
+Bounded in-process cache for adapter and service level caches.
+
+Entries live in an LRU capped by count and by approximate size in bytes,
+each with an optional TTL. Keys come from client input (symbols, ids), so
+nothing held in a worker may grow without limit. Every instance reports its
+size and evictions under its name on /metrics:
+
+  inproc_cache_entries{cache}            current entries
+  inproc_cache_bytes{cache}              approximate bytes held
+  inproc_cache_lookups_total{cache,outcome}     hit / miss
+  inproc_cache_evictions_total{cache,reason}    entries / bytes / expired
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+V = TypeVar("V")
+
+CACHE_ENTRIES = Gauge("inproc_cache_entries", "Entries held by an in-process cache.", ["cache"])
+CACHE_BYTES = Gauge("inproc_cache_bytes", "Approximate bytes held by an in-process cache.", ["cache"])
+CACHE_LOOKUPS = Counter("inproc_cache_lookups_total", "In-process cache lookups by outcome.", ["cache", "outcome"])
+CACHE_EVICTIONS = Counter(
+    "inproc_cache_evictions_total",
+    "Entries dropped from an in-process cache: over max entries, over max bytes, or expired.",
+    ["cache", "reason"],
+)
+
+
+def approx_size(value: Any) -> int:
+    """Rough deep size of JSON-like values (dicts, lists, scalars), in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v) for v in value)
+    return size
+
+
+class BoundedCache(Generic[V]):
+    """
+    Thread-safe LRU with max entries, max approximate bytes (0 = no byte
+    limit) and a default TTL in seconds (None = no expiry). max_entries <= 0
+    disables the cache. Values are returned as stored, so callers that hand
+    them out for mutation should copy.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int = 0, ttl: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires at (epoch seconds), approximate size, value)
+        self._data: "OrderedDict[Hashable, Tuple[float, int, V]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._report()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _report(self) -> None:
+        CACHE_ENTRIES.labels(self.name).set(len(self._data))
+        CACHE_BYTES.labels(self.name).set(self._bytes)
+
+    def _drop(self, key: Hashable, reason: Optional[str] = None) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+        if reason:
+            CACHE_EVICTIONS.labels(self.name, reason).inc()
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[V]:
+        now = time.time() if now is None else now
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and now >= item[0]:
+                self._drop(key, "expired")
+                self._report()
+                item = None
+            if item is None:
+                CACHE_LOOKUPS.labels(self.name, "miss").inc()
+                return None
+            self._data.move_to_end(key)
+        CACHE_LOOKUPS.labels(self.name, "hit").inc()
+        return item[2]
+
+    def put(self, key: Hashable, value: V, ttl: Optional[float] = None, now: Optional[float] = None) -> None:
+        """Store `value` for `ttl` seconds (default: the cache's TTL), evicting LRU entries to fit."""
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        now = time.time() if now is None else now
+        expires = now + ttl if ttl is not None else float("inf")
+        size = approx_size(key) + approx_size(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if self.max_bytes and size > self.max_bytes:
+                CACHE_EVICTIONS.labels(self.name, "bytes").inc()
+                self._report()
+                return
+            self._data[key] = (expires, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)), "entries")
+            while self.max_bytes and self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)), "bytes")
+            self._report()
+
+    def keys(self) -> List[Hashable]:
+        """A snapshot of the keys held, least recently used first."""
+        with self._lock:
+            return list(self._data)
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """Drop `keys` (or everything). Not counted as evictions."""
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+                self._bytes = 0
+            else:
+                for key in keys:
+                    if key in self._data:
+                        self._drop(key)
+            self._report()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "bytes": self._bytes, "maxEntries": self.max_entries, "maxBytes": self.max_bytes}
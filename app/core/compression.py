@@ -0,0 +1,163 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Brotli (`br`, needs the optional `brotli` package) or gzip, whichever the
+client ranks higher (brotli on a tie), for compressible media types
+(text/*, JSON, the binary series format) once the body reaches
+COMPRESS_MIN_BYTES. Bodies are compressed as they stream, once the first
+COMPRESS_MIN_BYTES have arrived (smaller ones go out as they are), so
+a large response is never held in memory whole. Server-sent events pass
+through untouched.
+
+A compressed response's strong ETag is sent weak (W/"..."), as its bytes
+differ from the identity encoding's; If-None-Match compares weakly, so
+revalidation still ends in a 304.
+"""
+import gzip
+import os
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+# besides text/* and JSON (application/json, application/*+json)
+_COMPRESSIBLE = ("application/vnd.aggregator.series", "application/javascript")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br", "gzip" or None (identity) for an Accept-Encoding header."""
+    q = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            q[coding] = weight
+    star = q.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        weight = q.get(coding, star)
+        if weight > best_q:
+            best, best_q = coding, weight
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+class _Compressor:
+    """Incremental gzip / brotli: feed() chunks, then finish()."""
+
+    def __init__(self, coding: str):
+        if coding == "br":
+            self._c = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+            self._feed, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+            self._feed, self._finish = self._c.compress, self._c.flush
+
+    def feed(self, data: bytes) -> bytes:
+        return self._feed(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _compressible(content_type: Optional[str]) -> bool:
+    media = (content_type or "").split(";")[0].strip().lower()
+    if media == "text/event-stream":
+        return False
+    return media.startswith("text/") or media.endswith("json") or media in _COMPRESSIBLE
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        start: Optional[Message] = None  # held until we know whether to compress
+        pending: List[bytes] = []
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not _compressible(headers.get("content-type")):
+                    passthrough = True
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if coding is None or "content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            more = message.get("more_body", False)
+            if compressor is not None:
+                data = compressor.feed(message.get("body", b""))
+                if not more:
+                    data += compressor.finish()
+                if data or not more:
+                    await send({"type": "http.response.body", "body": data, "more_body": more})
+                return
+
+            pending.append(message.get("body", b""))
+            size = sum(map(len, pending))
+            if size < self.minimum_size:
+                if more:
+                    return
+                # complete and small: send as is
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(pending), "more_body": False})
+                return
+
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = coding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            body = b"".join(pending)
+            pending.clear()
+            if more:
+                compressor = _Compressor(coding)
+                del headers["Content-Length"]
+                data = compressor.feed(body)
+            else:
+                data = compress(body, coding)
+                headers["Content-Length"] = str(len(data))
+            await send(start)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
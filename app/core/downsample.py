@@ -0,0 +1,51 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series.
+
+LTTB keeps the first and last points and splits the rest into n - 2 equal
+buckets. From each bucket it keeps the point forming the largest triangle
+with the point kept from the previous bucket and the average of the next
+one, so peaks, troughs and trend changes survive where plain striding or
+averaging would flatten them.
+
+Bucket averages come from one np.add.reduceat pass and each bucket's
+triangle areas are one array expression; only the walk over buckets (at
+most n iterations) is Python, since each choice depends on the previous one.
+"""
+import numpy as np
+
+from app.core.series import Series
+
+
+def lttb_indices(t: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the `n_out` points LTTB keeps from (t, y), ascending."""
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # bucket i covers [edges[i], edges[i + 1]); every bucket holds >= 1 point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    sizes = np.diff(edges)
+    avg_t = np.add.reduceat(t[1:n - 1], edges[:-1] - 1) / sizes
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    # the "next bucket" of the last bucket is the last point
+    avg_t = np.append(avg_t[1:], t[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((t[a] - avg_t[i]) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample(series: Series, max_points: int) -> Series:
+    """`series` reduced to at most `max_points` points with LTTB."""
+    if len(series) <= max_points:
+        return series
+    return series.take(lttb_indices(series.t, series.y, max_points))
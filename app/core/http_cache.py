@@ -0,0 +1,67 @@
+"""
+HTTP validators and freshness for data endpoints.
+
+A route computes a strong ETag from what its body is derived from (cache
+entry versions, stored bars) before building the body, and passes a
+callable that renders it. A request whose If-None-Match holds that ETag
+gets a bodyless 304 and nothing is serialized. Both answers carry
+Cache-Control from the data's remaining lifetime:
+
+  public, max-age=<seconds fresh>, stale-while-revalidate=<seconds servable after>
+
+or `no-cache` (revalidate every time) when there is nothing to go on.
+"""
+import hashlib
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from starlette.responses import Response
+
+
+class Freshness(NamedTuple):
+    max_age: int = 0
+    stale_while_revalidate: int = 0
+
+    @property
+    def cache_control(self) -> str:
+        if self.max_age <= 0 and self.stale_while_revalidate <= 0:
+            return "no-cache"
+        value = f"public, max-age={max(0, self.max_age)}"
+        if self.stale_while_revalidate > 0:
+            value += f", stale-while-revalidate={self.stale_while_revalidate}"
+        return value
+
+
+def strong_etag(*parts: Any) -> str:
+    """Quoted hash of `parts`: bytes are hashed as is, anything else by repr()."""
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part if isinstance(part, (bytes, bytearray, memoryview)) else repr(part).encode())
+        h.update(b"\x1f")
+    return f'"{h.hexdigest()}"'
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """True if If-None-Match lists `etag` (or is "*"); weak comparison, as RFC 9110 asks for GET."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def conditional(
+    if_none_match: Optional[str],
+    etag: str,
+    freshness: Freshness,
+    render: Callable[[], Response],
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """304 if the client holds `etag`, else render(); either way with ETag and Cache-Control."""
+    validators = {"ETag": etag, "Cache-Control": freshness.cache_control, **(headers or {})}
+    if none_match(if_none_match, etag):
+        return Response(status_code=304, headers=validators)
+    response = render()
+    response.headers.update(validators)
+    return response
@@ -0,0 +1,52 @@
+"""
+Mergeable latency sketch: a histogram over logarithmic buckets.
+
+A duration of d ms goes to bucket ceil(log(d) / log(gamma)), so every
+bucket spans a fixed ratio and any quantile read back is within
+SKETCH_RELATIVE_ACCURACY of the true value (the DDSketch scheme). Sub-ms
+durations share the "z" bucket. Sketches merge by adding bucket counts,
+which Mongo does with $inc, so per-minute rollups can be combined over any range.
+Bucket keys are strings so they can be used as Mongo field names.
+"""
+import math
+from typing import Dict, Iterable, Mapping
+
+SKETCH_RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+ZERO_BUCKET = "z"
+
+
+def bucket(ms: float) -> str:
+    if ms < 1:
+        return ZERO_BUCKET
+    return str(math.ceil(math.log(ms) / _LOG_GAMMA))
+
+
+def _value(key: str) -> float:
+    if key == ZERO_BUCKET:
+        return 0.0
+    # midpoint (relative) of (gamma^(i-1), gamma^i]
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+def _order(key: str) -> float:
+    return -math.inf if key == ZERO_BUCKET else int(key)
+
+
+def quantiles(sketch: Mapping[str, int], qs: Iterable[float]) -> Dict[float, float]:
+    """{q: estimated duration in ms} for each q in [0, 1]; empty sketch -> {}."""
+    total = sum(sketch.values())
+    if not total:
+        return {}
+    keys = sorted(sketch, key=_order)
+    out = {}
+    for q in qs:
+        rank = q * (total - 1)
+        seen = 0
+        for key in keys:
+            seen += sketch[key]
+            if seen > rank:
+                out[q] = round(_value(key), 3)
+                break
+    return out
@@ -0,0 +1,141 @@
+"""
+Payload codecs for the Mongo cache.
+
+A codec spec is a serializer, optionally "+" a compressor:
+
+  bson         the payload is stored as a nested document (no encoding)
+  json         compact JSON in a BSON binary field
+  msgpack      MessagePack in a BSON binary field (needs `msgpack`)
+  ...+zlib     compress the encoded bytes once they reach `min_bytes`
+               (kept uncompressed if that doesn't make them smaller)
+  ...+zstd     the same with Zstandard (needs `zstandard`)
+
+Encoded payloads are stored with an `enc` tag naming what was applied
+("json", "json+zlib", ...), so entries stay readable after the codec
+config changes. Specs naming a missing optional package fall back to json
+/ zlib with a warning.
+"""
+import json
+import logging
+import zlib
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from bson.binary import Binary
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "*"
+
+
+class PayloadCodecError(ValueError):
+    """A stored payload can't be decoded here (unknown or unavailable encoding, corrupt bytes)."""
+
+
+def _json_dumps(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+_SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (_json_dumps, json.loads),
+}
+if msgpack is not None:
+    _SERIALIZERS["msgpack"] = (msgpack.packb, lambda raw: msgpack.unpackb(raw, raw=False))
+
+_COMPRESSORS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda raw: zlib.compress(raw, 6), zlib.decompress),
+}
+if zstandard is not None:
+    _COMPRESSORS["zstd"] = (
+        lambda raw: zstandard.ZstdCompressor(level=3).compress(raw),
+        lambda raw: zstandard.ZstdDecompressor().decompress(raw),
+    )
+
+_KNOWN_SERIALIZERS = ("bson", "json", "msgpack")
+_KNOWN_COMPRESSORS = ("zlib", "zstd")
+_FALLBACK = {"msgpack": "json", "zstd": "zlib"}
+
+
+class PayloadCodec(NamedTuple):
+    serializer: str = "bson"
+    compressor: Optional[str] = None
+    min_bytes: int = 1024
+
+    @property
+    def name(self) -> str:
+        return f"{self.serializer}+{self.compressor}" if self.compressor else self.serializer
+
+    def encode(self, payload: Any) -> Tuple[Any, Optional[str]]:
+        """(value to store, enc tag); the tag is None when the payload is stored as plain BSON."""
+        if self.serializer == "bson":
+            return payload, None
+        try:
+            raw = _SERIALIZERS[self.serializer][0](payload)
+        except (TypeError, ValueError) as e:
+            # not representable (e.g. datetimes in JSON): BSON can still store it
+            log.debug("storing payload as bson, %s can't encode it: %s", self.serializer, e)
+            return payload, None
+        enc = self.serializer
+        if self.compressor and len(raw) >= self.min_bytes:
+            packed = _COMPRESSORS[self.compressor][0](raw)
+            if len(packed) < len(raw):
+                raw, enc = packed, f"{enc}+{self.compressor}"
+        return Binary(raw), enc
+
+
+def decode(value: Any, enc: Optional[str]) -> Any:
+    """Inverse of PayloadCodec.encode for any codec this process supports."""
+    if not enc:
+        return value
+    serializer, _, compressor = enc.partition("+")
+    try:
+        raw = bytes(value)
+        if compressor:
+            raw = _COMPRESSORS[compressor][1](raw)
+        return _SERIALIZERS[serializer][1](raw)
+    except KeyError:
+        raise PayloadCodecError(f"payload encoding {enc!r} is not available") from None
+    except Exception as e:
+        raise PayloadCodecError(f"can't decode {enc} payload: {e}") from e
+
+
+def parse_codec(spec: str, min_bytes: int = 1024) -> PayloadCodec:
+    serializer, _, compressor = spec.strip().lower().partition("+")
+    if serializer not in _KNOWN_SERIALIZERS:
+        raise ValueError(f"unknown cache payload serializer: {serializer!r}")
+    if compressor and compressor not in _KNOWN_COMPRESSORS:
+        raise ValueError(f"unknown cache payload compressor: {compressor!r}")
+    if serializer == "bson" and compressor:
+        raise ValueError("bson payloads are stored as documents and can't be compressed")
+    if serializer != "bson" and serializer not in _SERIALIZERS:
+        log.warning("%s is not installed; cache payloads use %s", serializer, _FALLBACK[serializer])
+        serializer = _FALLBACK[serializer]
+    if compressor and compressor not in _COMPRESSORS:
+        log.warning("%s is not installed; cache payloads use %s", compressor, _FALLBACK[compressor])
+        compressor = _FALLBACK[compressor]
+    return PayloadCodec(serializer, compressor or None, min_bytes)
+
+
+def parse_codecs(spec: str, min_bytes: int = 1024) -> Dict[str, PayloadCodec]:
+    """
+    "px=msgpack,suggest=json+zlib,*=bson" -> {namespace: codec}. The "*"
+    entry covers every other namespace (plain BSON when not given).
+    """
+    codecs = {DEFAULT_NAMESPACE: PayloadCodec(min_bytes=min_bytes)}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        namespace, sep, codec = part.partition("=")
+        if not sep:
+            raise ValueError(f"cache codec entry must be namespace=codec: {part.strip()!r}")
+        codecs[namespace.strip()] = parse_codec(codec, min_bytes)
+    return codecs
@@ -0,0 +1,95 @@
+"""
+Sorted-array prefix index for typeahead.
+
+Each item is indexed under a few lowercase terms (name, symbol, ...). Terms
+live in one sorted list, so every term starting with a prefix sits in one
+contiguous run found with bisect. Matches are ranked by:
+
+  1. popular items (those with a rank) before the rest;
+  2. among popular items, by rank, with an exact term match counting as
+     EXACT_MATCH_BOOST times more popular ("eth" -> Ethereum, but "bit" ->
+     Bitcoin rather than a minor coin whose symbol is BIT);
+  3. exact matches before prefix matches;
+  4. then the item's own tiebreak (shorter names first by default).
+
+Very short prefixes match a large part of the list, so the results for
+every prefix up to `precompute_len` characters are computed at build time.
+"""
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+EXACT_MATCH_BOOST = 4
+
+
+class PrefixIndex(Generic[T]):
+    def __init__(
+        self,
+        items: Iterable[T],
+        terms: Callable[[T], Iterable[str]],
+        rank: Callable[[T], Optional[int]] = lambda item: None,
+        tiebreak: Callable[[T], Tuple] = lambda item: (),
+        precompute_len: int = 2,
+        precompute_limit: int = 50,
+    ):
+        self.items: List[T] = list(items)
+        self._ranks = [rank(it) for it in self.items]
+        self._tiebreaks = [tiebreak(it) for it in self.items]
+        self._item_terms = [tuple({t.lower().strip() for t in terms(it) if t and t.strip()}) for it in self.items]
+        pairs = sorted((t, i) for i, ts in enumerate(self._item_terms) for t in ts)
+        self._terms = [t for t, _ in pairs]
+        self._ids = [i for _, i in pairs]
+        self.precompute_limit = precompute_limit
+        self._precomputed: Dict[str, Tuple[List[int], int]] = {}
+        for prefix in sorted({t[:n] for t in self._terms for n in range(1, precompute_len + 1) if len(t) >= n}):
+            self._precomputed[prefix] = self._rank(prefix, precompute_limit)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _key(self, i: int, exact: bool) -> Tuple:
+        rank = self._ranks[i]
+        if rank is None:
+            return (1, 0.0, not exact, self._tiebreaks[i])
+        return (0, rank / EXACT_MATCH_BOOST if exact else rank, not exact, self._tiebreaks[i])
+
+    def _rank(self, prefix: str, limit: int) -> Tuple[List[int], int]:
+        """(best `limit` item ids, total number of matching items)."""
+        best: Dict[int, bool] = {}  # item -> has an exact term match
+        pos = bisect_left(self._terms, prefix)
+        terms, ids = self._terms, self._ids
+        while pos < len(terms) and terms[pos].startswith(prefix):
+            i = ids[pos]
+            best[i] = best.get(i, False) or terms[pos] == prefix
+            pos += 1
+        return nsmallest(limit, best, key=lambda i: self._key(i, best[i])), len(best)
+
+    def search_ids(self, prefix: str, limit: int = 10) -> Tuple[List[int], bool]:
+        """
+        Ranked ids of the items matching `prefix` (see `items`), and whether
+        that is every match rather than just the top `limit`.
+        """
+        prefix = prefix.lower().strip()
+        if not prefix or limit <= 0:
+            return [], False
+        hit = self._precomputed.get(prefix) if limit <= self.precompute_limit else None
+        ranked, total = hit if hit is not None else self._rank(prefix, limit)
+        return ranked[:limit], total <= limit
+
+    def narrow(self, ids: List[int], prefix: str) -> List[int]:
+        """
+        Re-rank `ids` (every match of a shorter prefix) for the longer
+        `prefix`, without touching the rest of the index.
+        """
+        prefix = prefix.lower().strip()
+        exact: Dict[int, bool] = {}
+        for i in ids:
+            ts = self._item_terms[i]
+            if any(t.startswith(prefix) for t in ts):
+                exact[i] = prefix in ts
+        return sorted(exact, key=lambda i: self._key(i, exact[i]))
+
+    def search(self, prefix: str, limit: int = 10) -> List[T]:
+        return [self.items[i] for i in self.search_ids(prefix, limit)[0]]
@@ -1,8 +1,149 @@
+"""
+Request log middleware.
+
+Records are queued in memory and written to `req_logs` by a background task
+with insert_many, once REQ_LOG_BATCH_SIZE records are waiting or every
+REQ_LOG_FLUSH_SECONDS, so a request never waits on a Mongo round trip.
+When the queue (REQ_LOG_QUEUE_MAX) is full, REQ_LOG_OVERFLOW decides:
+  drop_newest  the new record is dropped (default)
+  drop_oldest  the oldest queued record is dropped
+  block        the request writes a batch itself before queueing (backpressure)
+Whatever is queued at shutdown is flushed. Each flushed batch also updates
+the per-minute latency rollups (see request_metrics.py), whether or not its
+raw insert succeeds.
+"""
+import asyncio
+import logging
+import os
 import time
-from typing import Callable
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
 from fastapi import Request
+from prometheus_client import Counter, Gauge
 from starlette.responses import Response
-from app.db.mongo import get_db
+from app.core.request_metrics import save_rollups
+from app.db.mongo import get_async_db
+
+REQ_LOG_BATCH_SIZE = int(os.getenv("REQ_LOG_BATCH_SIZE", "200"))
+REQ_LOG_FLUSH_SECONDS = float(os.getenv("REQ_LOG_FLUSH_SECONDS", "1.0"))
+REQ_LOG_QUEUE_MAX = int(os.getenv("REQ_LOG_QUEUE_MAX", "10000"))
+REQ_LOG_OVERFLOW = os.getenv("REQ_LOG_OVERFLOW", "drop_newest")
+
+LOGS_FLUSHED = Counter("request_logs_flushed_total", "Request log records written to Mongo.")
+LOGS_DROPPED = Counter(
+    "request_logs_dropped_total",
+    "Request log records lost: queue full (overflow) or failed insert (error).",
+    ["reason"],
+)
+LOGS_QUEUED = Gauge("request_logs_queue_depth", "Request log records waiting to be written.")
+
+log = logging.getLogger(__name__)
+
+
+class RequestLogWriter:
+    def __init__(
+        self,
+        batch_size: int = REQ_LOG_BATCH_SIZE,
+        flush_seconds: float = REQ_LOG_FLUSH_SECONDS,
+        max_queue: int = REQ_LOG_QUEUE_MAX,
+        overflow: str = REQ_LOG_OVERFLOW,
+    ):
+        if overflow not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"unknown REQ_LOG_OVERFLOW policy: {overflow}")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._queue: Deque[Dict] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _offer(self, doc: Dict) -> bool:
+        """Queue `doc` unless full (drop_oldest makes room); False if it wasn't queued."""
+        if len(self._queue) >= self.max_queue:
+            if self.overflow != "drop_oldest":
+                return False
+            self._queue.popleft()
+            LOGS_DROPPED.labels("overflow").inc()
+        self._queue.append(doc)
+        LOGS_QUEUED.set(len(self._queue))
+        return True
+
+    async def submit(self, doc: Dict) -> None:
+        while not self._offer(doc):
+            if self.overflow != "block":
+                LOGS_DROPPED.labels("overflow").inc()
+                return
+            await self.flush(max_batches=1)
+        if len(self._queue) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    def _take(self) -> List[Dict]:
+        n = min(self.batch_size, len(self._queue))
+        batch = [self._queue.popleft() for _ in range(n)]
+        LOGS_QUEUED.set(len(self._queue))
+        return batch
+
+    @staticmethod
+    async def _write(batch: List[Dict]) -> None:
+        # don't crash the app if logging fails; rollups and raw logs fail
+        # independently (a failed insert is counted as dropped "error")
+        try:
+            await save_rollups(batch)
+        except Exception as e:
+            log.warning("request rollup update failed: %s", e)
+        for doc in batch:
+            doc.pop("elapsedMs", None)
+        try:
+            await get_async_db().req_logs.insert_many(batch, ordered=False)
+            LOGS_FLUSHED.inc(len(batch))
+        except Exception as e:
+            LOGS_DROPPED.labels("error").inc(len(batch))
+            log.warning("dropped %d request log records: %s", len(batch), e)
+
+    async def flush(self, max_batches: Optional[int] = None) -> None:
+        """Write queued records in batches (Motor, so the event loop isn't blocked)."""
+        done = 0
+        while max_batches is None or done < max_batches:
+            batch = self._take()
+            if not batch:
+                return
+            await self._write(batch)
+            done += 1
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write whatever is still queued."""
+        if self._task is not None:
+            # let it finish the batch in hand; cancelling mid-insert would lose it
+            self._stopping = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._wake = None
+        await self.flush()
+
+
+log_writer = RequestLogWriter()
+
 
 async def request_logger_mw(request: Request, call_next: Callable):
     start = time.perf_counter()
@@ -12,18 +153,16 @@ async def request_logger_mw(request: Request, call_next: Callable):
         status = response.status_code
         return response
     finally:
-        duration_ms = int((time.perf_counter() - start) * 1000)
-        db = get_db()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        route = request.scope.get("route")
         doc = {
             "method": request.method,
             "path": request.url.path,
+            "route": getattr(route, "path", None),
             "query": dict(request.query_params),
             "status": status,
-            "durationMs": duration_ms,
+            "durationMs": int(elapsed_ms),
+            "elapsedMs": elapsed_ms,  # for the rollups only, not written to req_logs
             "createdAt": __import__("datetime").datetime.utcnow(),
         }
-        try:
-            db.req_logs.insert_one(doc)
-        except Exception:
-            # don't crash the app if logging fails
-            pass
+        await log_writer.submit(doc)
@@ -0,0 +1,152 @@
+"""
+Request rollups by minute, hour and day, maintained by the request log writer.
+
+Every flushed batch of request logs is folded into one document per
+(minute, method, route, status) in `req_rollups`, and likewise per hour in
+`req_rollups_hourly` and per day in `req_rollups_daily`. Each holds the
+count, the sum and max duration, and a latency sketch (see
+latency_sketch.py), all updated with $inc / $max. Latency over a time range
+reads whole days from the daily rollups and only the ragged ends from the
+hourly and per-minute ones: at most about 30 + 2*23 + 2*59 documents per
+route and status for a 30-day window, however many requests were logged,
+instead of scanning `req_logs`.
+Routes are the path templates ("/history/stock", "/assets/{id}"), so
+client-chosen paths can't create unbounded rollups.
+
+Rollups count served requests independently of the raw logs: a batch whose
+`req_logs` insert fails is still rolled up, so /logs/latency can count more
+requests than `req_logs` holds. The gap is request_logs_dropped_total
+{reason="error"}. Records dropped on queue overflow (reason="overflow") are
+in neither.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core import latency_sketch
+from app.db.mongo import get_async_db
+
+UNMATCHED_ROUTE = "<unmatched>"
+QUANTILES = (0.5, 0.95, 0.99)
+
+# (time field, collection, span), coarsest first
+LEVELS = (
+    ("day", "req_rollups_daily", timedelta(days=1)),
+    ("hour", "req_rollups_hourly", timedelta(hours=1)),
+    ("minute", "req_rollups", timedelta(minutes=1)),
+)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _floor(dt: datetime, span: timedelta) -> datetime:
+    return _EPOCH + (_utc(dt) - _EPOCH) // span * span
+
+
+def rollup_updates(
+    logs: Iterable[Dict[str, Any]], field: str = "minute", span: timedelta = timedelta(minutes=1)
+) -> List[UpdateOne]:
+    """One upsert per (`field`, method, route, status) in `logs`, `field` being the start of its `span`."""
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for doc in logs:
+        key = (_floor(doc["createdAt"], span), doc["method"], doc.get("route") or UNMATCHED_ROUTE, doc["status"])
+        # unrounded, so sub-ms requests and bucket edges aren't skewed by int truncation
+        ms = doc.get("elapsedMs", doc["durationMs"])
+        g = groups.setdefault(key, {"count": 0, "sumMs": 0, "maxMs": 0, "h": {}})
+        g["count"] += 1
+        g["sumMs"] += ms
+        g["maxMs"] = max(g["maxMs"], ms)
+        b = latency_sketch.bucket(ms)
+        g["h"][b] = g["h"].get(b, 0) + 1
+
+    updates = []
+    for (at, method, route, status), g in groups.items():
+        inc = {"count": g["count"], "sumMs": g["sumMs"], **{f"h.{b}": n for b, n in g["h"].items()}}
+        updates.append(UpdateOne(
+            {field: at, "method": method, "route": route, "status": status},
+            {"$inc": inc, "$max": {"maxMs": g["maxMs"]}},
+            upsert=True,
+        ))
+    return updates
+
+
+async def save_rollups(logs: List[Dict[str, Any]]) -> None:
+    if not logs:
+        return
+    db = get_async_db()
+    await asyncio.gather(*(
+        db[collection].bulk_write(rollup_updates(logs, field, span), ordered=False)
+        for field, collection, span in LEVELS
+    ))
+
+
+def read_plan(start: datetime, end: datetime, levels=LEVELS) -> List[Tuple[str, str, datetime, datetime]]:
+    """
+    [start, end) as (field, collection, from, to) ranges: whole days from the
+    daily rollups, the hours around them from the hourly ones, and the
+    minutes at either end (the one `start` falls in included) per minute.
+    """
+    start, end = _utc(start), _utc(end)
+    field, collection, span = levels[0]
+    if len(levels) == 1:
+        return [(field, collection, _floor(start, span), end)] if start < end else []
+    lo = -(-(start - _EPOCH) // span) * span + _EPOCH  # ceil
+    hi = _floor(end, span)
+    if lo >= hi:
+        return read_plan(start, end, levels[1:])
+    return read_plan(start, lo, levels[1:]) + [(field, collection, lo, hi)] + read_plan(hi, end, levels[1:])
+
+
+def _summary(count: int, sum_ms: float, max_ms: float, sketch: Dict[str, int]) -> Dict[str, Any]:
+    q = latency_sketch.quantiles(sketch, QUANTILES)
+    return {
+        "count": count,
+        "meanMs": round(sum_ms / count, 3) if count else None,
+        "maxMs": round(max_ms, 3) if count else None,
+        "p50Ms": q.get(0.5),
+        "p95Ms": q.get(0.95),
+        "p99Ms": q.get(0.99),
+    }
+
+
+async def latency_summary(
+    start: datetime,
+    end: datetime,
+    method: Optional[str] = None,
+    route: Optional[str] = None,
+    status: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Request count and latency over [start, end), overall and per (method, route)."""
+    filters: Dict[str, Any] = {}
+    for field, value in (("method", method), ("route", route), ("status", status)):
+        if value is not None:
+            filters[field] = value
+
+    total = {"count": 0, "sumMs": 0, "maxMs": 0, "h": {}}
+    per_route: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    db = get_async_db()
+    for field, collection, lo, hi in read_plan(start, end):
+        async for doc in db[collection].find({field: {"$gte": lo, "$lt": hi}, **filters}, {"_id": 0}):
+            for acc in (total, per_route.setdefault((doc["method"], doc["route"]), {"count": 0, "sumMs": 0, "maxMs": 0, "h": {}})):
+                acc["count"] += doc.get("count", 0)
+                acc["sumMs"] += doc.get("sumMs", 0)
+                acc["maxMs"] = max(acc["maxMs"], doc.get("maxMs", 0))
+                for b, n in (doc.get("h") or {}).items():
+                    acc["h"][b] = acc["h"].get(b, 0) + n
+
+    routes = [
+        {"method": m, "route": r, **_summary(a["count"], a["sumMs"], a["maxMs"], a["h"])}
+        for (m, r), a in per_route.items()
+    ]
+    routes.sort(key=lambda x: x["count"], reverse=True)
+    return {
+        "from": start,
+        "to": end,
+        **_summary(total["count"], total["sumMs"], total["maxMs"], total["h"]),
+        "routes": routes,
+    }
@@ -0,0 +1,47 @@
+"""
+Fast JSON responses.
+
+FastAPI passes a returned dict through `jsonable_encoder` (a Python-level
+walk of every value) before `json.dumps`. Routes whose payloads are already
+JSON-safe (str / int / float / bool / None, lists, dicts; history series,
+aggregate assets) return `FastJSONResponse(payload)` and skip that walk;
+it serializes with orjson when installed, else with compact `json.dumps`.
+It is also the app's default response class, so other routes still get
+the faster dump after FastAPI's encoding.
+"""
+import json
+import math
+from typing import Any
+
+import numpy as np
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+def _plain(value: Any) -> Any:
+    """What orjson would write, as plain Python: NaN / inf as None, numpy as lists and scalars."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return _plain(value.tolist())
+    return value
+
+
+def json_bytes(content: Any) -> bytes:
+    if orjson is not None:
+        # NaN / inf become null, numpy scalars and arrays are accepted
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_plain(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
@@ -0,0 +1,86 @@
+"""
+Price series as parallel NumPy arrays, and their wire formats.
+
+/history/* builds a Series straight from the store (no per-point dicts)
+and encodes it in the format the client asked for (`format=` or `Accept`):
+
+  points    application/json                           [{"t": ms, "y": price}, ...] (default)
+  columnar  application/vnd.aggregator.columnar+json   {"t": [...], "y": [...]}
+  delta     application/vnd.aggregator.delta+json      {"t0": ms, "dt": [t1 - t0, ...], "y": [...]}
+  binary    application/vnd.aggregator.series          packed little-endian bytes:
+            uint32 n, then n int64 timestamps (unix ms), then n float64 prices
+"""
+import struct
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Union
+
+import numpy as np
+
+MEDIA_TYPES = {
+    "points": "application/json",
+    "columnar": "application/vnd.aggregator.columnar+json",
+    "delta": "application/vnd.aggregator.delta+json",
+    "binary": "application/vnd.aggregator.series",
+}
+FORMAT_PATTERN = "^(" + "|".join(MEDIA_TYPES) + ")$"
+
+
+class Series(NamedTuple):
+    t: np.ndarray  # int64 unix ms, ascending
+    y: np.ndarray  # float64
+
+    @classmethod
+    def empty(cls) -> "Series":
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_points(cls, points: Iterable[Dict[str, Any]]) -> "Series":
+        points = list(points)
+        return cls(
+            np.fromiter((p["t"] for p in points), dtype=np.int64, count=len(points)),
+            np.fromiter((p["y"] for p in points), dtype=np.float64, count=len(points)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def take(self, idx: np.ndarray) -> "Series":
+        return Series(self.t[idx], self.y[idx])
+
+    def to_points(self):
+        return [{"t": t, "y": y} for t, y in zip(self.t.tolist(), self.y.tolist())]
+
+
+def negotiate(fmt: Optional[str], accept: Optional[str]) -> str:
+    """The explicit `format`, else the first known media type in Accept, else points."""
+    if fmt:
+        return fmt
+    by_type = {media: name for name, media in MEDIA_TYPES.items()}
+    for part in (accept or "").split(","):
+        name = by_type.get(part.split(";")[0].strip().lower())
+        if name:
+            return name
+    return "points"
+
+
+def encode(series: Series, fmt: str) -> Union[Any, bytes]:
+    """The `series` field for JSON formats, or the whole body for binary."""
+    if fmt == "columnar":
+        return {"t": series.t.tolist(), "y": series.y.tolist()}
+    if fmt == "delta":
+        if not len(series):
+            return {"t0": None, "dt": [], "y": []}
+        return {"t0": int(series.t[0]), "dt": np.diff(series.t).tolist(), "y": series.y.tolist()}
+    if fmt == "binary":
+        return (
+            struct.pack("<I", len(series))
+            + series.t.astype("<i8", copy=False).tobytes()
+            + series.y.astype("<f8", copy=False).tobytes()
+        )
+    return series.to_points()
+
+
+def decode_binary(body: bytes) -> Series:
+    (n,) = struct.unpack_from("<I", body)
+    t = np.frombuffer(body, dtype="<i8", count=n, offset=4)
+    y = np.frombuffer(body, dtype="<f8", count=n, offset=4 + 8 * n)
+    return Series(t.astype(np.int64), y.astype(np.float64))
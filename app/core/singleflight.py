@@ -0,0 +1,90 @@
+"""
+In-process single-flight: concurrent callers asking for the same key share
+one in-flight call instead of each hitting the upstream.
+
+The shared call runs as its own task and callers await it through
+asyncio.shield, so a caller that disconnects does not cancel the fetch the
+others are waiting on.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Keys requested through a single-flight group, by whether the caller led "
+    "the fetch or was coalesced onto one already in flight.",
+    ["flight", "role"],
+)
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def _register(self, key: Hashable, fut: asyncio.Future) -> None:
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda f, k=key: self._forget(k, f))
+
+    def _forget(self, key: Hashable, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # mark the outcome as retrieved even if every caller went away
+        if not fut.cancelled():
+            fut.exception()
+
+    def _join(self, key: Hashable):
+        fut = self._inflight.get(key)
+        if fut is not None:
+            SINGLEFLIGHT_CALLS.labels(self.name, "coalesced").inc()
+        return fut
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key at a time; concurrent callers get its result (or error)."""
+        fut = self._join(key)
+        if fut is None:
+            SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc()
+            fut = asyncio.ensure_future(fn())
+            self._register(key, fut)
+        return await asyncio.shield(fut)
+
+    async def do_many(
+        self,
+        keys: Iterable[Hashable],
+        fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, T]]],
+    ) -> Dict[Hashable, T]:
+        """
+        Batched variant for upstreams that take many keys per call.
+        Keys already in flight are joined; the rest go to one fn(missing_keys)
+        call, which returns {key: value} (absent keys resolve to None).
+        """
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        fresh: List[Hashable] = []
+        for key in dict.fromkeys(keys):
+            fut = self._join(key)
+            if fut is None:
+                fresh.append(key)
+            else:
+                waiting[key] = fut
+
+        if fresh:
+            SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc(len(fresh))
+            batch = asyncio.ensure_future(fn(fresh))
+            for key in fresh:
+                fut = asyncio.ensure_future(_pick(batch, key))
+                self._register(key, fut)
+                waiting[key] = fut
+
+        values = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+        return dict(zip(waiting.keys(), values))
+
+
+async def _pick(batch: Awaitable[Dict], key: Hashable):
+    return (await batch).get(key)
@@ -0,0 +1,26 @@
+"""
+Symbols as clients send them: a CSV mixing CoinGecko ids and stock tickers.
+"""
+import re
+from typing import List
+
+# Exchange tickers: letters and digits, with "." or "-" for share classes (BRK.B, RDS-A).
+_TICKER = re.compile(r"[A-Z][A-Z0-9]{0,9}(?:[.-][A-Z0-9]{1,4})?")
+
+
+def classify(symbol: str) -> str:
+    """
+    Very simple heuristic:
+    - if it's ALL UPPERCASE -> treat as stock ticker
+    - else -> treat as crypto (CoinGecko id)
+    """
+    return "stock" if symbol and symbol.upper() == symbol else "crypto"
+
+
+def normalize_symbols(csv: str) -> List[str]:
+    return [s.strip() for s in csv.split(",") if s.strip()]
+
+
+def is_ticker(symbol: str) -> bool:
+    """Whether `symbol` looks like a stock ticker (not whether it is listed)."""
+    return _TICKER.fullmatch(symbol) is not None
@@ -0,0 +1,103 @@
+"""
+LRU cache of typeahead results with prefix-extension reuse.
+
+Entries are keyed by (kind, normalized prefix, limit), plus the version
+of the data they came from, so results from a replaced index are never
+reused. A result that holds every match for its prefix is also stored as
+complete, under limit None.
+A complete entry answers the same prefix for any limit. It also answers any
+longer prefix: typing "appl" after "app" can only narrow the "app" matches,
+so the narrowed set is computed from them and is itself complete. No index
+scan or upstream call is needed.
+
+Keys and complete results come from client input, so entries are held in a
+BoundedCache ("typeahead") capped by count and by approximate bytes.
+"""
+import os
+from typing import Callable, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from prometheus_client import Counter
+
+from app.core.bounded_cache import BoundedCache
+
+T = TypeVar("T")
+
+TYPEAHEAD_CACHE_MAX_ENTRIES = int(os.getenv("TYPEAHEAD_CACHE_MAX_ENTRIES", "4096"))
+TYPEAHEAD_CACHE_MAX_BYTES = int(os.getenv("TYPEAHEAD_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+TYPEAHEAD_LOOKUPS = Counter(
+    "typeahead_cache_lookups_total",
+    "Typeahead lookups by how they were answered: hit, narrowed (filtered a "
+    "cached shorter prefix) or miss.",
+    ["kind", "outcome"],
+)
+
+
+def normalize_prefix(prefix: str) -> str:
+    return " ".join(prefix.lower().split())
+
+
+class TypeaheadCache(Generic[T]):
+    def __init__(
+        self,
+        max_entries: int = TYPEAHEAD_CACHE_MAX_ENTRIES,
+        max_bytes: int = TYPEAHEAD_CACHE_MAX_BYTES,
+        name: str = "typeahead",
+    ):
+        self._cache: BoundedCache[List[T]] = BoundedCache(name, max_entries=max_entries, max_bytes=max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def bytes(self) -> int:
+        return self._cache.bytes
+
+    def _get(self, key: Tuple) -> Optional[List[T]]:
+        return self._cache.get(key)
+
+    def _put(self, key: Tuple, values: List[T]) -> None:
+        self._cache.put(key, values)
+
+    def invalidate(self, kind: Optional[str] = None) -> None:
+        """Drop every entry (of one kind), e.g. after the underlying list was rebuilt."""
+        self._cache.invalidate(None if kind is None else [k for k in self._cache.keys() if k[0] == kind])
+
+    def get_or_compute(
+        self,
+        kind: str,
+        prefix: str,
+        limit: int,
+        compute: Callable[[str, int], Tuple[List[T], bool]],
+        narrow: Callable[[List[T], str], List[T]],
+        version: Hashable = None,
+    ) -> List[T]:
+        """
+        Results for `prefix`, from the cache when possible.
+          compute(prefix, limit) -> (top `limit` results, whether that is all matches)
+          narrow(all matches of a shorter prefix, prefix) -> all matches of `prefix`, ranked
+        """
+        prefix = normalize_prefix(prefix)
+        values = self._get((kind, version, prefix, limit))
+        if values is None:
+            complete = self._get((kind, version, prefix, None))
+            values = complete[:limit] if complete is not None else None
+        if values is not None:
+            TYPEAHEAD_LOOKUPS.labels(kind, "hit").inc()
+            return values
+
+        for n in range(len(prefix) - 1, 0, -1):
+            shorter = self._get((kind, version, prefix[:n], None))
+            if shorter is not None:
+                matches = narrow(shorter, prefix)
+                self._put((kind, version, prefix, None), matches)
+                TYPEAHEAD_LOOKUPS.labels(kind, "narrowed").inc()
+                return matches[:limit]
+
+        TYPEAHEAD_LOOKUPS.labels(kind, "miss").inc()
+        values, is_complete = compute(prefix, limit)
+        self._put((kind, version, prefix, None if is_complete else limit), values)
+        return values
+
+
+suggest_cache: TypeaheadCache = TypeaheadCache()
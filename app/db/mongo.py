@@ -1,22 +1,63 @@
 import os
 from datetime import timezone
-from pymongo import MongoClient
 
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB = os.getenv("MONGODB_DB", "aggregator")
+# Connection pool per client (pymongo defaults: 100 / 0)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+# Motor runs each operation on its own thread pool, read once at import; its
+# default (5 per CPU) would cap in-flight queries well below the connection pool.
+os.environ.setdefault("MOTOR_MAX_WORKERS", str(MONGODB_MAX_POOL_SIZE))
+
+from pymongo import MongoClient  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase  # noqa: E402
 
 _client = None
 _db = None
+_async_client = None
+_async_db = None
+
+
+def _client_options() -> dict:
+    # Make datetimes timezone-aware when read from Mongo
+    return {
+        "tz_aware": True,
+        "tzinfo": timezone.utc,
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+    }
 
 def get_client() -> MongoClient:
     global _client
     if _client is None:
-        # Make datetimes timezone-aware when read from Mongo
-        _client = MongoClient(MONGODB_URI, tz_aware=True, tzinfo=timezone.utc)
+        _client = MongoClient(MONGODB_URI, **_client_options())
     return _client
 
 def get_db():
+    """Synchronous database, for scripts and code that runs in worker threads."""
     global _db
     if _db is None:
         _db = get_client()[MONGODB_DB]
     return _db
+
+def get_async_client() -> AsyncIOMotorClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncIOMotorClient(MONGODB_URI, **_client_options())
+    return _async_client
+
+def get_async_db() -> AsyncIOMotorDatabase:
+    """Motor database for request handlers; opened on first use, closed by close_async_client()."""
+    global _async_db
+    if _async_db is None:
+        _async_db = get_async_client()[MONGODB_DB]
+    return _async_db
+
+def close_async_client() -> None:
+    """Shutdown hook: close the Motor client's pool (a later get_async_db() opens a new one)."""
+    global _async_client, _async_db
+    if _async_client is not None:
+        _async_client.close()
+    _async_client = None
+    _async_db = None
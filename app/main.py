@@ -1,33 +1,69 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api.routes_crypto import router as crypto_router
 from app.api.routes_stocks import router as stocks_router
 from app.api.routes_aggregate import router as aggregate_router
 from app.api.routes_cache import router as cache_router 
-from app.core.request_logging import request_logger_mw
+from app.core.request_logging import log_writer, request_logger_mw
 from app.api.routes_logs import router as logs_router
 from app.web.routes_ui import router as ui_router
 from app.api.routes_assets import router as assets_router
 from app.api.routes_suggest import router as suggest_router
 from app.web.routes_sections import router as sections_router
 from app.api.routes_history import router as history_router
+from app.api.routes_analytics import router as analytics_router
+from app.api.routes_stream import router as stream_router
+from app.adapters.http_client import aclose_clients
+from app.core.compression import CompressionMiddleware
+from app.core.responses import FastJSONResponse
+from app.db.mongo import close_async_client
+from app.services.coin_list_service import warm_up as warm_up_coin_list
+from app.services.prefetcher import PREFETCH_ENABLED, prefetcher
+from app.services.price_stream import hub as price_hub
+from app.services import stock_list_service
 from prometheus_fastapi_instrumentator import Instrumentator
 
 
-app = FastAPI(title="API Aggregator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # coin list for /suggest/crypto from its Mongo snapshot, off the event loop
+    await asyncio.to_thread(warm_up_coin_list)
+    log_writer.start()  # batched req_logs inserts
+    # ticker index for /suggest/stocks, refreshed from LISTING_STATUS
+    await stock_list_service.start()
+    if PREFETCH_ENABLED:
+        prefetcher.start()  # keep watched symbols warm in the cache
+    price_hub.start()  # shared polling for /stream/prices
+    yield
+    await price_hub.stop()
+    await prefetcher.stop()
+    await stock_list_service.stop()
+    await log_writer.stop()  # write out queued request logs
+    # close pooled upstream connections
+    await aclose_clients()
+    close_async_client()  # Motor pool, after the log flush above
+
+
+app = FastAPI(title="API Aggregator", lifespan=lifespan, default_response_class=FastJSONResponse)
 app.include_router(crypto_router)
 app.include_router(stocks_router)
 app.include_router(aggregate_router)
 app.include_router(cache_router)    
 app.middleware("http")(request_logger_mw) 
+app.add_middleware(CompressionMiddleware)  # gzip / brotli, see app/core/compression.py
 app.include_router(logs_router)   
 app.include_router(ui_router)
 app.include_router(assets_router)
 app.include_router(suggest_router)
 app.include_router(sections_router)
 app.include_router(history_router)
+app.include_router(analytics_router)
+app.include_router(stream_router)
 Instrumentator().instrument(app).expose(app, endpoint="/metrics")
 
 
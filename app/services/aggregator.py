@@ -1,101 +1,337 @@
-
 from __future__ import annotations
+import asyncio
+import logging
+import os
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Any, Awaitable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.adapters.coingecko import fetch_simple_price_async
+from app.adapters.alphavantage import fetch_quote_async
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, PRIORITY_QUOTE, RateLimited
+from app.adapters.circuit import CircuitOpen, is_upstream_failure
+from app.core.http_cache import Freshness
+from app.core.symbols import classify, normalize_symbols
+from app.core.singleflight import SingleFlight
+from app.services.cache_service import cache_state, fresh_until, get_cache_many, set_cache_many
+from app.services.last_good_service import get_last_good_many, save_last_good
+
+# Max upstream calls one aggregate request keeps in flight at once.
+AGG_MAX_CONCURRENCY = int(os.getenv("AGG_MAX_CONCURRENCY", "8"))
+
+# How long past its TTL an entry may still be served (meta.cache = "stale")
+# while it is refreshed in the background. 0 disables stale-while-revalidate.
+AGG_STALE_TTL_SECONDS = int(os.getenv("AGG_STALE_TTL_SECONDS", "300"))
+
+log = logging.getLogger(__name__)
+
+# Concurrent misses for the same symbol share one fetch + cache write.
+_crypto_flight = SingleFlight("coingecko")
+_stock_flight = SingleFlight("alphavantage")
+
+
+def _source_for(symbol: str) -> str:
+    return "alphavantage" if classify(symbol) == "stock" else "coingecko"
+
+
+def asset_cache_key(symbol: str, vs: str = "usd") -> str:
+    """Per-asset cache key: px::<source>::<symbol>::<vs-currency>."""
+    return f"px::{_source_for(symbol)}::{symbol}::{vs}"
+
+
+def _cache_state(per_asset: Dict[str, str]) -> str:
+    """Roll per-asset hit/stale/miss up into "hit" | "stale" | "miss" | "partial"."""
+    states = set(per_asset.values())
+    if states == {"hit"}:
+        return "hit"
+    if "miss" not in states and states:
+        return "stale"
+    if states - {"miss"}:
+        return "partial"
+    return "miss"
+
+
+async def _gather_or_cancel(aws: List[Awaitable]) -> List:
+    """Like asyncio.gather, but cancels the siblings as soon as one call fails."""
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+
+async def _fetch_crypto_chunk(crypto_ids: List[str], now: datetime, sem: asyncio.Semaphore) -> List[Dict]:
+    # CoinGecko expects ids lowercased by design, and takes them all in one call
+    async with sem:
+        price_map = await fetch_simple_price_async(crypto_ids, ["usd"])  # { "bitcoin": {"usd": 12345.0}, ... }
+    assets = []
+    for cid in crypto_ids:
+        usd = price_map.get(cid, {}).get("usd")
+        if usd is None:
+            continue
+        assets.append({
+            "symbol": cid,
+            "type": "crypto",
+            "price": float(usd),
+            "source": "coingecko",
+            "asOf": now.isoformat(),
+        })
+    return assets
+
+
+async def _fetch_stock_asset(sym: str, now: datetime, sem: asyncio.Semaphore, priority: int = PRIORITY_QUOTE) -> Dict:
+    async with sem:
+        q = await fetch_quote_async(sym, priority=priority)  # returns the "Global Quote" dict fields
+    price = (
+        q.get("05. price")
+        or q.get("05. Price")
+        or q.get("price")
+        or q.get("05_price")
+        or 0
+    )
+    try:
+        price = float(price)
+    except Exception:
+        price = 0.0
+    as_of = q.get("07. latest trading day") or q.get("07_latest_trading_day")
+    return {
+        "symbol": sym,
+        "type": "stock",
+        "price": price,
+        "source": "alphavantage",
+        "asOf": as_of or now.date().isoformat(),
+    }
+
+
+async def _store(assets: List[Dict], ttl_seconds: int) -> None:
+    """Write fresh assets to the cache and record them as last known good."""
+    entries = {asset_cache_key(a["symbol"]): a for a in assets}
+    await set_cache_many(entries, ttl_seconds, AGG_STALE_TTL_SECONDS)
+    await asyncio.to_thread(save_last_good, entries)
+
+
+async def _load_crypto(crypto_ids: List[str], now: datetime, sem: asyncio.Semaphore, ttl_seconds: int) -> Dict[str, Dict]:
+    assets = await _fetch_crypto_chunk(crypto_ids, now, sem)
+    await _store(assets, ttl_seconds)
+    return {a["symbol"]: a for a in assets}
+
 
-from app.adapters.coingecko import fetch_simple_price
-from app.adapters.alphavantage import fetch_quote
-from app.services.cache_service import get_cache, set_cache
+async def _load_stock(sym: str, now: datetime, sem: asyncio.Semaphore, ttl_seconds: int, priority: int) -> Dict:
+    asset = await _fetch_stock_asset(sym, now, sem, priority)
+    await _store([asset], ttl_seconds)
+    return asset
 
 
-def _classify(symbol: str) -> str:
+async def _last_known_good(symbols: List[str], reason: Exception, warnings: List[str]) -> Dict[str, Dict]:
     """
-    Very simple heuristic:
-    - if it's ALL UPPERCASE -> treat as stock ticker
-    - else -> treat as crypto (CoinGecko id)
+    Stand-in for a failed upstream fetch: the last price we saved for each
+    symbol, marked lastKnownGood, with a warning saying how old it is.
+    Raises `reason` if there is nothing saved for any of them.
     """
-    return "stock" if symbol and symbol.upper() == symbol else "crypto"
+    docs = await asyncio.to_thread(get_last_good_many, [asset_cache_key(s) for s in symbols])
+    now = datetime.now(timezone.utc)
+    out: Dict[str, Dict] = {}
+    notes: List[str] = []
+    for sym in symbols:
+        doc = docs.get(asset_cache_key(sym))
+        if not doc:
+            notes.append(f"{sym}: {_source_for(sym)} unavailable and no last known price.")
+            continue
+        updated = doc["updatedAt"]
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        out[sym] = {**doc["asset"], "lastKnownGood": True}
+        notes.append(
+            f"{sym}: {_source_for(sym)} unavailable; "
+            f"serving last known price from {int((now - updated).total_seconds())}s ago."
+        )
+    if not out:
+        raise reason
+    warnings.extend(notes)
+    return out
 
 
-def _normalize_symbols(csv: str) -> List[str]:
-    return [s.strip() for s in csv.split(",") if s.strip()]
+async def _or_last_known_good(job: Awaitable[Dict[str, Dict]], symbols: List[str], warnings: List[str]) -> Dict[str, Dict]:
+    try:
+        return await job
+    except Exception as e:
+        # only an unhealthy upstream falls back; bad symbols etc. still fail
+        if not isinstance(e, CircuitOpen) and not is_upstream_failure(e):
+            raise
+        return await _last_known_good(symbols, e, warnings)
 
 
-def aggregate_with_cache(symbols_csv: str, window: int = 60) -> Dict:
+async def _fetch_assets(
+    symbols: List[str],
+    now: datetime,
+    max_concurrency: Optional[int],
+    ttl_seconds: int,
+    warnings: List[str],
+    priority: int = PRIORITY_QUOTE,
+) -> List[Dict]:
     """
-    Unified aggregator used by BOTH the API and the UI.
-    - Checks Mongo cache first (TTL).
-    - On miss, fetches live data, writes cache, returns payload.
-    - Adds meta.cache = "hit" | "miss".
+    Fetch live assets for `symbols` and write them to the cache: one batched
+    CoinGecko call for the crypto ids plus one quote per ticker, all in
+    parallel under a concurrency cap. Symbols another request is already
+    fetching are joined rather than fetched again (single-flight).
+    If an upstream is down (circuit open, timeout, 5xx), its symbols are
+    served from the last-known-good store instead, with a note in `warnings`.
+    `priority` is the Alpha Vantage rate-limit class for the quotes.
     """
-    now = datetime.now(timezone.utc)
-    symbols = _normalize_symbols(symbols_csv)
-    cache_key = f"agg::{','.join(symbols)}"
-
-    # 1) Try cache
-    cached_doc = get_cache(cache_key)
-    if cached_doc:
-        payload = cached_doc.get("payload") or cached_doc  # tolerate either shape
-        # Ensure meta.cache is visible to the UI
-        payload.setdefault("meta", {})
-        payload["meta"]["cache"] = "hit"
-        return payload
-
-    # 2) Miss -> fetch live
-    assets: List[Dict] = []
-
-    # crypto chunk (CoinGecko expects ids lowercased by design)
-    crypto_ids = [s for s in symbols if _classify(s) == "crypto"]
+    sem = asyncio.Semaphore(max(1, max_concurrency or AGG_MAX_CONCURRENCY))
+    crypto_ids = [s for s in symbols if classify(s) == "crypto"]
+    stock_syms = [s for s in symbols if classify(s) == "stock"]
+
+    async def stock(sym: str) -> Dict[str, Dict]:
+        return {sym: await _stock_flight.do(sym, lambda: _load_stock(sym, now, sem, ttl_seconds, priority))}
+
+    jobs: List[Awaitable] = []
     if crypto_ids:
-        price_map = fetch_simple_price(crypto_ids, ["usd"])  # { "bitcoin": {"usd": 12345.0}, ... }
-        for cid in crypto_ids:
-            usd = price_map.get(cid, {}).get("usd")
-            if usd is None:
-                continue
-            assets.append({
-                "symbol": cid,
-                "type": "crypto",
-                "price": float(usd),
-                "source": "coingecko",
-                "asOf": now.isoformat(),
-            })
-
-    # stock chunk (Alpha Vantage)
-    stock_syms = [s for s in symbols if _classify(s) == "stock"]
-    for sym in stock_syms:
-        q = fetch_quote(sym)  # returns the "Global Quote" dict fields
-        price = (
-            q.get("05. price")
-            or q.get("05. Price")
-            or q.get("price")
-            or q.get("05_price")
-            or 0
+        crypto = _crypto_flight.do_many(crypto_ids, lambda ids: _load_crypto(ids, now, sem, ttl_seconds))
+        jobs.append(_or_last_known_good(crypto, crypto_ids, warnings))
+    jobs.extend(_or_last_known_good(stock(sym), [sym], warnings) for sym in stock_syms)
+
+    found: Dict[str, Dict] = {}
+    for result in await _gather_or_cancel(jobs):
+        found.update(result)
+    return [found[s] for s in symbols if found.get(s)]
+
+
+async def refresh_assets(
+    symbols: List[str], ttl_seconds: int, warnings: List[str], priority: int = PRIORITY_QUOTE
+) -> List[Dict]:
+    """Fetch `symbols` live and write them to the cache, whatever is cached now."""
+    return await _fetch_assets(symbols, datetime.now(timezone.utc), None, ttl_seconds, warnings, priority)
+
+
+# Background refreshes in flight; held so they aren't garbage-collected mid-run.
+_background: Set[asyncio.Task] = set()
+
+
+def _refresh_done(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if task.cancelled() or task.exception() is None:
+        return
+    if isinstance(task.exception(), RateLimited):
+        # out of background budget; the entry stays stale until a later read
+        log.info("background refresh skipped: %s", task.exception())
+    else:
+        log.warning("background refresh failed: %s", task.exception())
+
+
+def _refresh_in_background(symbols: List[str], ttl_seconds: int, max_concurrency: Optional[int]) -> None:
+    """
+    Re-fetch stale symbols without making the caller wait (deduped by
+    single-flight). Quotes go out at background rate-limit priority, so
+    revalidation never spends the budget kept for callers waiting on a miss.
+    """
+    task = asyncio.ensure_future(
+        _fetch_assets(
+            symbols, datetime.now(timezone.utc), max_concurrency, ttl_seconds, warnings=[],
+            priority=PRIORITY_BACKGROUND,
         )
-        try:
-            price = float(price)
-        except Exception:
-            price = 0.0
-        as_of = q.get("07. latest trading day") or q.get("07_latest_trading_day")
-        assets.append({
-            "symbol": sym,
-            "type": "stock",
-            "price": price,
-            "source": "alphavantage",
-            "asOf": as_of or now.date().isoformat(),
-        })
+    )
+    _background.add(task)
+    task.add_done_callback(_refresh_done)
+
+
+class Aggregate(NamedTuple):
+    payload: Dict
+    # everything the payload is derived from (per-asset cache versions and
+    # states, warnings), so equal versions mean equal payloads
+    version: Tuple
+    freshness: Freshness
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _lifetime(doc: Dict[str, Any], now: datetime, max_age_seconds: int) -> Freshness:
+    """Seconds a cache entry stays fresh for this window, then how long it may still be served stale."""
+    expires = _as_utc(doc["expiresAt"])
+    stale_at = min(fresh_until(doc, max_age_seconds) or expires, expires)
+    fresh = int((stale_at - now).total_seconds())
+    return Freshness(max(0, fresh), max(0, int((expires - max(now, stale_at)).total_seconds())))
+
+
+async def aggregate_with_cache(symbols_csv: str, window: int = 60, max_concurrency: Optional[int] = None) -> Dict:
+    """The /aggregate payload (see aggregate_versioned)."""
+    return (await aggregate_versioned(symbols_csv, window, max_concurrency)).payload
+
+
+async def aggregate_versioned(symbols_csv: str, window: int = 60, max_concurrency: Optional[int] = None) -> Aggregate:
+    """
+    Unified aggregator used by BOTH the API and the UI.
+    - Looks every symbol up in the Mongo cache (one entry per source/symbol/vs).
+    - Fetches only the missing symbols live (see _fetch_assets), which
+      writes them back with TTL `window`, and assembles the payload from both.
+    - Entries past `window` but within AGG_STALE_TTL_SECONDS are served as
+      is and refreshed in the background (stale-while-revalidate).
+    - Adds meta.cache = "hit" | "stale" | "miss" | "partial" and the
+      per-asset states in meta.cacheByAsset.
+    - Symbols whose upstream is down are served from their last known
+      price (asset.lastKnownGood = true) and listed in meta.warnings.
+    - `timestamp` is when the newest price in the payload was fetched.
+    Also returns the payload's version and how long it stays fresh: the
+    shortest remaining TTL of the entries served (none for last-known-good
+    prices or symbols that couldn't be priced).
+    """
+    now = datetime.now(timezone.utc)
+    symbols = list(dict.fromkeys(normalize_symbols(symbols_csv)))  # dedupe, keep order
+    keys = {sym: asset_cache_key(sym) for sym in symbols}
+
+    # 1) Try cache, all symbols in one round trip
+    cached_docs = await get_cache_many(list(keys.values()))
+    ttl_seconds = max(15, int(window))  # small safety floor
+    by_symbol: Dict[str, Dict] = {}
+    per_asset: Dict[str, str] = {}
+    versions: Dict[str, datetime] = {}
+    lifetimes: List[Freshness] = []
+    for sym, key in keys.items():
+        doc = cached_docs.get(key)
+        # fresh only within the caller's window, whatever soft TTL the writer used
+        state = cache_state(doc, now, ttl_seconds) if doc and doc.get("payload") else "expired"
+        if state == "expired":
+            per_asset[sym] = "miss"
+        else:
+            by_symbol[sym] = doc["payload"]
+            per_asset[sym] = "hit" if state == "fresh" else "stale"
+            versions[sym] = _as_utc(doc.get("storedAt") or doc.get("staleAt") or doc["expiresAt"])
+            lifetimes.append(_lifetime(doc, now, ttl_seconds))
+
+    # 2) Serve stale entries now, refresh them behind the response
+    stale = [sym for sym in symbols if per_asset[sym] == "stale"]
+    if stale:
+        _refresh_in_background(stale, ttl_seconds, max_concurrency)
+
+    # 3) Fetch only what is missing
+    warnings: List[str] = []
+    missing = [sym for sym in symbols if per_asset[sym] == "miss"]
+    if missing:
+        for asset in await _fetch_assets(missing, now, max_concurrency, ttl_seconds, warnings):
+            by_symbol[asset["symbol"]] = asset
+            versions[asset["symbol"]] = now
+            lifetimes.append(Freshness() if asset.get("lastKnownGood") else Freshness(ttl_seconds, AGG_STALE_TTL_SECONDS))
+    if len(by_symbol) < len(symbols) or not lifetimes:
+        lifetimes.append(Freshness())
+
+    # crypto first, then stocks, each in request order
+    ordered = [s for s in symbols if classify(s) == "crypto"] + [s for s in symbols if classify(s) == "stock"]
+    assets = [by_symbol[s] for s in ordered if s in by_symbol]
+    timestamp = max(versions.values(), default=now).isoformat()
 
     payload = {
-        "timestamp": now.isoformat(),
+        "timestamp": timestamp,
         "assets": assets,
         "meta": {
-            "cache": "miss",
+            "cache": _cache_state(per_asset),
+            "cacheByAsset": per_asset,
             "sources": [{"name": "coingecko"}, {"name": "alphavantage"}],
-            "warnings": [],
+            "warnings": warnings,
         },
     }
-
-    # 3) Write to cache with TTL window (seconds)
-    ttl_seconds = max(15, int(window))  # small safety floor
-    set_cache(cache_key, payload, ttl_seconds)
-
-    return payload
+    version = (timestamp, tuple((s, versions.get(s), per_asset[s]) for s in ordered), tuple(warnings))
+    freshness = Freshness(min(f.max_age for f in lifetimes), min(f.stale_while_revalidate for f in lifetimes))
+    return Aggregate(payload, version, freshness)
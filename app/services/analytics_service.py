@@ -0,0 +1,179 @@
+"""
+Portfolio analytics for /analytics over the stored price history.
+
+Each symbol's daily closes come from history_service (so repeated requests
+are served from the store). They are aligned onto one calendar as a
+(days x symbols) price matrix:
+  - with any stock in the set, the days every stock traded (crypto is
+    sampled at the same days, i.e. its close on that UTC day);
+  - for crypto only, every day any of them has a close.
+A missing day takes the last close before it. All statistics are then
+NumPy operations over that matrix, with no per-day Python loop.
+"""
+import asyncio
+import math
+import os
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from app.core.series import Series
+from app.core.symbols import classify, normalize_symbols
+from app.services import history_service
+from app.services.history_service import DAY_MS
+
+ANALYTICS_MAX_SYMBOLS = int(os.getenv("ANALYTICS_MAX_SYMBOLS", "100"))
+TRADING_DAYS_PER_YEAR = 252
+CALENDAR_DAYS_PER_YEAR = 365
+
+
+class Analytics(NamedTuple):
+    returns: np.ndarray  # (days, symbols), NaN on the first day
+    volatility: np.ndarray  # (days, symbols) annualized rolling, NaN before a full window
+    max_drawdown: np.ndarray  # (symbols,) as a negative fraction
+    total_return: np.ndarray  # (symbols,)
+    correlation: np.ndarray  # (symbols, symbols) of daily returns, pairwise-complete
+    correlation_n: np.ndarray  # (symbols, symbols) days each correlation is computed over
+
+
+def daily_closes(series: Series) -> Series:
+    """Last close of each UTC day, stamped at midnight."""
+    days = series.t - series.t % DAY_MS
+    # np.unique keeps the first occurrence, so search the reversed arrays
+    last_days, idx = np.unique(days[::-1], return_index=True)
+    return Series(last_days, series.y[::-1][idx])
+
+
+def build_calendar(closes: List[Series], is_stock: List[bool]) -> np.ndarray:
+    stock_days = [s.t for s, stock in zip(closes, is_stock) if stock]
+    if stock_days:
+        calendar = stock_days[0]
+        for days in stock_days[1:]:
+            calendar = np.intersect1d(calendar, days, assume_unique=True)
+        return calendar
+    return np.unique(np.concatenate([s.t for s in closes])) if closes else np.empty(0, dtype=np.int64)
+
+
+def align(calendar: np.ndarray, closes: List[Series]) -> np.ndarray:
+    """(days x symbols) matrix of each symbol's last close at or before each calendar day."""
+    prices = np.full((len(calendar), len(closes)), np.nan)
+    for j, s in enumerate(closes):
+        idx = np.searchsorted(s.t, calendar, side="right") - 1
+        prices[:, j] = np.where(idx >= 0, s.y[np.maximum(idx, 0)], np.nan)
+    return prices
+
+
+def compute(prices: np.ndarray, vol_window: int, periods_per_year: int) -> Analytics:
+    """Statistics of a (days x symbols) price matrix; leading NaNs mark days before a symbol's history."""
+    n_days, n_symbols = prices.shape
+    if n_days == 0:
+        none = np.full(n_symbols, np.nan)
+        return Analytics(prices, prices, none, none, *pairwise_correlation(prices))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.full_like(prices, np.nan)
+        returns[1:] = prices[1:] / prices[:-1] - 1.0
+
+        volatility = np.full_like(prices, np.nan)
+        if n_days > vol_window >= 2:
+            windows = np.lib.stride_tricks.sliding_window_view(returns[1:], vol_window, axis=0)
+            volatility[vol_window:] = windows.std(axis=-1, ddof=1) * math.sqrt(periods_per_year)
+
+        valid = ~np.isnan(prices)
+        first = prices[np.argmax(valid, axis=0), np.arange(n_symbols)]
+        total_return = prices[-1] / first - 1.0
+
+        peaks = np.fmax.accumulate(prices, axis=0)
+        drawdown = np.where(valid, prices / peaks - 1.0, 0.0)
+        max_drawdown = np.where(valid.any(axis=0), drawdown.min(axis=0), np.nan)
+
+        correlation, correlation_n = pairwise_correlation(returns)
+    return Analytics(returns, volatility, max_drawdown, total_return, correlation, correlation_n)
+
+
+def pairwise_correlation(returns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pearson correlation of each pair of columns over the days both have a
+    value (a short history only shrinks its own pairs), and that day count.
+    NaN where a pair shares fewer than 2 days or a column is constant.
+    """
+    mask = np.isfinite(returns).astype(np.float64)
+    x = np.where(mask > 0, returns, 0.0)
+    n = mask.T @ mask
+    sx = x.T @ mask  # [i, j]: sum of column i over the days column j has a value
+    sxx = (x * x).T @ mask
+    sxy = x.T @ x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sx.T / n
+        var = (sxx - sx * sx / n) * (sxx.T - sx.T * sx.T / n)
+        correlation = np.where(n >= 2, cov / np.sqrt(var), np.nan)
+    return np.clip(correlation, -1.0, 1.0), n.astype(np.int64)
+
+
+def _json(a: np.ndarray):
+    """Array as (nested) lists with NaN as None, which JSON can carry."""
+    return np.where(np.isfinite(a), a, None).tolist()
+
+
+async def _closes(symbol: str, days: int) -> Series:
+    if classify(symbol) == "stock":
+        series = await history_service.stock_history(symbol, days=days)
+    else:
+        _, series = await history_service.crypto_history(symbol, days=days)
+    return daily_closes(series)
+
+
+async def analyze(symbols_csv: str, days: int = 90, vol_window: int = 20) -> Dict:
+    symbols = list(dict.fromkeys(normalize_symbols(symbols_csv)))
+    if not symbols:
+        raise ValueError("no symbols given")
+    if len(symbols) > ANALYTICS_MAX_SYMBOLS:
+        raise ValueError(f"at most {ANALYTICS_MAX_SYMBOLS} symbols per request")
+
+    results = await asyncio.gather(*(_closes(s, days) for s in symbols), return_exceptions=True)
+    warnings: List[str] = []
+    kept: List[str] = []
+    closes: List[Series] = []
+    for sym, res in zip(symbols, results):
+        if isinstance(res, BaseException):
+            warnings.append(f"{sym}: history unavailable ({res})")
+        elif not len(res):
+            warnings.append(f"{sym}: no history in the window")
+        else:
+            kept.append(sym)
+            closes.append(res)
+    if not kept:
+        # nothing to compute; surface the first upstream error to the route
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+
+    is_stock = [classify(s) == "stock" for s in kept]
+    calendar = build_calendar(closes, is_stock)
+    prices = align(calendar, closes)
+    periods_per_year = TRADING_DAYS_PER_YEAR if any(is_stock) else CALENDAR_DAYS_PER_YEAR
+    stats = compute(prices, vol_window, periods_per_year)
+
+    return {
+        "symbols": kept,
+        "calendar": calendar.tolist(),
+        "series": {
+            sym: {
+                "close": _json(prices[:, j]),
+                "returns": _json(stats.returns[:, j]),
+                "volatility": _json(stats.volatility[:, j]),
+                "maxDrawdown": _json(stats.max_drawdown[j]),
+                "totalReturn": _json(stats.total_return[j]),
+            }
+            for j, sym in enumerate(kept)
+        },
+        "correlation": _json(stats.correlation),
+        # days each correlation is computed over (the days both symbols have a return)
+        "correlationSamples": stats.correlation_n.tolist(),
+        "meta": {
+            "days": days,
+            "volWindow": vol_window,
+            "periodsPerYear": periods_per_year,
+            "warnings": warnings,
+        },
+    }
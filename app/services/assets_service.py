@@ -1,13 +1,20 @@
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
-from app.db.mongo import get_db
+from app.db.mongo import get_async_db
 
-def list_assets() -> List[Dict[str, Any]]:
-    db = get_db()
-    return list(db.assets.find({}, {"_id": 0}).sort("addedAt", -1))
+async def list_assets() -> List[Dict[str, Any]]:
+    db = get_async_db()
+    return await db.assets.find({}, {"_id": 0}).sort("addedAt", -1).to_list(None)
 
-def add_asset(symbol: str, type_: str, name: Optional[str] = None) -> Dict[str, Any]:
-    db = get_db()
+async def list_active_assets(type_: Optional[str] = None) -> List[Dict[str, Any]]:
+    db = get_async_db()
+    query: Dict[str, Any] = {"active": True}
+    if type_:
+        query["type"] = type_
+    return await db.assets.find(query, {"_id": 0}).to_list(None)
+
+async def add_asset(symbol: str, type_: str, name: Optional[str] = None) -> Dict[str, Any]:
+    db = get_async_db()
     doc = {
         "symbol": symbol.strip(),
         "type": type_.strip().lower(),  # "crypto" or "stock"
@@ -16,17 +23,16 @@ def add_asset(symbol: str, type_: str, name: Optional[str] = None) -> Dict[str,
         "addedAt": datetime.now(timezone.utc),
         "updatedAt": datetime.now(timezone.utc),
     }
-    db.assets.update_one({"symbol": doc["symbol"]}, {"$setOnInsert": doc}, upsert=True)
-    return db.assets.find_one({"symbol": doc["symbol"]}, {"_id": 0})
+    await db.assets.update_one({"symbol": doc["symbol"]}, {"$setOnInsert": doc}, upsert=True)
+    return await db.assets.find_one({"symbol": doc["symbol"]}, {"_id": 0})
 
-def update_asset(symbol: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-    db = get_db()
+async def update_asset(symbol: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    db = get_async_db()
     updates["updatedAt"] = datetime.now(timezone.utc)
-    db.assets.update_one({"symbol": symbol}, {"$set": updates})
-    return db.assets.find_one({"symbol": symbol}, {"_id": 0})
+    await db.assets.update_one({"symbol": symbol}, {"$set": updates})
+    return await db.assets.find_one({"symbol": symbol}, {"_id": 0})
 
-def delete_asset(symbol: str) -> int:
-    db = get_db()
-    res = db.assets.delete_one({"symbol": symbol})
+async def delete_asset(symbol: str) -> int:
+    db = get_async_db()
+    res = await db.assets.delete_one({"symbol": symbol})
     return res.deleted_count
-
@@ -1,36 +1,272 @@
 from __future__ import annotations
+import logging
+import os
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from app.db.mongo import get_db  # must return a synchronous pymongo.Database
+from pymongo import UpdateOne
 
+from app.core.bounded_cache import BoundedCache
+from app.core.payload_codec import DEFAULT_NAMESPACE, PayloadCodec, PayloadCodecError, decode, parse_codecs
+from app.db.mongo import get_async_db  # Motor database
 
-def get_cache(key: str) -> Optional[Dict[str, Any]]:
+log = logging.getLogger(__name__)
+
+# L1: per-process LRU in front of the Mongo `cache` collection (L2).
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "2048"))  # 0 disables L1
+# Upper bound on how long an L1 copy is trusted, since another worker may
+# rewrite or clear the Mongo entry; the entry's own expiresAt still applies.
+CACHE_L1_MAX_AGE_SECONDS = float(os.getenv("CACHE_L1_MAX_AGE_SECONDS", "5"))
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024)))  # approximate; 0 = unbounded
+
+# How payloads are stored in Mongo, per key namespace (the part before the
+# first "::"): "namespace=codec,...", "*" for the rest, plain BSON by default.
+# See app/core/payload_codec.py and scripts/bench_cache_codecs.py.
+CACHE_PAYLOAD_CODECS = os.getenv("CACHE_PAYLOAD_CODECS", "suggest=json+zlib")
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+_codecs = parse_codecs(CACHE_PAYLOAD_CODECS, CACHE_COMPRESS_MIN_BYTES)
+
+
+class L1Cache:
+    """
+    Bounded, thread-safe LRU of cache documents. Entries drop out at the
+    earlier of the document's expiresAt and `max_age` seconds after load.
+    """
+
+    def __init__(self, max_entries: int, max_age: float, max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._docs: BoundedCache[Dict[str, Any]] = BoundedCache("cache_l1", max_entries, max_bytes)
+        self._lock = threading.Lock()
+        self.stats = {"l1Hits": 0, "l1Misses": 0, "l2Hits": 0, "l2Misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def bytes(self) -> int:
+        return self._docs.bytes
+
+    @property
+    def max_bytes(self) -> int:
+        return self._docs.max_bytes
+
+    def get(self, key: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        now = now or datetime.now(timezone.utc)
+        doc = self._docs.get(key, now=now.timestamp())
+        with self._lock:
+            self.stats["l1Hits" if doc is not None else "l1Misses"] += 1
+        return dict(doc) if doc is not None else None
+
+    def put(self, doc: Dict[str, Any], now: Optional[datetime] = None) -> None:
+        now = now or datetime.now(timezone.utc)
+        until = now + timedelta(seconds=self.max_age)
+        expires = doc.get("expiresAt")
+        if expires is not None:
+            until = min(until, _as_utc(expires))
+        self._docs.put(doc["key"], dict(doc), ttl=(until - now).total_seconds(), now=now.timestamp())
+
+    def record_l2(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.stats["l2Hits"] += hits
+            self.stats["l2Misses"] += misses
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> None:
+        self._docs.invalidate(keys)
+
+
+_l1 = L1Cache(CACHE_L1_MAX_ENTRIES, CACHE_L1_MAX_AGE_SECONDS, CACHE_L1_MAX_BYTES)
+
+
+def invalidate_local(keys: Optional[List[str]] = None) -> None:
+    """Drop `keys` (or everything) from this process's L1. Mongo is untouched."""
+    _l1.invalidate(keys)
+
+
+def codec_for(key: str) -> PayloadCodec:
+    namespace = key.split("::", 1)[0]
+    return _codecs.get(namespace) or _codecs[DEFAULT_NAMESPACE]
+
+
+def _stored(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The Mongo form of a cache document: payload encoded with its namespace's codec."""
+    payload, enc = codec_for(doc["key"]).encode(doc["payload"])
+    return {**doc, "payload": payload, "enc": enc}
+
+
+def _loaded(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Inverse of _stored; None (a miss) when the payload can't be decoded here."""
+    doc.pop("_id", None)
+    enc = doc.pop("enc", None)
+    try:
+        doc["payload"] = decode(doc["payload"], enc)
+    except PayloadCodecError as e:
+        log.warning("ignoring cache entry %s: %s", doc.get("key"), e)
+        return None
+    return doc
+
+
+def _ratio(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def cache_stats() -> Dict[str, Any]:
+    """L1/L2 sizes and hit ratios for /cache/status. L2 is only consulted on an L1 miss."""
+    s = dict(_l1.stats)
+    return {
+        "l1": {
+            "size": len(_l1),
+            "maxEntries": _l1.max_entries,
+            "bytes": _l1.bytes,
+            "maxBytes": _l1.max_bytes,
+            "hits": s["l1Hits"],
+            "misses": s["l1Misses"],
+            "hitRatio": _ratio(s["l1Hits"], s["l1Misses"]),
+        },
+        "l2": {
+            "hits": s["l2Hits"],
+            "misses": s["l2Misses"],
+            "hitRatio": _ratio(s["l2Hits"], s["l2Misses"]),
+        },
+    }
+
+
+async def get_cache(key: str) -> Optional[Dict[str, Any]]:
     """
-    Return the cached document for `key` (if present and not yet TTL-purged).
+    Return the cached document for `key` (if present and not yet TTL-purged),
+    from L1 when possible, else from Mongo.
     Shape:
-      { "key": str, "payload": {...}, "expiresAt": datetime }
+      { "key": str, "payload": {...}, "storedAt": datetime, "staleAt": datetime, "expiresAt": datetime }
+    Use cache_state() to tell fresh, stale and expired-but-not-yet-purged apart.
     """
-    db = get_db()
-    doc = db.cache.find_one({"key": key})
+    doc = _l1.get(key)
+    if doc is not None:
+        return doc
+    db = get_async_db()
+    doc = await db.cache.find_one({"key": key})
+    doc = _loaded(doc) if doc else None
+    _l1.record_l2(int(doc is not None), int(doc is None))
     if not doc:
         return None
-    doc.pop("_id", None)
+    _l1.put(doc)
     return doc
 
 
-def set_cache(key: str, payload: Dict[str, Any], ttl_seconds: int = 60) -> None:
+def _deadlines(ttl_seconds: int, stale_ttl_seconds: int) -> Tuple[datetime, datetime, datetime]:
+    """
+    (storedAt, staleAt, expiresAt): now, the soft TTL, then the hard TTL
+    `stale_ttl_seconds` later. Millisecond precision, as Mongo keeps them, so
+    an entry read from L1 or from Mongo has the same storedAt (its version).
+    """
+    now = datetime.now(timezone.utc)
+    stored_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    stale_at = stored_at + timedelta(seconds=int(ttl_seconds))
+    return stored_at, stale_at, stale_at + timedelta(seconds=max(0, int(stale_ttl_seconds)))
+
+
+async def set_cache(key: str, payload: Dict[str, Any], ttl_seconds: int = 60, stale_ttl_seconds: int = 0) -> None:
     """
     Upsert a cache entry with TTL. The TTL index on `expiresAt` should exist
     (created by scripts/init_db.py). We update/insert:
       - key
-      - payload
-      - expiresAt = now + ttl_seconds (UTC)
-    """
-    db = get_db()
-    expires = datetime.now(timezone.utc) + timedelta(seconds=int(ttl_seconds))
-    db.cache.update_one(
-        {"key": key},
-        {"$set": {"key": key, "payload": payload, "expiresAt": expires}},
-        upsert=True,
-    )
\ No newline at end of file
+      - payload (encoded per codec_for(key); `enc` names the encoding)
+      - storedAt = now (UTC), which also serves as the entry's version
+      - staleAt = now + ttl_seconds (UTC), the soft TTL
+      - expiresAt = staleAt + stale_ttl_seconds, the hard TTL Mongo purges on
+    """
+    db = get_async_db()
+    stored_at, stale_at, expires = _deadlines(ttl_seconds, stale_ttl_seconds)
+    doc = {"key": key, "payload": payload, "storedAt": stored_at, "staleAt": stale_at, "expiresAt": expires}
+    await db.cache.update_one({"key": key}, {"$set": _stored(doc)}, upsert=True)
+    _l1.put(doc)
+
+
+async def get_cache_many(keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch several entries: L1 first, the rest in one Mongo round trip.
+    Returns {key: doc} for the keys that are present (same doc shape as get_cache).
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    remote: List[str] = []
+    for key in dict.fromkeys(keys):
+        doc = _l1.get(key)
+        if doc is None:
+            remote.append(key)
+        else:
+            out[key] = doc
+    if not remote:
+        return out
+    db = get_async_db()
+    async for doc in db.cache.find({"key": {"$in": remote}}):
+        doc = _loaded(doc)
+        if doc is None:
+            continue
+        out[doc["key"]] = doc
+        _l1.put(doc)
+    found = sum(1 for key in remote if key in out)
+    _l1.record_l2(found, len(remote) - found)
+    return out
+
+
+async def set_cache_many(entries: Dict[str, Dict[str, Any]], ttl_seconds: int = 60, stale_ttl_seconds: int = 0) -> None:
+    """
+    Upsert several entries ({key: payload}) with the same TTLs in one bulk write.
+    """
+    if not entries:
+        return
+    db = get_async_db()
+    stored_at, stale_at, expires = _deadlines(ttl_seconds, stale_ttl_seconds)
+    docs = [
+        {"key": key, "payload": payload, "storedAt": stored_at, "staleAt": stale_at, "expiresAt": expires}
+        for key, payload in entries.items()
+    ]
+    await db.cache.bulk_write(
+        [UpdateOne({"key": doc["key"]}, {"$set": _stored(doc)}, upsert=True) for doc in docs],
+        ordered=False,
+    )
+    for doc in docs:
+        _l1.put(doc)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def fresh_until(doc: Dict[str, Any], max_age_seconds: Optional[float] = None) -> Optional[datetime]:
+    """
+    When a cache document stops being fresh: its staleAt, or earlier when the
+    reader allows at most `max_age_seconds` since storedAt (an entry written
+    with a longer soft TTL, e.g. by the prefetcher, is no fresher for a
+    caller asking for a short window). None = fresh until it expires.
+    """
+    stale_at = doc.get("staleAt")
+    limits = [_as_utc(stale_at)] if stale_at is not None else []
+    if max_age_seconds is not None and doc.get("storedAt") is not None:
+        limits.append(_as_utc(doc["storedAt"]) + timedelta(seconds=max_age_seconds))
+    return min(limits, default=None)
+
+
+def cache_state(
+    doc: Optional[Dict[str, Any]], now: Optional[datetime] = None, max_age_seconds: Optional[float] = None
+) -> str:
+    """
+    Classify a cache document:
+      - "fresh"   before staleAt (soft TTL) and, given `max_age_seconds`,
+                  stored no longer ago than that
+      - "stale"   after that but before expiresAt (serve, but refresh)
+      - "expired" past expiresAt, or no document; Mongo's TTL monitor only
+        purges about once a minute, so this is still seen in practice.
+    Entries written without staleAt are fresh until they expire.
+    """
+    if not doc:
+        return "expired"
+    now = now or datetime.now(timezone.utc)
+    expires = doc.get("expiresAt")
+    if expires is not None and now >= _as_utc(expires):
+        return "expired"
+    until = fresh_until(doc, max_age_seconds)
+    if until is not None and now >= until:
+        return "stale"
+    return "fresh"
@@ -0,0 +1,187 @@
+"""
+CoinGecko coin list for /suggest/crypto, persisted as a Mongo snapshot.
+
+The list (several MB) and its search index live in this process. A copy is
+kept in the `snapshots` collection with its fetch time and HTTP validators.
+A restarted worker loads it at startup instead of downloading it again on
+the first keystroke. Once the copy is older than COIN_LIST_MAX_AGE_SECONDS,
+it is revalidated in a background thread with a conditional request. A 304
+only bumps the timestamp, and the suggestion that noticed keeps using the
+current list.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.adapters.coingecko import fetch_coin_list, fetch_market_ranks
+from app.core.http_cache import Freshness
+from app.core.prefix_index import PrefixIndex
+from app.core.typeahead_cache import suggest_cache
+from app.services.snapshot_service import get_snapshot, put_snapshot
+
+COIN_LIST_MAX_AGE_SECONDS = int(os.getenv("COIN_LIST_MAX_AGE_SECONDS", str(6 * 3600)))
+SNAPSHOT_KEY = "coingecko:coins"
+
+log = logging.getLogger(__name__)
+
+# Replaced wholesale (never mutated), so readers always see items and the
+# index that was built from them.
+_state: Dict[str, Any] = {
+    "items": [], "ranks": {}, "fetchedAt": 0.0, "etag": None, "lastModified": None, "index": None, "version": 0,
+}
+_refresh_lock = threading.Lock()
+_versions = itertools.count(1)  # typeahead cache version per installed index
+
+
+def build_coin_index(items: List[Dict], ranks: Optional[Dict[str, int]] = None) -> PrefixIndex:
+    ranks = ranks or {}
+    return PrefixIndex(
+        items,
+        terms=lambda it: (it["name"], it["symbol"]),
+        rank=lambda it: ranks.get(it["id"]),
+        tiebreak=lambda it: (len(it["name"]), it["name"].lower()),
+    )
+
+
+def _install(items: List[Dict], ranks: Dict[str, int], fetched_at: float, validators: Dict[str, Optional[str]]) -> None:
+    global _state
+    _state = {
+        "items": items,
+        "ranks": ranks,
+        "fetchedAt": fetched_at,
+        "etag": validators.get("etag"),
+        "lastModified": validators.get("lastModified"),
+        "index": build_coin_index(items, ranks),
+        "version": next(_versions),
+    }
+    suggest_cache.invalidate("crypto")
+
+
+def _epoch(dt: datetime) -> float:
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _snapshot_fetched_at() -> Optional[float]:
+    doc = get_snapshot(SNAPSHOT_KEY, {"fetchedAt": 1})
+    return _epoch(doc["fetchedAt"]) if doc and doc.get("fetchedAt") else None
+
+
+def load_snapshot() -> bool:
+    """Install the Mongo snapshot in this process. False if there is none."""
+    doc = get_snapshot(SNAPSHOT_KEY)
+    if not doc or not doc.get("items"):
+        return False
+    _install(doc["items"], {cid: rank for cid, rank in doc.get("ranks") or []}, _epoch(doc["fetchedAt"]), doc)
+    return True
+
+
+def _save_snapshot(state: Dict[str, Any], full: bool) -> None:
+    fields = {
+        "fetchedAt": datetime.fromtimestamp(state["fetchedAt"], timezone.utc),
+        "etag": state["etag"],
+        "lastModified": state["lastModified"],
+    }
+    if full:
+        # ranks as pairs: coin ids aren't safe as Mongo field names
+        fields.update(items=state["items"], ranks=sorted(state["ranks"].items()))
+    put_snapshot(SNAPSHOT_KEY, fields)
+
+
+def is_stale(now: Optional[float] = None) -> bool:
+    return (now or time.time()) - _state["fetchedAt"] > COIN_LIST_MAX_AGE_SECONDS
+
+
+def refresh() -> bool:
+    """
+    Bring the list up to date; True if a new list was downloaded.
+    Another worker may have refreshed the snapshot already, in which case it
+    is simply loaded. Otherwise the upstream is asked with the validators of
+    the current copy, so an unchanged list costs a 304 and no download.
+    """
+    global _state
+    with _refresh_lock:
+        now = time.time()
+        shared = _snapshot_fetched_at()
+        if shared and shared > _state["fetchedAt"] and now - shared <= COIN_LIST_MAX_AGE_SECONDS:
+            load_snapshot()
+            return False
+
+        current = _state
+        if current["items"]:
+            items, validators = fetch_coin_list(current["etag"], current["lastModified"])
+        else:
+            items, validators = fetch_coin_list()
+        if items is None:  # 304 Not Modified
+            _state = {**current, **validators, "fetchedAt": now}
+            _save_snapshot(_state, full=False)
+            return False
+
+        try:
+            ranks = fetch_market_ranks()
+        except Exception as e:
+            # suggestions still work, ranked by the previous (or no) popularity
+            log.warning("coingecko market ranks unavailable: %s", e)
+            ranks = current["ranks"]
+        _install(items, ranks, now, validators)
+        _save_snapshot(_state, full=True)
+        return True
+
+
+def _refresh_quietly() -> None:
+    try:
+        refresh()
+    except Exception as e:
+        log.warning("coin list refresh failed: %s", e)
+
+
+def refresh_in_background() -> None:
+    """Start a refresh thread unless one is already running."""
+    if _refresh_lock.locked():
+        return
+    threading.Thread(target=_refresh_quietly, name="coin-list-refresh", daemon=True).start()
+
+
+def warm_up() -> None:
+    """Startup hook: load the snapshot, then revalidate in the background if it is old (or missing)."""
+    try:
+        load_snapshot()
+    except Exception as e:
+        log.warning("coin list snapshot unavailable: %s", e)
+    if is_stale():
+        refresh_in_background()
+
+
+def get_coin_list() -> List[Dict]:
+    """
+    The current coin list. Only a process with neither a list nor a snapshot
+    waits for the download; a stale list is served while it is refreshed.
+    """
+    if not _state["items"] and not load_snapshot():
+        refresh()
+    elif is_stale():
+        refresh_in_background()
+    return _state["items"]
+
+
+def freshness(now: Optional[float] = None) -> Freshness:
+    """How much longer the installed coin list is fresh: the lifetime of suggestions built from it."""
+    if not _state["items"]:
+        return Freshness()
+    now = now or time.time()
+    return Freshness(max(0, int(_state["fetchedAt"] + COIN_LIST_MAX_AGE_SECONDS - now)))
+
+
+def suggest_crypto(prefix: str, limit: int = 10) -> List[Dict]:
+    """Coins whose name or symbol starts with `prefix`, most relevant first."""
+    get_coin_list()
+    state = _state
+    index = state["index"]
+    ids = suggest_cache.get_or_compute("crypto", prefix, limit, index.search_ids, index.narrow, version=state["version"])
+    return [
+        {"id": it["id"], "symbol": it["symbol"].upper(), "name": it["name"]}
+        for it in (index.items[i] for i in ids)
+    ]
@@ -0,0 +1,238 @@
+"""
+Price history for /history/*, persisted in the `price_history` Mongo
+time-series collection (one document per closed bar, meta = source, symbol,
+interval).
+
+A companion `history_meta` document per series records which range the
+store covers (`fromT`) and the last closed bar in it (`lastT`). A request
+reads its window from the store and only goes upstream when
+  - a new bar has closed since `lastT` (fetching only what came after it,
+    at most once per HISTORY_RESYNC_*_SECONDS), or
+  - the window starts before `fromT` (a one-off backfill).
+Bars still forming are never stored, so a stored bar never changes.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.adapters.alphavantage import fetch_daily_bars_async
+from app.adapters.coingecko import fetch_market_chart_async
+from app.core.series import Series
+from app.core.singleflight import SingleFlight
+from app.db.mongo import get_db
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+INTERVAL_MS = {"1h": HOUR_MS, "1d": DAY_MS}
+# Minimum time between two upstream checks of the same series, so a bar
+# that is late (weekends, holidays, a slow upstream) isn't asked for on every view.
+HISTORY_RESYNC_SECONDS = {
+    "1h": int(os.getenv("HISTORY_RESYNC_1H_SECONDS", "300")),
+    "1d": int(os.getenv("HISTORY_RESYNC_1D_SECONDS", "3600")),
+}
+# CoinGecko returns hourly points up to 90 days back, daily ones beyond.
+CRYPTO_HOURLY_MAX_DAYS = 90
+STOCK_DEFAULT_BARS = 30
+# TIME_SERIES_DAILY compact = last 100 trading days (~140 calendar days).
+STOCK_COMPACT_BARS = 100
+STOCK_COMPACT_DAYS = 140
+
+log = logging.getLogger(__name__)
+
+_flight = SingleFlight("history")
+
+# fetch(since_ms, now_ms) -> (points, start of the range they cover in ms)
+Fetch = Callable[[int, int], Awaitable[Tuple[List[Dict], int]]]
+
+
+@dataclass(frozen=True)
+class _StoredSeries:
+    source: str
+    symbol: str
+    interval: str
+    fetch: Fetch
+
+    @property
+    def key(self) -> str:
+        return f"{self.source}:{self.symbol}:{self.interval}"
+
+    @property
+    def meta(self) -> Dict[str, str]:
+        return {"source": self.source, "symbol": self.symbol, "interval": self.interval}
+
+
+def _dt(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def _ms(dt: datetime) -> int:
+    return int((dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp() * 1000)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def closed_bars(points: List[Dict], interval: str, now_ms: int) -> List[Dict]:
+    """
+    Points bucketed to `interval` (last point of each bucket, stamped with the
+    bucket start), dropping the bucket that hasn't closed yet. Ascending.
+    """
+    step = INTERVAL_MS[interval]
+    bars: Dict[int, float] = {}
+    for p in sorted(points, key=lambda p: p["t"]):
+        start = p["t"] - p["t"] % step
+        if start + step <= now_ms:
+            bars[start] = p["y"]
+    return [{"t": t, "y": y} for t, y in sorted(bars.items())]
+
+
+# ---- Mongo ----
+
+def _get_meta(key: str) -> Optional[Dict]:
+    return get_db().history_meta.find_one({"key": key}, {"_id": 0})
+
+
+def _put_meta(key: str, fields: Dict) -> None:
+    get_db().history_meta.update_one({"key": key}, {"$set": {"key": key, **fields}}, upsert=True)
+
+
+def _insert_bars(series: _StoredSeries, bars: List[Dict]) -> None:
+    if bars:
+        get_db().price_history.insert_many(
+            [{"t": _dt(b["t"]), "meta": series.meta, "y": b["y"]} for b in bars],
+            ordered=False,
+        )
+
+
+def _read_bars(series: _StoredSeries, start_ms: int, end_ms: int, last: Optional[int] = None) -> Series:
+    """Stored bars in [start_ms, end_ms] as arrays; only the newest `last` if given."""
+    query = {
+        "meta.source": series.source,
+        "meta.symbol": series.symbol,
+        "meta.interval": series.interval,
+        "t": {"$gte": _dt(start_ms), "$lte": _dt(end_ms)},
+    }
+    cursor = get_db().price_history.find(query, {"_id": 0, "t": 1, "y": 1})
+    docs = list(cursor.sort("t", 1) if last is None else cursor.sort("t", -1).limit(last))
+    t = np.fromiter((_ms(d["t"]) for d in docs), dtype=np.int64, count=len(docs))
+    y = np.fromiter((d["y"] for d in docs), dtype=np.float64, count=len(docs))
+    # sorts ascending, and drops bars two workers syncing at once both inserted
+    t, first = np.unique(t, return_index=True)
+    return Series(t, y[first])
+
+
+# ---- sync ----
+
+def _needs_sync(series: _StoredSeries, meta: Optional[Dict], want_from: int, now_ms: int) -> Optional[int]:
+    """The timestamp to fetch from, or None when the store already covers the request."""
+    if not meta:
+        return want_from
+    if want_from < meta["fromT"]:
+        return want_from
+    step = INTERVAL_MS[series.interval]
+    last = meta.get("lastT")
+    bar_due = last is None or now_ms >= last + 2 * step  # the bar after lastT has closed
+    if bar_due and now_ms - meta.get("syncedAt", 0) >= HISTORY_RESYNC_SECONDS[series.interval] * 1000:
+        return meta["fromT"] if last is None else last + step
+    return None
+
+
+async def _sync(series: _StoredSeries, want_from: int) -> int:
+    """Bring the store up to date for a view starting at `want_from`, which is returned."""
+    now = _now_ms()
+    meta = await asyncio.to_thread(_get_meta, series.key)
+    since = _needs_sync(series, meta, want_from, now)
+    if since is None:
+        return want_from
+    try:
+        points, covered_from = await series.fetch(since, now)
+    except Exception as e:
+        if not meta:
+            raise
+        log.warning("history sync for %s failed, serving stored bars: %s", series.key, e)
+        return want_from
+
+    bars = closed_bars(points, series.interval, now)
+    from_t, last_t = covered_from, None
+    if meta:
+        from_t, last_t = min(from_t, meta["fromT"]), meta.get("lastT")
+        # only what the store doesn't hold yet
+        bars = [b for b in bars if b["t"] < meta["fromT"] or last_t is None or b["t"] > last_t]
+    if bars:
+        last_t = max(last_t or 0, bars[-1]["t"])
+    await asyncio.to_thread(_insert_bars, series, bars)
+    await asyncio.to_thread(_put_meta, series.key, {"fromT": from_t, "lastT": last_t, "syncedAt": now})
+    return want_from
+
+
+async def _window(series: _StoredSeries, want_from: int, end_ms: int, last: Optional[int] = None) -> Series:
+    # concurrent views of one series share a sync, so bars are inserted once;
+    # a view that joined a sync for a later start then syncs for its own
+    synced_from = await _flight.do(series.key, lambda: _sync(series, want_from))
+    while synced_from > want_from:
+        synced_from = await _flight.do(series.key, lambda: _sync(series, want_from))
+    return await asyncio.to_thread(_read_bars, series, want_from, end_ms, last)
+
+
+# ---- public ----
+
+def _crypto_series(coin_id: str, interval: str) -> _StoredSeries:
+    async def fetch(since: int, now: int) -> Tuple[List[Dict], int]:
+        days = max(1, math.ceil((now - since) / DAY_MS))
+        if interval == "1h":
+            # asked for more, CoinGecko would send daily points; older hours are gone
+            days = min(days, CRYPTO_HOURLY_MAX_DAYS)
+        return await fetch_market_chart_async(coin_id, days=days, vs="usd"), now - days * DAY_MS
+
+    return _StoredSeries("coingecko", coin_id, interval, fetch)
+
+
+def _stock_series(symbol: str) -> _StoredSeries:
+    async def fetch(since: int, now: int) -> Tuple[List[Dict], int]:
+        full = now - since > STOCK_COMPACT_DAYS * DAY_MS
+        points = await fetch_daily_bars_async(symbol, full=full)
+        # a full download, or a compact one shorter than 100 bars, is the whole history
+        whole = full or len(points) < STOCK_COMPACT_BARS
+        return points, 0 if whole or not points else points[0]["t"]
+
+    return _StoredSeries("alphavantage", symbol, "1d", fetch)
+
+
+async def crypto_history(
+    coin_id: str, days: int = 30, start: Optional[int] = None, end: Optional[int] = None
+) -> Tuple[str, Series]:
+    """
+    (interval, USD prices) for the last `days` days (from midnight UTC) or for
+    [start, end] in unix ms: hourly bars for windows starting within the last
+    90 days, daily ones for anything older (CoinGecko has no older hours).
+    """
+    now = _now_ms()
+    end = end if end is not None else now
+    if start is None:
+        start = now - now % DAY_MS - days * DAY_MS
+    interval = "1h" if now - start <= CRYPTO_HOURLY_MAX_DAYS * DAY_MS else "1d"
+    series = _crypto_series(coin_id.lower(), interval)
+    return interval, await _window(series, start, end)
+
+
+async def stock_history(
+    symbol: str, days: Optional[int] = None, start: Optional[int] = None, end: Optional[int] = None
+) -> Series:
+    """Daily closes for the last `days` days or [start, end]; the last 30 bars by default."""
+    now = _now_ms()
+    end = end if end is not None else now
+    series = _stock_series(symbol.upper())
+    if start is not None:
+        return await _window(series, start, end)
+    if days is not None:
+        return await _window(series, now - now % DAY_MS - days * DAY_MS, end)
+    # 30 trading days fit in 45 calendar days
+    return await _window(series, end - 45 * DAY_MS, end, last=STOCK_DEFAULT_BARS)
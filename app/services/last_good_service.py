@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+from pymongo import UpdateOne
+
+from app.db.mongo import get_db
+
+# Last successful price per asset, kept without a TTL so /aggregate has
+# something to serve while an upstream is down (see aggregator._fetch_assets).
+
+
+def save_last_good(entries: Dict[str, Dict[str, Any]]) -> None:
+    """Upsert {key: asset} into the `last_good` collection in one bulk write."""
+    if not entries:
+        return
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    db.last_good.bulk_write(
+        [
+            UpdateOne({"key": key}, {"$set": {"key": key, "asset": asset, "updatedAt": now}}, upsert=True)
+            for key, asset in entries.items()
+        ],
+        ordered=False,
+    )
+
+
+def get_last_good_many(keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Return {key: {"key", "asset", "updatedAt"}} for the keys that have one."""
+    db = get_db()
+    out = {}
+    for doc in db.last_good.find({"key": {"$in": list(keys)}}, {"_id": 0}):
+        out[doc["key"]] = doc
+    return out
@@ -0,0 +1,136 @@
+"""
+Background refresh of watched symbols.
+
+Every active asset in the `assets` collection is re-fetched on a per-type
+interval. This keeps its cache entry fresh, so user reads are hits instead
+of paying upstream latency after each TTL expiry. Refreshes go through the
+aggregator's fetch path: single-flight with user requests, cache and
+last-known-good writes. Stocks run at background rate-limit priority, so
+they only ever use Alpha Vantage budget that quotes don't need.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter
+
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, RateLimited
+from app.services.aggregator import asset_cache_key, refresh_assets
+from app.services.assets_service import list_active_assets
+from app.services.cache_service import cache_state, get_cache_many
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_CRYPTO_INTERVAL_SECONDS = float(os.getenv("PREFETCH_CRYPTO_INTERVAL_SECONDS", "30"))
+# Alpha Vantage's free tier can't keep many tickers warm at a short interval.
+PREFETCH_STOCK_INTERVAL_SECONDS = float(os.getenv("PREFETCH_STOCK_INTERVAL_SECONDS", "300"))
+# CoinGecko ids per /simple/price call.
+PREFETCH_CRYPTO_BATCH = int(os.getenv("PREFETCH_CRYPTO_BATCH", "100"))
+
+log = logging.getLogger(__name__)
+
+PREFETCH_SYMBOLS = Counter(
+    "prefetch_symbols_total",
+    "Watched symbols handled by the background prefetcher, by outcome.",
+    ["type", "outcome"],  # refreshed | skipped (still fresh) | failed
+)
+
+
+def _watch_symbol(asset: Dict, type_: str) -> str:
+    # symbols.classify: tickers are upper case, CoinGecko ids lower case
+    symbol = asset["symbol"].strip()
+    return symbol.upper() if type_ == "stock" else symbol.lower()
+
+
+class WatchlistPrefetcher:
+    def __init__(
+        self,
+        intervals: Optional[Dict[str, float]] = None,
+        crypto_batch: int = PREFETCH_CRYPTO_BATCH,
+    ):
+        self.intervals = intervals or {
+            "crypto": PREFETCH_CRYPTO_INTERVAL_SECONDS,
+            "stock": PREFETCH_STOCK_INTERVAL_SECONDS,
+        }
+        self.crypto_batch = max(1, crypto_batch)
+        self._tasks: List[asyncio.Task] = []
+
+    def _ttl(self, type_: str) -> int:
+        # outlive the next tick so the entry never goes stale in between
+        return int(self.intervals[type_] * 1.5) + 5
+
+    async def _due(self, symbols: List[str], type_: str) -> List[str]:
+        """Symbols whose cache entry is missing or goes stale before the next tick."""
+        keys = {sym: asset_cache_key(sym) for sym in symbols}
+        docs = await get_cache_many(list(keys.values()))
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=self.intervals[type_])
+        due = []
+        for sym, key in keys.items():
+            doc = docs.get(key)
+            if doc and cache_state(doc, horizon) == "fresh":
+                continue
+            due.append(sym)
+        return due
+
+    async def _refresh(self, symbols: List[str], type_: str) -> int:
+        warnings: List[str] = []
+        try:
+            assets = await refresh_assets(symbols, self._ttl(type_), warnings, priority=PRIORITY_BACKGROUND)
+        except RateLimited:
+            raise
+        except Exception as e:
+            log.info("prefetch of %s failed: %s", ",".join(symbols), e)
+            PREFETCH_SYMBOLS.labels(type_, "failed").inc(len(symbols))
+            return 0
+        # last-known-good stand-ins were served, not fetched
+        refreshed = sum(1 for a in assets if not a.get("lastKnownGood"))
+        for w in warnings:
+            log.info("prefetch: %s", w)
+        PREFETCH_SYMBOLS.labels(type_, "refreshed").inc(refreshed)
+        PREFETCH_SYMBOLS.labels(type_, "failed").inc(len(symbols) - refreshed)
+        return refreshed
+
+    async def run_once(self, type_: str) -> int:
+        """Refresh the due watched symbols of one type; returns how many were refreshed."""
+        assets = await list_active_assets(type_)
+        symbols = list(dict.fromkeys(_watch_symbol(a, type_) for a in assets if a.get("symbol")))
+        due = await self._due(symbols, type_) if symbols else []
+        PREFETCH_SYMBOLS.labels(type_, "skipped").inc(len(symbols) - len(due))
+        if type_ == "crypto":
+            # one CoinGecko call per batch of ids
+            batches = [due[i:i + self.crypto_batch] for i in range(0, len(due), self.crypto_batch)]
+        else:
+            # one quote at a time; a RateLimited ticker doesn't take the others down
+            batches = [[sym] for sym in due]
+        refreshed = 0
+        for i, batch in enumerate(batches):
+            try:
+                refreshed += await self._refresh(batch, type_)
+            except RateLimited:
+                # out of background budget; the rest waits for the next tick
+                PREFETCH_SYMBOLS.labels(type_, "failed").inc(sum(len(b) for b in batches[i:]))
+                break
+        return refreshed
+
+    async def _loop(self, type_: str) -> None:
+        while True:
+            try:
+                await self.run_once(type_)
+            except Exception:
+                log.exception("prefetch loop for %s failed", type_)
+            await asyncio.sleep(self.intervals[type_])
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.ensure_future(self._loop(t)) for t in self.intervals]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+prefetcher = WatchlistPrefetcher()
@@ -0,0 +1,232 @@
+"""
+Live prices for /stream/prices, shared across subscribers.
+
+Clients subscribe to symbols; the hub polls the union of all subscribed
+symbols once per interval (crypto every STREAM_CRYPTO_INTERVAL_SECONDS in
+one batched call, stocks every STREAM_STOCK_INTERVAL_SECONDS) from the
+cache, so N viewers of a symbol cost one cache lookup per tick and one
+upstream call per cache expiry. Only prices that changed since the last
+tick are fanned out.
+
+Anonymous clients must not spend the Alpha Vantage budget that quotes
+need: stale tickers are refreshed one at a time at background rate-limit
+priority (like the prefetcher), least recently refreshed first, and the
+tick ends at the first RateLimited. A stream takes at most
+STREAM_MAX_STOCK_SYMBOLS tickers, each well-formed and, once the listing is
+loaded, listed; a ticker the upstream rejects is dropped from the hub.
+Symbols nobody watches any more are forgotten.
+
+Each subscriber holds at most one pending update per symbol: a client that
+reads slowly gets the latest price, not a backlog.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+from app.adapters.alphavantage import UnknownSymbol
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, RateLimited
+from app.core.bounded_cache import BoundedCache
+from app.core.symbols import classify, is_ticker, normalize_symbols
+from app.services import stock_list_service
+from app.services.aggregator import aggregate_with_cache, asset_cache_key, refresh_assets
+from app.services.cache_service import cache_state, get_cache_many
+
+STREAM_CRYPTO_INTERVAL_SECONDS = float(os.getenv("STREAM_CRYPTO_INTERVAL_SECONDS", "10"))
+STREAM_STOCK_INTERVAL_SECONDS = float(os.getenv("STREAM_STOCK_INTERVAL_SECONDS", "60"))
+STREAM_MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", "50"))  # per subscription
+# tickers per subscription; each may cost a background quote per interval
+STREAM_MAX_STOCK_SYMBOLS = int(os.getenv("STREAM_MAX_STOCK_SYMBOLS", "10"))
+
+STREAM_SUBSCRIBERS = Gauge("stream_subscribers", "Open /stream/prices subscriptions.")
+STREAM_UPDATES = Counter("stream_updates_total", "Price updates queued to stream subscribers.")
+STREAM_POLLS = Counter("stream_polls_total", "Shared price polls by type and outcome.", ["type", "outcome"])
+
+log = logging.getLogger(__name__)
+
+# fields of an aggregate asset sent to clients
+_FIELDS = ("symbol", "type", "price", "source", "asOf", "lastKnownGood")
+
+
+class Subscription:
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+        self._pending: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, update: Dict) -> None:
+        self._pending[update["symbol"]] = update  # replaces an unread older price
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Updates since the last call, waiting up to `timeout` seconds; [] on timeout."""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        updates, self._pending = list(self._pending.values()), {}
+        return updates
+
+
+class PriceHub:
+    def __init__(self, intervals: Optional[Dict[str, float]] = None):
+        self.intervals = intervals or {
+            "crypto": STREAM_CRYPTO_INTERVAL_SECONDS,
+            "stock": STREAM_STOCK_INTERVAL_SECONDS,
+        }
+        self._subs: Dict[str, Set[Subscription]] = {}  # symbol -> subscribers
+        self._last: Dict[str, Dict] = {}  # symbol -> last update sent
+        self._wake: Dict[str, asyncio.Event] = {}  # per type, created by start()
+        # tickers the upstream rejected; bounded, as they come from clients
+        self._unknown: BoundedCache[bool] = BoundedCache("stream_unknown_tickers", max_entries=4096, ttl=24 * 3600)
+        self._tasks: List[asyncio.Task] = []
+
+    def symbols(self, type_: str) -> List[str]:
+        return [s for s in self._subs if classify(s) == type_]
+
+    def subscribe(self, symbols_csv: str) -> Subscription:
+        """Subscribe to a CSV of symbols; the latest known prices are queued at once."""
+        symbols = list(dict.fromkeys(normalize_symbols(symbols_csv)))
+        if not symbols:
+            raise ValueError("no symbols given")
+        if len(symbols) > STREAM_MAX_SYMBOLS:
+            raise ValueError(f"at most {STREAM_MAX_SYMBOLS} symbols per stream")
+        stocks = [s for s in symbols if classify(s) == "stock"]
+        if len(stocks) > STREAM_MAX_STOCK_SYMBOLS:
+            raise ValueError(f"at most {STREAM_MAX_STOCK_SYMBOLS} stock symbols per stream")
+        unknown = [s for s in stocks if self._unknown.get(s) or not is_ticker(s) or stock_list_service.is_listed(s) is False]
+        if unknown:
+            raise ValueError(f"unknown ticker(s): {', '.join(unknown)}")
+        sub = Subscription(symbols)
+        for sym in symbols:
+            if sym not in self._subs and classify(sym) in self._wake:
+                self._wake[classify(sym)].set()  # first subscriber: poll it now
+            self._subs.setdefault(sym, set()).add(sub)
+            if sym in self._last:
+                sub.offer(self._last[sym])
+        STREAM_SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for sym in sub.symbols:
+            subs = self._subs.get(sym)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sym]
+                self._last.pop(sym, None)
+        STREAM_SUBSCRIBERS.dec()
+
+    def _drop_unknown(self, sym: str) -> None:
+        """Stop polling a ticker the upstream rejected; its subscribers keep their other symbols."""
+        self._unknown.put(sym, True)
+        self._subs.pop(sym, None)
+        self._last.pop(sym, None)
+
+    def publish(self, assets: Iterable[Dict]) -> int:
+        """Fan out the assets whose price changed; returns how many did."""
+        changed = 0
+        for asset in assets:
+            sym = asset["symbol"]
+            subs = self._subs.get(sym)
+            if not subs:
+                continue
+            last = self._last.get(sym)
+            if last is not None and last["price"] == asset["price"]:
+                continue
+            update = {k: asset[k] for k in _FIELDS if k in asset}
+            self._last[sym] = update
+            for sub in subs:
+                sub.offer(update)
+            STREAM_UPDATES.inc(len(subs))
+            changed += 1
+        return changed
+
+    async def _fetch(self, symbols: List[str], type_: str) -> List[Dict]:
+        # served from the cache while fresh; entries live for one interval
+        window = int(self.intervals[type_])
+        if type_ == "crypto":
+            return (await aggregate_with_cache(",".join(symbols), window=window))["assets"]
+        return await self._fetch_stocks(symbols, max(15, window))
+
+    async def _fetch_stocks(self, symbols: List[str], ttl_seconds: int) -> List[Dict]:
+        """Cached quotes; stale or missing ones are refreshed at background priority."""
+        keys = {sym: asset_cache_key(sym) for sym in symbols}
+        docs = await get_cache_many(list(keys.values()))
+        now = datetime.now(timezone.utc)
+        found: Dict[str, Dict] = {}
+        due = []
+        for sym, key in keys.items():
+            doc = docs.get(key)
+            state = cache_state(doc, now, ttl_seconds) if doc and doc.get("payload") else "expired"
+            if state != "expired":
+                found[sym] = doc["payload"]
+            if state != "fresh":
+                # never fetched first, then the longest since refreshed, so every ticker gets its turn
+                stored = (doc.get("storedAt") or now) if state != "expired" else None
+                due.append((stored is not None, stored or now, sym))
+        due.sort(key=lambda d: d[:2])
+        # one ticker at a time, so a bad ticker doesn't hide the others
+        for i, (_, _, sym) in enumerate(due):
+            try:
+                for asset in await refresh_assets([sym], ttl_seconds, [], priority=PRIORITY_BACKGROUND):
+                    found[asset["symbol"]] = asset
+            except RateLimited:
+                # out of background budget; the rest waits for the next tick
+                STREAM_POLLS.labels("stock", "failed").inc(len(due) - i)
+                break
+            except Exception as e:
+                log.info("stream poll of %s failed: %s", sym, e)
+                STREAM_POLLS.labels("stock", "failed").inc()
+                if isinstance(e, UnknownSymbol):
+                    self._drop_unknown(sym)
+        return [found[s] for s in symbols if s in found]
+
+    async def poll_once(self, type_: str) -> int:
+        """Poll every subscribed symbol of one type once; returns how many prices changed."""
+        symbols = self.symbols(type_)
+        if not symbols:
+            return 0
+        try:
+            assets = await self._fetch(symbols, type_)
+        except Exception as e:
+            log.info("stream poll of %s failed: %s", type_, e)
+            STREAM_POLLS.labels(type_, "failed").inc()
+            return 0
+        STREAM_POLLS.labels(type_, "ok").inc()
+        return self.publish(assets)
+
+    async def _loop(self, type_: str) -> None:
+        wake = self._wake[type_]
+        while True:
+            wake.clear()
+            try:
+                await self.poll_once(type_)
+            except Exception:
+                log.exception("stream poll loop for %s failed", type_)
+            try:
+                await asyncio.wait_for(wake.wait(), self.intervals[type_])
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wake = {type_: asyncio.Event() for type_ in self.intervals}
+        self._tasks = [asyncio.ensure_future(self._loop(t)) for t in self.intervals]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wake = {}
+
+
+hub = PriceHub()
@@ -0,0 +1,18 @@
+from typing import Any, Dict, Optional
+
+from app.db.mongo import get_db
+
+# Large, rarely changing upstream lists (coin list, stock listings) kept in
+# the `snapshots` collection, one document per key, so workers can load them
+# at startup instead of downloading them again.
+
+
+def get_snapshot(key: str, fields: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """The snapshot document for `key` (optionally only `fields`), or None."""
+    projection = {"_id": 0, **(fields or {})}
+    return get_db().snapshots.find_one({"key": key}, projection)
+
+
+def put_snapshot(key: str, fields: Dict[str, Any]) -> None:
+    """Upsert `fields` into the snapshot for `key`; other fields are kept."""
+    get_db().snapshots.update_one({"key": key}, {"$set": {"key": key, **fields}}, upsert=True)
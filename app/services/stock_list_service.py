@@ -0,0 +1,159 @@
+"""
+Local ticker index for /suggest/stocks.
+
+Alpha Vantage's LISTING_STATUS (every active US ticker, one call) is
+snapshotted in Mongo, loaded into a PrefixIndex, and refreshed by a
+background task once the snapshot is older than STOCK_LIST_MAX_AGE_SECONDS.
+Typeahead is then answered locally. SYMBOL_SEARCH is only called for
+prefixes the index doesn't know (e.g. foreign tickers), and its answers
+are cached.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.adapters.alphavantage import fetch_listing_status, symbol_search_async
+from app.core.http_cache import Freshness
+from app.core.prefix_index import PrefixIndex
+from app.core.typeahead_cache import suggest_cache
+from app.services.cache_service import get_cache, set_cache
+from app.services.snapshot_service import get_snapshot, put_snapshot
+
+STOCK_LIST_MAX_AGE_SECONDS = int(os.getenv("STOCK_LIST_MAX_AGE_SECONDS", str(24 * 3600)))
+# How often the background task checks whether the listing needs a refresh.
+STOCK_LIST_CHECK_SECONDS = float(os.getenv("STOCK_LIST_CHECK_SECONDS", "3600"))
+STOCK_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("STOCK_SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+SNAPSHOT_KEY = "alphavantage:listings"
+
+log = logging.getLogger(__name__)
+
+# Replaced wholesale, like coin_list_service._state.
+_state: Dict[str, Any] = {"items": [], "fetchedAt": 0.0, "index": None, "version": 0, "symbols": frozenset()}
+_refresh_lock = threading.Lock()
+_versions = itertools.count(1)  # typeahead cache version per installed index
+_task: Optional[asyncio.Task] = None
+
+
+def build_stock_index(items: List[Dict]) -> PrefixIndex:
+    return PrefixIndex(
+        items,
+        terms=lambda it: (it["symbol"], it["name"]),
+        # exact ticker first (via the index), then shorter tickers
+        tiebreak=lambda it: (len(it["symbol"]), it["symbol"]),
+    )
+
+
+def _install(items: List[Dict], fetched_at: float) -> None:
+    global _state
+    _state = {
+        "items": items,
+        "fetchedAt": fetched_at,
+        "index": build_stock_index(items),
+        "version": next(_versions),
+        "symbols": frozenset(it["symbol"].upper() for it in items),
+    }
+    suggest_cache.invalidate("stocks")
+
+
+def load_snapshot() -> bool:
+    """Install the Mongo snapshot in this process. False if there is none."""
+    doc = get_snapshot(SNAPSHOT_KEY)
+    if not doc or not doc.get("items"):
+        return False
+    fetched = doc["fetchedAt"]
+    _install(doc["items"], (fetched if fetched.tzinfo else fetched.replace(tzinfo=timezone.utc)).timestamp())
+    return True
+
+
+def is_stale(now: Optional[float] = None) -> bool:
+    return (now or time.time()) - _state["fetchedAt"] > STOCK_LIST_MAX_AGE_SECONDS
+
+
+def refresh() -> None:
+    """Download LISTING_STATUS (at background rate-limit priority) and snapshot it."""
+    with _refresh_lock:
+        # another worker may have refreshed the shared snapshot already
+        if load_snapshot() and not is_stale():
+            return
+        items = fetch_listing_status()
+        now = time.time()
+        _install(items, now)
+        put_snapshot(SNAPSHOT_KEY, {"items": items, "fetchedAt": datetime.fromtimestamp(now, timezone.utc)})
+
+
+async def _refresh_loop() -> None:
+    while True:
+        if is_stale():
+            try:
+                await asyncio.to_thread(refresh)
+            except Exception as e:
+                # RateLimited included: background priority, try again next check
+                log.warning("stock listing refresh failed: %s", e)
+        await asyncio.sleep(STOCK_LIST_CHECK_SECONDS)
+
+
+async def start() -> None:
+    """Startup hook: load the snapshot and keep it refreshed in the background."""
+    global _task
+    try:
+        await asyncio.to_thread(load_snapshot)
+    except Exception as e:
+        log.warning("stock listing snapshot unavailable: %s", e)
+    if _task is None:
+        _task = asyncio.ensure_future(_refresh_loop())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def _as_match(it: Dict) -> Dict:
+    # same shape as alphavantage.symbol_search_async; LISTING_STATUS is US-only
+    return {"symbol": it["symbol"], "name": it["name"], "type": it["type"], "region": "United States", "currency": "USD"}
+
+
+async def _search_upstream(q: str) -> List[Dict]:
+    key = f"suggest::stocks::{q.lower()}"
+    doc = await get_cache(key)
+    if doc and doc.get("payload") is not None:
+        return doc["payload"]["matches"]
+    matches = await symbol_search_async(q)
+    await set_cache(key, {"matches": matches}, STOCK_SEARCH_CACHE_TTL_SECONDS)
+    return matches
+
+
+def is_listed(symbol: str) -> Optional[bool]:
+    """Whether `symbol` is an active ticker in the listing; None while no listing is loaded."""
+    state = _state
+    if not state["items"]:
+        return None
+    return symbol.upper() in state["symbols"]
+
+
+def freshness(now: Optional[float] = None) -> Freshness:
+    """How much longer the installed ticker listing is fresh: the lifetime of suggestions built from it."""
+    if not _state["items"]:
+        return Freshness()
+    now = now or time.time()
+    return Freshness(max(0, int(_state["fetchedAt"] + STOCK_LIST_MAX_AGE_SECONDS - now)))
+
+
+async def suggest_stocks(q: str, limit: int = 10) -> List[Dict]:
+    """Tickers whose symbol or name starts with `q`, exact ticker first."""
+    state = _state
+    index = state["index"]
+    if index is not None:
+        ids = suggest_cache.get_or_compute("stocks", q, limit, index.search_ids, index.narrow, version=state["version"])
+        if ids:
+            return [_as_match(index.items[i]) for i in ids]
+    # unknown prefix, or no listing loaded yet
+    return (await _search_upstream(q.strip()))[:limit]
@@ -9,12 +9,12 @@ templates = Jinja2Templates(directory="templates")
 router = APIRouter()
 
 @router.get("/crypto", response_class=HTMLResponse)
-def crypto_page(request: Request, symbol: str = Query("")):
+async def crypto_page(request: Request, symbol: str = Query("")):
     result = None
     error = None
     if symbol.strip():
         try:
-            result = aggregate_with_cache(symbol, window=60)
+            result = await aggregate_with_cache(symbol, window=60)
         except Exception as e:
             error = str(e)
     return templates.TemplateResponse(
@@ -30,12 +30,12 @@ def crypto_page(request: Request, symbol: str = Query("")):
     )
 
 @router.get("/stocks", response_class=HTMLResponse)
-def stocks_page(request: Request, symbol: str = Query("")):
+async def stocks_page(request: Request, symbol: str = Query("")):
     result = None
     error = None
     if symbol.strip():
         try:
-            result = aggregate_with_cache(symbol, window=60)
+            result = await aggregate_with_cache(symbol, window=60)
         except Exception as e:
             error = str(e)
     return templates.TemplateResponse(
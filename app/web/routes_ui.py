@@ -24,7 +24,7 @@ def home(request: Request):
     )
 
 @router.get("/ui/search", response_class=HTMLResponse)
-def ui_search(
+async def ui_search(
     request: Request,
     symbols: str = Query("", description="CSV e.g. bitcoin,AAPL"),
     window: int = Query(60, description="Cache TTL seconds"),
@@ -40,7 +40,7 @@ def ui_search(
             "index.html", {**ctx, "result": None, "error": "Please enter at least one symbol."}
         )
     try:
-        data = aggregate_with_cache(symbols, window=window)
+        data = await aggregate_with_cache(symbols, window=window)
         return templates.TemplateResponse("index.html", {**ctx, "result": data, "error": None})
     except Exception as e:
         return templates.TemplateResponse("index.html", {**ctx, "result": None, "error": str(e)})
@@ -0,0 +1,69 @@
+"""
+Benchmark the aggregate fan-out against slowed-down fake adapters.
+
+Runs the same cold (cache-miss) aggregate request with the fan-out capped at
+1 (the old serial behaviour) and at the configured cap, and prints the
+wall-clock time of each.
+
+    python -m scripts.bench_aggregate --tickers 10 --latency 0.25
+"""
+import argparse
+import asyncio
+import time
+
+import app.services.aggregator as agg
+
+
+def _install_fakes(latency: float):
+    async def fake_simple_price(ids, vs):
+        await asyncio.sleep(latency)
+        return {i: {"usd": 1.0} for i in ids}
+
+    async def fake_quote(symbol, priority=None):
+        await asyncio.sleep(latency)
+        return {"05. price": "1.00", "07. latest trading day": "2025-01-01"}
+
+    agg.fetch_simple_price_async = fake_simple_price
+    agg.fetch_quote_async = fake_quote
+    async def always_miss(keys):
+        return {}
+
+    async def no_store(assets, ttl_seconds):
+        pass  # no cache / last-good writes
+
+    agg.get_cache_many = always_miss
+    agg._store = no_store
+
+
+async def _timed(symbols: str, cap: int, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await agg.aggregate_with_cache(symbols, max_concurrency=cap)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.25, help="fake upstream latency (s)")
+    parser.add_argument("--cap", type=int, default=agg.AGG_MAX_CONCURRENCY)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    _install_fakes(args.latency)
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    symbols = ",".join(["bitcoin", "ethereum"] + tickers)
+
+    serial = asyncio.run(_timed(symbols, 1, args.rounds))
+    fanout = asyncio.run(_timed(symbols, args.cap, args.rounds))
+
+    print(f"symbols: 2 crypto + {args.tickers} stocks, upstream latency {args.latency:.3f}s")
+    print(f"serial (cap=1):       {serial:.3f}s")
+    print(f"concurrent (cap={args.cap}): {fanout:.3f}s")
+    print(f"speedup:              {serial / fanout:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark /analytics math: NumPy over the aligned price matrix vs plain Python loops.
+
+Builds synthetic daily closes for a mixed symbol set (stocks on weekdays,
+crypto every day), then times calendar alignment + statistics both ways.
+
+    python -m scripts.bench_analytics --symbols 60 --days 365
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.core.series import Series
+from app.services import analytics_service as analytics
+
+DAY = analytics.DAY_MS
+
+
+def _synthetic(n_symbols: int, days: int):
+    rng = np.random.default_rng(7)
+    all_days = np.arange(days, dtype=np.int64) * DAY
+    closes, is_stock = [], []
+    for j in range(n_symbols):
+        stock = j % 3 != 0
+        t = all_days[(all_days // DAY + 4) % 7 < 5] if stock else all_days  # day 0 was a Thursday
+        y = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(t))))
+        closes.append(Series(t, y))
+        is_stock.append(stock)
+    return closes, is_stock
+
+
+def _loops(closes, is_stock, vol_window: int):
+    """The same statistics one symbol and one day at a time."""
+    stock_days = [set(s.t.tolist()) for s, st in zip(closes, is_stock) if st]
+    calendar = sorted(set.intersection(*stock_days))
+    out = []
+    for s in closes:
+        ts, ys = s.t.tolist(), s.y.tolist()
+        prices, k = [], -1
+        for day in calendar:
+            while k + 1 < len(ts) and ts[k + 1] <= day:
+                k += 1
+            prices.append(ys[k] if k >= 0 else float("nan"))
+        returns = [prices[i] / prices[i - 1] - 1 for i in range(1, len(prices))]
+        vols = []
+        for i in range(vol_window, len(returns) + 1):
+            w = returns[i - vol_window:i]
+            mean = sum(w) / len(w)
+            vols.append(math.sqrt(sum((r - mean) ** 2 for r in w) / (len(w) - 1)) * math.sqrt(252))
+        peak, mdd = prices[0], 0.0
+        for p in prices:
+            peak = max(peak, p)
+            mdd = min(mdd, p / peak - 1)
+        out.append((returns, vols, mdd))
+    n = len(out)
+    corr = [[0.0] * n for _ in range(n)]
+    for a in range(n):
+        ra = out[a][0]
+        ma = sum(ra) / len(ra)
+        for b in range(n):
+            rb = out[b][0]
+            mb = sum(rb) / len(rb)
+            cov = sum((x - ma) * (y - mb) for x, y in zip(ra, rb))
+            corr[a][b] = cov / math.sqrt(sum((x - ma) ** 2 for x in ra) * sum((y - mb) ** 2 for y in rb))
+    return out, corr
+
+
+def _vectorized(closes, is_stock, vol_window: int):
+    calendar = analytics.build_calendar(closes, is_stock)
+    return analytics.compute(analytics.align(calendar, closes), vol_window, analytics.TRADING_DAYS_PER_YEAR)
+
+
+def _best_ms(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=60)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--vol-window", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    closes, is_stock = _synthetic(args.symbols, args.days)
+    loops = _best_ms(lambda: _loops(closes, is_stock, args.vol_window), args.rounds)
+    vectorized = _best_ms(lambda: _vectorized(closes, is_stock, args.vol_window), args.rounds)
+
+    stats = _vectorized(closes, is_stock, args.vol_window)
+    _, corr = _loops(closes, is_stock, args.vol_window)
+    assert np.allclose(stats.correlation, corr), "implementations disagree"
+
+    print(f"symbols: {args.symbols} ({sum(is_stock)} stocks), days: {args.days}, vol window: {args.vol_window}")
+    print(f"python loops: {loops:.1f}ms")
+    print(f"numpy:        {vectorized:.1f}ms")
+    print(f"speedup:      {loops / vectorized:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
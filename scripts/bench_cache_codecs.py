@@ -0,0 +1,100 @@
+"""
+Measure cache payload codecs: stored size and encode/decode cost.
+
+For representative payloads (one /aggregate asset, a 50-asset aggregate,
+stock search matches, 30 days of hourly history points) prints the BSON
+size of the stored `payload` field for each codec, relative to plain BSON,
+and the time to encode + BSON-serialize and BSON-parse + decode it.
+msgpack / zstd rows only appear when those packages are installed.
+
+    python -m scripts.bench_cache_codecs
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import bson
+
+from app.core import payload_codec
+from app.core.payload_codec import PayloadCodec, decode
+
+
+def _asset(i: int, now: datetime):
+    if i % 2:
+        return {"symbol": f"coin-{i}", "type": "crypto", "price": random.uniform(0.01, 70000),
+                "source": "coingecko", "asOf": now.isoformat()}
+    return {"symbol": f"TK{i}", "type": "stock", "price": round(random.uniform(1, 900), 4),
+            "source": "alphavantage", "asOf": now.date().isoformat()}
+
+
+def _payloads():
+    random.seed(3)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=30)
+    return {
+        "1 asset": _asset(1, now),
+        "aggregate x50": {"assets": [_asset(i, now) for i in range(50)], "meta": {"cache": "miss", "count": 50}},
+        "stock matches x10": {"matches": [
+            {"symbol": f"AB{i}", "name": f"Company {i} Holdings Inc", "type": "Equity",
+             "region": "United States", "currency": "USD"}
+            for i in range(10)
+        ]},
+        "history 720 pts": {"points": [
+            {"t": int((start + timedelta(hours=h)).timestamp() * 1000), "y": round(30000 + random.gauss(0, 400), 2)}
+            for h in range(720)
+        ]},
+    }
+
+
+def _codecs(min_bytes: int):
+    specs = ["bson", "json", "json+zlib"]
+    if payload_codec.msgpack is not None:
+        specs += ["msgpack", "msgpack+zlib"]
+    if payload_codec.zstandard is not None:
+        specs += ["json+zstd"] + (["msgpack+zstd"] if payload_codec.msgpack is not None else [])
+    return [payload_codec.parse_codec(s, min_bytes) for s in specs]
+
+
+def _best_us(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best * 1e6
+
+
+def _measure(codec: PayloadCodec, payload, rounds: int):
+    def write():
+        value, enc = codec.encode(payload)
+        return bson.encode({"payload": value, "enc": enc})
+
+    stored = write()
+
+    def read():
+        doc = bson.decode(stored)
+        return decode(doc["payload"], doc["enc"])
+
+    assert read() == payload
+    return len(stored), _best_us(write, rounds), _best_us(read, rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-bytes", type=int, default=1024, help="compression threshold")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    for label, payload in _payloads().items():
+        print(label)
+        base = None
+        for codec in _codecs(args.min_bytes):
+            size, enc_us, dec_us = _measure(codec, payload, args.rounds)
+            base = base or size
+            print(f"  {codec.name:<14} {size:7d} B  {size / base:5.2f}x   write {enc_us:7.1f}us   read {dec_us:7.1f}us")
+
+
+if __name__ == "__main__":
+    main()
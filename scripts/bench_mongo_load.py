@@ -0,0 +1,111 @@
+"""
+Benchmark cache reads under concurrency: sync pymongo in a thread pool vs Motor.
+
+Seeds a scratch collection in MONGODB_URI / MONGODB_DB with cache-shaped
+documents, then runs `--requests` batched key lookups (`find` with `$in`,
+like get_cache_many) with `--concurrency` in flight. The sync path runs each
+lookup in a pool of `--threads` workers, as `def` routes do (Starlette's
+default is 40); the Motor path awaits them on the event loop (Motor itself
+runs them on MOTOR_MAX_WORKERS threads, sized to the connection pool by
+app.db.mongo). Needs a running MongoDB; the scratch collection is dropped
+afterwards.
+
+    python -m scripts.bench_mongo_load --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from app.db.mongo import get_async_client, get_client, MONGODB_DB, MONGODB_MAX_POOL_SIZE
+
+COLLECTION = "bench_cache_load"
+
+
+def _seed(n_keys: int) -> None:
+    coll = get_client()[MONGODB_DB][COLLECTION]
+    coll.drop()
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    coll.insert_many([
+        {"key": f"k{i}", "payload": {"price": random.random() * 1000, "currency": "usd"}, "expiresAt": expires}
+        for i in range(n_keys)
+    ])
+    coll.create_index("key", unique=True)
+
+
+def _keys(n_keys: int, batch: int):
+    return [f"k{random.randrange(n_keys)}" for _ in range(batch)]
+
+
+async def _drive(lookup, requests: int, concurrency: int):
+    """Run `requests` lookups with `concurrency` in flight; (seconds, per-request latencies)."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await lookup()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+async def _sync_threadpool(args):
+    coll = get_client()[MONGODB_DB][COLLECTION]
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=args.threads)
+
+    def find():
+        return list(coll.find({"key": {"$in": _keys(args.keys, args.batch)}}, {"_id": 0}))
+
+    try:
+        return await _drive(lambda: loop.run_in_executor(pool, find), args.requests, args.concurrency)
+    finally:
+        pool.shutdown()
+
+
+async def _motor(args):
+    coll = get_async_client()[MONGODB_DB][COLLECTION]
+
+    async def find():
+        return [doc async for doc in coll.find({"key": {"$in": _keys(args.keys, args.batch)}}, {"_id": 0})]
+
+    return await _drive(find, args.requests, args.concurrency)
+
+
+def _report(name: str, elapsed: float, latencies, requests: int) -> None:
+    ms = sorted(x * 1e3 for x in latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(f"{name:<22} {requests / elapsed:8.0f} req/s   p50 {statistics.median(ms):6.1f}ms   p99 {p99:6.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=10, help="keys per lookup")
+    args = parser.parse_args()
+
+    _seed(args.keys)
+    try:
+        print(f"concurrency: {args.concurrency}, requests: {args.requests}, "
+              f"keys/lookup: {args.batch}, pool: {MONGODB_MAX_POOL_SIZE}, motor workers: {os.environ['MOTOR_MAX_WORKERS']}")
+        elapsed, latencies = asyncio.run(_sync_threadpool(args))
+        _report(f"pymongo ({args.threads} threads)", elapsed, latencies, args.requests)
+        elapsed, latencies = asyncio.run(_motor(args))
+        _report("motor", elapsed, latencies, args.requests)
+    finally:
+        get_client()[MONGODB_DB][COLLECTION].drop()
+
+
+if __name__ == "__main__":
+    main()
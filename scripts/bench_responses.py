@@ -0,0 +1,92 @@
+"""
+Benchmark response serialization and bytes on the wire.
+
+For a /history/crypto body (30 days hourly, points and columnar formats)
+and a 50-asset /aggregate body, times FastAPI's default path
+(jsonable_encoder + JSONResponse.render) against FastJSONResponse
+(orjson when installed), and prints the body size as is, gzipped and
+brotli-compressed (when `brotli` is installed) at the configured levels.
+
+    python -m scripts.bench_responses
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.core import compression, responses
+from app.core.responses import FastJSONResponse
+from app.core.series import Series, encode
+
+
+def _history(fmt: str):
+    rng = np.random.default_rng(5)
+    now = int(time.time() * 1000)
+    t = now - now % 3_600_000 - np.arange(720, 0, -1, dtype=np.int64) * 3_600_000
+    y = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.004, len(t)))), 2)
+    return {"symbol": "bitcoin", "series": encode(Series(t, y), fmt), "currency": "usd", "interval": "1h", "format": fmt}
+
+
+def _aggregate(n: int):
+    random.seed(5)
+    now = datetime.now(timezone.utc)
+    assets = []
+    for i in range(n):
+        if i % 2:
+            assets.append({"symbol": f"coin-{i}", "type": "crypto", "price": random.uniform(0.01, 70000),
+                           "source": "coingecko", "asOf": (now - timedelta(seconds=i)).isoformat()})
+        else:
+            assets.append({"symbol": f"TK{i}", "type": "stock", "price": round(random.uniform(1, 900), 4),
+                           "source": "alphavantage", "asOf": now.date().isoformat()})
+    return {
+        "timestamp": now.isoformat(),
+        "assets": assets,
+        "meta": {"cache": "hit", "cacheByAsset": {a["symbol"]: "hit" for a in assets},
+                 "sources": [{"name": "coingecko"}, {"name": "alphavantage"}], "warnings": []},
+    }
+
+
+def _best_us(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    default = JSONResponse(None)
+    fast = FastJSONResponse(None)
+    payloads = {
+        "history points x720": _history("points"),
+        "history columnar x720": _history("columnar"),
+        "aggregate x50": _aggregate(50),
+    }
+    print(f"serializer: {'orjson' if responses.orjson is not None else 'json (orjson not installed)'}")
+    for label, payload in payloads.items():
+        body = fast.render(payload)
+        assert json.loads(body) == json.loads(default.render(jsonable_encoder(payload))), "serializers disagree"
+        slow_us = _best_us(lambda: default.render(jsonable_encoder(payload)), args.rounds)
+        fast_us = _best_us(lambda: fast.render(payload), args.rounds)
+        sizes = [f"identity {len(body)} B", f"gzip {len(compression.compress(body, 'gzip'))} B"]
+        if compression.brotli is not None:
+            sizes.append(f"br {len(compression.compress(body, 'br'))} B")
+        gzip_us = _best_us(lambda: compression.compress(body, "gzip"), args.rounds)
+        print(label)
+        print(f"  serialize: default {slow_us:8.1f}us   fast {fast_us:7.1f}us   ({slow_us / fast_us:.0f}x)")
+        print(f"  wire:      {', '.join(sizes)}   (gzip {gzip_us:.0f}us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark crypto suggestions: the old linear scan vs the prefix index.
+
+Builds a synthetic coin list about the size of CoinGecko's /coins/list
+(or loads a real one from --coins, a saved /coins/list JSON file) and times
+both lookups over a set of typeahead prefixes.
+
+    python -m scripts.bench_suggest --coins 17000 --rounds 200
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from app.services.coin_list_service import build_coin_index
+
+PREFIXES = ["b", "bi", "bit", "bitc", "e", "et", "eth", "sol", "do", "usd", "xrp", "zz"]
+
+
+def _linear_scan(items, prefix: str, limit: int = 10):
+    """suggest_crypto before the index: scan everything, first N matches in list order."""
+    prefix = prefix.lower().strip()
+    matches = []
+    for it in items:
+        if it["name"].lower().startswith(prefix) or it["symbol"].lower().startswith(prefix):
+            matches.append({"id": it["id"], "symbol": it["symbol"].upper(), "name": it["name"]})
+            if len(matches) >= limit:
+                break
+    return matches
+
+
+def _synthetic_coins(n: int):
+    rng = random.Random(42)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(4000)]
+    coins = [
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+        {"id": "solana", "symbol": "sol", "name": "Solana"},
+    ]
+    for i in range(n - len(coins)):
+        name = " ".join(rng.sample(words, rng.randint(1, 3))).title()
+        symbol = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 5)))
+        coins.append({"id": f"{name.lower().replace(' ', '-')}-{i}", "symbol": symbol, "name": name})
+    rng.shuffle(coins)
+    return coins
+
+
+def _per_query_us(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for p in PREFIXES:
+            fn(p)
+    return (time.perf_counter() - start) / (rounds * len(PREFIXES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--coins", default="17000", help="synthetic list size, or path to a /coins/list JSON dump")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.coins.isdigit():
+        items = _synthetic_coins(int(args.coins))
+    else:
+        with open(args.coins) as f:
+            items = json.load(f)
+    ranks = {"bitcoin": 1, "ethereum": 2, "solana": 5}
+
+    start = time.perf_counter()
+    index = build_coin_index(items, ranks)
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    scan = _per_query_us(lambda p: _linear_scan(items, p), args.rounds)
+    indexed = _per_query_us(lambda p: index.search(p, 10), args.rounds)
+
+    print(f"coins: {len(items)}, prefixes: {len(PREFIXES)}, rounds: {args.rounds}")
+    print(f"index build:  {build_ms:.1f}ms (once per coin-list refresh)")
+    print(f"linear scan:  {scan:.1f}us/query")
+    print(f"prefix index: {indexed:.1f}us/query")
+    print(f"speedup:      {scan / indexed:.0f}x")
+    print(f"'bit' -> {[c['name'] for c in index.search('bit', 3)]} (scan: {[c['name'] for c in _linear_scan(items, 'bit', 3)]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,23 @@ def main():
     # cache indexes
     db.cache.create_index("expiresAt", expireAfterSeconds=0)
     db.cache.create_index("key", unique=True)
+    # last known good price per asset (no TTL)
+    db.last_good.create_index("key", unique=True)
+    # coin list / stock listing snapshots for /suggest
+    db.snapshots.create_index("key", unique=True)
+    # price history: time-series collection + per-series coverage
+    if "price_history" not in db.list_collection_names():
+        db.create_collection(
+            "price_history",
+            timeseries={"timeField": "t", "metaField": "meta", "granularity": "hours"},
+        )
+    db.history_meta.create_index("key", unique=True)
     # req_logs TTL (7 days)
     db.req_logs.create_index("createdAt", expireAfterSeconds=7*24*3600)
+    # per-minute / hourly / daily request rollups (30 days)
+    for field, coll in (("minute", "req_rollups"), ("hour", "req_rollups_hourly"), ("day", "req_rollups_daily")):
+        db[coll].create_index([(field, 1), ("method", 1), ("route", 1), ("status", 1)], unique=True)
+        db[coll].create_index(field, expireAfterSeconds=30*24*3600)
     print("Cache + logs indexes created.")
 
 if __name__ == "__main__":
@@ -11,17 +11,28 @@ from fastapi.testclient import TestClient
 os.environ.setdefault("ALPHAVANTAGE_API_KEY", "DUMMY_FOR_TESTS")
 os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
 os.environ.setdefault("MONGODB_DB", "aggregator_test")
+# Keep the Alpha Vantage token bucket out of the way of route tests
+os.environ.setdefault("ALPHAVANTAGE_CALLS_PER_MINUTE", "600000")
+# No background upstream polling from the app lifespan
+os.environ.setdefault("PREFETCH_ENABLED", "0")
 
 # Module-level fake database storage (reset per fixture)
 _FAKE_DB_STORAGE = {
     "cache": [],
     "req_logs": [],
-    "assets": []
+    "assets": [],
+    "snapshots": [],
+    "price_history": [],
+    "history_meta": [],
+    "req_rollups": []
 }
 
 # In-memory cache (reset per test via client fixture)
 _MEM_CACHE = {}
 
+# In-memory last-known-good store (reset per test)
+_MEM_LAST_GOOD = {}
+
 # Define fake adapter functions at module level
 def _fake_fetch_simple_price(ids, vs):
     data = {}
@@ -58,33 +69,74 @@ def _fake_fetch_daily_series(symbol, compact=True):
     base = 190.0 if symbol.upper() == "AAPL" else 410.0
     return _series_30(base=base)
 
-def _fake_get_cache(key: str):
+async def _fake_fetch_simple_price_async(ids, vs):
+    return _fake_fetch_simple_price(ids, vs)
+
+async def _fake_fetch_quote_async(symbol, priority=None):
+    return _fake_fetch_quote(symbol)
+
+async def _fake_fetch_market_chart_async(coin_id, days=30, vs="usd"):
+    return _fake_fetch_market_chart(coin_id, days=days, vs=vs)
+
+async def _fake_fetch_daily_bars_async(symbol, full=False, priority=None):
+    return _fake_fetch_daily_series(symbol, compact=not full)
+
+async def _fake_get_cache(key: str):
     """Fake cache using in-memory dict. Returns entry even if expired (like real MongoDB)."""
     return _MEM_CACHE.get(key)
 
-def _fake_set_cache(key: str, payload, ttl_seconds: int = 60):
-    """Fake cache using in-memory dict."""
+def _put_mem_cache(key: str, payload, ttl_seconds: int = 60, stale_ttl_seconds: int = 0):
+    stored_at = datetime.now(timezone.utc)
+    stale_at = stored_at + timedelta(seconds=ttl_seconds)
     _MEM_CACHE[key] = {
         "key": key,
         "payload": payload,
-        "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+        "storedAt": stored_at,
+        "staleAt": stale_at,
+        "expiresAt": stale_at + timedelta(seconds=stale_ttl_seconds),
     }
 
+async def _fake_set_cache(key: str, payload, ttl_seconds: int = 60, stale_ttl_seconds: int = 0):
+    """Fake cache using in-memory dict."""
+    _put_mem_cache(key, payload, ttl_seconds, stale_ttl_seconds)
+
+async def _fake_get_cache_many(keys):
+    return {k: _MEM_CACHE[k] for k in keys if k in _MEM_CACHE}
+
+async def _fake_set_cache_many(entries, ttl_seconds: int = 60, stale_ttl_seconds: int = 0):
+    for key, payload in entries.items():
+        _put_mem_cache(key, payload, ttl_seconds, stale_ttl_seconds)
+
+def _fake_save_last_good(entries):
+    now = datetime.now(timezone.utc)
+    for key, asset in entries.items():
+        _MEM_LAST_GOOD[key] = {"key": key, "asset": asset, "updatedAt": now}
+
+def _fake_get_last_good_many(keys):
+    return {k: _MEM_LAST_GOOD[k] for k in keys if k in _MEM_LAST_GOOD}
+
 def pytest_configure(config):
     """Patch adapters and cache BEFORE test collection/imports."""
     import app.adapters.coingecko as cg
     import app.adapters.alphavantage as av
     import app.services.cache_service as cache_svc
+    import app.services.last_good_service as last_good_svc
     
     # Patch adapters
-    cg.fetch_simple_price = _fake_fetch_simple_price
-    cg.fetch_market_chart = _fake_fetch_market_chart
-    av.fetch_quote = _fake_fetch_quote
-    av.fetch_daily_series = _fake_fetch_daily_series
+    cg.fetch_simple_price_async = _fake_fetch_simple_price_async
+    cg.fetch_market_chart_async = _fake_fetch_market_chart_async
+    av.fetch_quote_async = _fake_fetch_quote_async
+    av.fetch_daily_bars_async = _fake_fetch_daily_bars_async
     
     # Patch cache service
     cache_svc.get_cache = _fake_get_cache
     cache_svc.set_cache = _fake_set_cache
+    cache_svc.get_cache_many = _fake_get_cache_many
+    cache_svc.set_cache_many = _fake_set_cache_many
+
+    # Patch last-known-good store
+    last_good_svc.save_last_good = _fake_save_last_good
+    last_good_svc.get_last_good_many = _fake_get_last_good_many
 
 @pytest.fixture(autouse=True, scope="function")
 def reset_fakes():
@@ -92,13 +144,20 @@ def reset_fakes():
     # Reset cache
     global _MEM_CACHE
     _MEM_CACHE.clear()
+    _MEM_LAST_GOOD.clear()
     
     # Reset database storage
     global _FAKE_DB_STORAGE
     _FAKE_DB_STORAGE = {
         "cache": [],
         "req_logs": [],
-        "assets": []
+        "assets": [],
+        "snapshots": [],
+        "price_history": [],
+        "history_meta": [],
+        "req_rollups": [],
+        "req_rollups_hourly": [],
+        "req_rollups_daily": []
     }
 
 @pytest.fixture(autouse=True)
@@ -124,6 +183,9 @@ def mock_database(monkeypatch):
                     count += 1
             return count
 
+        def estimated_document_count(self):
+            return len(self._data)
+
         def find_one(self, query, projection=None):
             for doc in self._data:
                 if self._matches(doc, query):
@@ -142,6 +204,10 @@ def mock_database(monkeypatch):
             self._data.append(doc_copy)
             return type('Result', (), {'inserted_id': doc_copy["_id"]})()
 
+        def insert_many(self, docs, ordered=True):
+            ids = [self.insert_one(doc).inserted_id for doc in docs]
+            return type('Result', (), {'inserted_ids': ids})()
+
         def update_one(self, query, update, upsert=False):
             for doc in self._data:
                 if self._matches(doc, query):
@@ -163,6 +229,33 @@ def mock_database(monkeypatch):
             
             return type('Result', (), {'matched_count': 0, 'modified_count': 0})()
 
+        def bulk_write(self, requests, ordered=True):
+            for op in requests:
+                # pymongo UpdateOne keeps its arguments in private attributes
+                self._upsert_with_operators(op._filter, op._doc, op._upsert)
+            return type('Result', (), {'acknowledged': True})()
+
+        def _upsert_with_operators(self, query, update, upsert):
+            doc = next((d for d in self._data if self._matches(d, query)), None)
+            if doc is None:
+                if not upsert:
+                    return
+                doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+                doc["_id"] = f"fake_id_{len(self._data)}"
+                self._data.append(doc)
+            for op, fields in update.items():
+                for key, value in fields.items():
+                    *parents, leaf = key.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    if op == "$set":
+                        target[leaf] = value
+                    elif op == "$inc":
+                        target[leaf] = target.get(leaf, 0) + value
+                    elif op == "$max":
+                        target[leaf] = value if leaf not in target else max(target[leaf], value)
+
         def delete_one(self, query):
             for i, doc in enumerate(self._data):
                 if self._matches(doc, query):
@@ -180,11 +273,28 @@ def mock_database(monkeypatch):
             if not query:
                 return True
             for key, value in query.items():
-                # Handle $in operator
-                if isinstance(value, dict) and "$in" in value:
-                    if key not in doc or doc[key] not in value["$in"]:
+                # Dotted keys reach into embedded documents
+                found, actual = True, doc
+                for part in key.split("."):
+                    if not isinstance(actual, dict) or part not in actual:
+                        found = False
+                        break
+                    actual = actual[part]
+                if isinstance(value, dict) and any(op.startswith("$") for op in value):
+                    if not found:
                         return False
-                elif key not in doc or doc[key] != value:
+                    for op, arg in value.items():
+                        if op == "$in" and actual not in arg:
+                            return False
+                        if op == "$gte" and not actual >= arg:
+                            return False
+                        if op == "$gt" and not actual > arg:
+                            return False
+                        if op == "$lte" and not actual <= arg:
+                            return False
+                        if op == "$lt" and not actual < arg:
+                            return False
+                elif not found or actual != value:
                     return False
             return True
 
@@ -226,17 +336,72 @@ def mock_database(monkeypatch):
         def __iter__(self):
             return iter(self._get_results())
 
+        # Motor cursor API
+        def __aiter__(self):
+            async def gen():
+                for doc in self._get_results():
+                    yield doc
+            return gen()
+
+        async def to_list(self, length=None):
+            results = self._get_results()
+            return list(results if length is None else results[:length])
+
     class FakeDB:
         def __init__(self):
             self.cache = FakeCollection("cache")
             self.req_logs = FakeCollection("req_logs")
             self.assets = FakeCollection("assets")
+            self.snapshots = FakeCollection("snapshots")
+            self.price_history = FakeCollection("price_history")
+            self.history_meta = FakeCollection("history_meta")
+            self.req_rollups = FakeCollection("req_rollups")
+            self.req_rollups_hourly = FakeCollection("req_rollups_hourly")
+            self.req_rollups_daily = FakeCollection("req_rollups_daily")
+
+    class AsyncFakeCollection:
+        """Motor-style view of a FakeCollection: same data, awaitable methods."""
+        def __init__(self, name):
+            self._sync = FakeCollection(name)
+
+        def find(self, *args, **kwargs):
+            return self._sync.find(*args, **kwargs)
+
+        def __getattr__(self, attr):
+            method = getattr(self._sync, attr)
+            async def call(*args, **kwargs):
+                return method(*args, **kwargs)
+            return call
+
+    class AsyncFakeDB:
+        def __getattr__(self, name):
+            return AsyncFakeCollection(getattr(FakeDB(), name).name)
+
+        def __getitem__(self, name):
+            return getattr(self, name)
 
     def fake_get_db():
         return FakeDB()
 
+    def fake_get_async_db():
+        return AsyncFakeDB()
+
     import app.db.mongo as mongo_module
+    import app.services.assets_service as assets_svc
+    import app.services.cache_service as cache_svc
+    import app.services.snapshot_service as snapshot_svc
+    import app.services.history_service as history_svc
+    import app.core.request_logging as request_logging
+    import app.core.request_metrics as request_metrics
+    import app.api.routes_cache as routes_cache
+    import app.api.routes_logs as routes_logs
     monkeypatch.setattr(mongo_module, "get_db", fake_get_db, raising=True)
+    monkeypatch.setattr(mongo_module, "get_async_db", fake_get_async_db, raising=True)
+    # services bind get_db / get_async_db by name and may be imported before the first test
+    for svc in (snapshot_svc, history_svc):
+        monkeypatch.setattr(svc, "get_db", fake_get_db, raising=True)
+    for svc in (assets_svc, cache_svc, request_logging, request_metrics, routes_cache, routes_logs):
+        monkeypatch.setattr(svc, "get_async_db", fake_get_async_db, raising=True)
 
 
 @pytest.fixture
@@ -1,21 +1,25 @@
+import asyncio
+import time
+
 import pytest
 from unittest.mock import patch
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, PRIORITY_QUOTE
 from app.services.aggregator import aggregate_with_cache
 
 
 def test_aggregate_one_crypto():
     """Test aggregating a single crypto symbol."""
-    with patch('app.services.aggregator.fetch_simple_price') as mock_crypto, \
-         patch('app.services.aggregator.get_cache') as mock_get_cache, \
-         patch('app.services.aggregator.set_cache') as mock_set_cache:
+    with patch('app.services.aggregator.fetch_simple_price_async') as mock_crypto, \
+         patch('app.services.aggregator.get_cache_many') as mock_get_cache, \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
         
         # Mock cache miss
-        mock_get_cache.return_value = None
+        mock_get_cache.return_value = {}
         
         # Mock CoinGecko response
         mock_crypto.return_value = {"bitcoin": {"usd": 45000.0}}
         
-        result = aggregate_with_cache("bitcoin")
+        result = asyncio.run(aggregate_with_cache("bitcoin"))
         
         assert "assets" in result
         assert len(result["assets"]) == 1
@@ -34,12 +38,12 @@ def test_aggregate_one_crypto():
 
 def test_aggregate_one_stock():
     """Test aggregating a single stock symbol."""
-    with patch('app.services.aggregator.fetch_quote') as mock_stock, \
-         patch('app.services.aggregator.get_cache') as mock_get_cache, \
-         patch('app.services.aggregator.set_cache') as mock_set_cache:
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many') as mock_get_cache, \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
         
         # Mock cache miss
-        mock_get_cache.return_value = None
+        mock_get_cache.return_value = {}
         
         # Mock Alpha Vantage response
         mock_stock.return_value = {
@@ -47,7 +51,7 @@ def test_aggregate_one_stock():
             "07. latest trading day": "2025-11-25"
         }
         
-        result = aggregate_with_cache("AAPL")
+        result = asyncio.run(aggregate_with_cache("AAPL"))
         
         assert "assets" in result
         assert len(result["assets"]) == 1
@@ -60,19 +64,19 @@ def test_aggregate_one_stock():
         assert asset["asOf"] == "2025-11-25"
         
         # Verify cache was called
-        mock_stock.assert_called_once_with("AAPL")
+        mock_stock.assert_called_once_with("AAPL", priority=PRIORITY_QUOTE)
         mock_set_cache.assert_called_once()
 
 
 def test_aggregate_mixed_inputs():
     """Test aggregating both crypto and stock symbols."""
-    with patch('app.services.aggregator.fetch_simple_price') as mock_crypto, \
-         patch('app.services.aggregator.fetch_quote') as mock_stock, \
-         patch('app.services.aggregator.get_cache') as mock_get_cache, \
-         patch('app.services.aggregator.set_cache') as mock_set_cache:
+    with patch('app.services.aggregator.fetch_simple_price_async') as mock_crypto, \
+         patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many') as mock_get_cache, \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
         
         # Mock cache miss
-        mock_get_cache.return_value = None
+        mock_get_cache.return_value = {}
         
         # Mock responses
         mock_crypto.return_value = {"bitcoin": {"usd": 45000.0}}
@@ -81,7 +85,7 @@ def test_aggregate_mixed_inputs():
             "07. latest trading day": "2025-11-25"
         }
         
-        result = aggregate_with_cache("bitcoin,AAPL")
+        result = asyncio.run(aggregate_with_cache("bitcoin,AAPL"))
         
         assert "assets" in result
         assert len(result["assets"]) == 2
@@ -98,18 +102,18 @@ def test_aggregate_mixed_inputs():
         
         # Verify both adapters were called
         mock_crypto.assert_called_once_with(["bitcoin"], ["usd"])
-        mock_stock.assert_called_once_with("AAPL")
+        mock_stock.assert_called_once_with("AAPL", priority=PRIORITY_QUOTE)
 
 
 def test_invalid_symbol_handling():
     """Test handling of invalid symbols that return no data."""
-    with patch('app.services.aggregator.fetch_simple_price') as mock_crypto, \
-         patch('app.services.aggregator.fetch_quote') as mock_stock, \
-         patch('app.services.aggregator.get_cache') as mock_get_cache, \
-         patch('app.services.aggregator.set_cache') as mock_set_cache:
+    with patch('app.services.aggregator.fetch_simple_price_async') as mock_crypto, \
+         patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many') as mock_get_cache, \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
         
         # Mock cache miss
-        mock_get_cache.return_value = None
+        mock_get_cache.return_value = {}
         
         # Mock CoinGecko returning empty data for invalid crypto symbol
         mock_crypto.return_value = {}  # No data for invalid symbol
@@ -118,7 +122,7 @@ def test_invalid_symbol_handling():
         mock_stock.return_value = {}  # No price field
         
         # Test with a lowercase crypto-like invalid symbol
-        result = aggregate_with_cache("invalidcrypto")
+        result = asyncio.run(aggregate_with_cache("invalidcrypto"))
         
         assert "assets" in result
         assert len(result["assets"]) == 0  # No valid assets returned
@@ -130,12 +134,12 @@ def test_invalid_symbol_handling():
 
 def test_stock_price_conversion_error():
     """Test handling when stock price cannot be converted to float."""
-    with patch('app.services.aggregator.fetch_quote') as mock_stock, \
-         patch('app.services.aggregator.get_cache') as mock_get_cache, \
-         patch('app.services.aggregator.set_cache') as mock_set_cache:
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many') as mock_get_cache, \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
         
         # Mock cache miss
-        mock_get_cache.return_value = None
+        mock_get_cache.return_value = {}
         
         # Mock Alpha Vantage returning non-numeric price
         mock_stock.return_value = {
@@ -143,10 +147,207 @@ def test_stock_price_conversion_error():
             "07. latest trading day": "2025-11-25"
         }
         
-        result = aggregate_with_cache("INVALID")
+        result = asyncio.run(aggregate_with_cache("INVALID"))
         
         assert "assets" in result
         assert len(result["assets"]) == 1
         asset = result["assets"][0]
         assert asset["symbol"] == "INVALID"
         assert asset["price"] == 0.0  # Falls back to 0.0 when conversion fails
+
+
+def _slow_quote(delay, stats):
+    async def fake(symbol, priority=PRIORITY_QUOTE):
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        await asyncio.sleep(delay)
+        stats["active"] -= 1
+        return {"05. price": "1.00", "07. latest trading day": "2025-11-25"}
+    return fake
+
+
+def test_stock_quotes_fetched_concurrently():
+    """A miss over N tickers costs about one upstream latency, not N."""
+    stats = {"active": 0, "peak": 0}
+    with patch('app.services.aggregator.fetch_quote_async', _slow_quote(0.2, stats)), \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many'):
+        start = time.perf_counter()
+        result = asyncio.run(aggregate_with_cache("AAPL,MSFT,GOOG,AMZN,TSLA", max_concurrency=10))
+        elapsed = time.perf_counter() - start
+
+    assert [a["symbol"] for a in result["assets"]] == ["AAPL", "MSFT", "GOOG", "AMZN", "TSLA"]
+    assert stats["peak"] == 5
+    assert elapsed < 0.6
+
+
+def test_concurrency_cap_is_respected():
+    """No more than max_concurrency upstream calls are in flight at once."""
+    stats = {"active": 0, "peak": 0}
+    with patch('app.services.aggregator.fetch_quote_async', _slow_quote(0.01, stats)), \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many'):
+        result = asyncio.run(aggregate_with_cache("A1,B2,C3,D4,E5,F6", max_concurrency=2))
+
+    assert len(result["assets"]) == 6
+    assert stats["peak"] == 2
+
+
+def test_upstream_error_propagates():
+    """A failing quote still fails the whole aggregate (the route maps it to 502)."""
+    with patch('app.services.aggregator.fetch_simple_price_async') as mock_crypto, \
+         patch('app.services.aggregator.fetch_quote_async', side_effect=RuntimeError("boom")), \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
+        mock_crypto.return_value = {"bitcoin": {"usd": 1.0}}
+        with pytest.raises(RuntimeError, match="boom"):
+            asyncio.run(aggregate_with_cache("bitcoin,AAPL"))
+        written = [key for call in mock_set_cache.call_args_list for key in call.args[0]]
+        assert "px::alphavantage::AAPL::usd" not in written
+
+
+def test_partial_hit_fetches_only_missing_symbols():
+    """Cached symbols are reused across CSV orderings; only new ones go upstream."""
+    with patch('app.services.aggregator.fetch_simple_price_async') as mock_crypto, \
+         patch('app.services.aggregator.fetch_quote_async') as mock_stock:
+        mock_crypto.return_value = {"bitcoin": {"usd": 45000.0}}
+        mock_stock.return_value = {"05. price": "150.25", "07. latest trading day": "2025-11-25"}
+
+        first = asyncio.run(aggregate_with_cache("bitcoin,AAPL"))
+        assert first["meta"]["cache"] == "miss"
+
+        # same set, different order -> full hit, no upstream calls
+        mock_crypto.reset_mock()
+        mock_stock.reset_mock()
+        second = asyncio.run(aggregate_with_cache("AAPL,bitcoin"))
+        assert second["meta"]["cache"] == "hit"
+        assert second["meta"]["cacheByAsset"] == {"AAPL": "hit", "bitcoin": "hit"}
+        mock_crypto.assert_not_called()
+        mock_stock.assert_not_called()
+
+        # superset -> partial, only MSFT is fetched
+        third = asyncio.run(aggregate_with_cache("bitcoin,AAPL,MSFT"))
+        assert third["meta"]["cache"] == "partial"
+        assert third["meta"]["cacheByAsset"] == {"bitcoin": "hit", "AAPL": "hit", "MSFT": "miss"}
+        assert {a["symbol"] for a in third["assets"]} == {"bitcoin", "AAPL", "MSFT"}
+        mock_crypto.assert_not_called()
+        mock_stock.assert_called_once_with("MSFT", priority=PRIORITY_QUOTE)
+
+
+def test_per_symbol_cache_keys():
+    """Entries are keyed by source, symbol and quote currency."""
+    from app.services.aggregator import asset_cache_key
+
+    assert asset_cache_key("bitcoin") == "px::coingecko::bitcoin::usd"
+    assert asset_cache_key("AAPL") == "px::alphavantage::AAPL::usd"
+    assert asset_cache_key("bitcoin", vs="eur") == "px::coingecko::bitcoin::eur"
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    """Requests that miss the same symbols at the same time coalesce onto one fetch."""
+    calls = {"quote": 0, "price": 0}
+
+    async def slow_quote(symbol, priority=PRIORITY_QUOTE):
+        calls["quote"] += 1
+        await asyncio.sleep(0.05)
+        return {"05. price": "1.00", "07. latest trading day": "2025-11-25"}
+
+    async def slow_price(ids, vs):
+        calls["price"] += 1
+        await asyncio.sleep(0.05)
+        return {i: {"usd": 2.0} for i in ids}
+
+    async def burst():
+        return await asyncio.gather(*(aggregate_with_cache("bitcoin,AAPL") for _ in range(10)))
+
+    with patch('app.services.aggregator.fetch_quote_async', slow_quote), \
+         patch('app.services.aggregator.fetch_simple_price_async', slow_price), \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many'):
+        results = asyncio.run(burst())
+
+    assert calls == {"quote": 1, "price": 1}
+    assert all(len(r["assets"]) == 2 for r in results)
+
+
+def _cache_doc(payload, stale_in, expires_in):
+    from datetime import datetime, timedelta, timezone
+    now = datetime.now(timezone.utc)
+    return {
+        "payload": payload,
+        "staleAt": now + timedelta(seconds=stale_in),
+        "expiresAt": now + timedelta(seconds=expires_in),
+    }
+
+
+def test_stale_entry_served_and_refreshed_in_background():
+    """Between soft and hard TTL the old price is returned at once and refreshed behind it."""
+    import app.services.aggregator as agg
+
+    old = {"symbol": "AAPL", "type": "stock", "price": 100.0, "source": "alphavantage", "asOf": "2025-11-24"}
+    docs = {"px::alphavantage::AAPL::usd": _cache_doc(old, stale_in=-5, expires_in=60)}
+
+    async def run():
+        result = await aggregate_with_cache("AAPL")
+        assert mock_stock.await_count == 0  # caller did not wait for upstream
+        await asyncio.gather(*agg._background)
+        return result
+
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many', return_value=docs), \
+         patch('app.services.aggregator.set_cache_many') as mock_set_cache:
+        mock_stock.return_value = {"05. price": "150.25", "07. latest trading day": "2025-11-25"}
+        result = asyncio.run(run())
+
+    assert result["meta"]["cache"] == "stale"
+    assert result["assets"][0]["price"] == 100.0
+    # revalidation doesn't spend the quote budget
+    mock_stock.assert_called_once_with("AAPL", priority=PRIORITY_BACKGROUND)
+    written = mock_set_cache.call_args.args[0]
+    assert written["px::alphavantage::AAPL::usd"]["price"] == 150.25
+
+
+def test_expired_entry_is_a_miss():
+    """Past the hard TTL an entry is refetched even if Mongo has not purged it yet."""
+    old = {"symbol": "AAPL", "type": "stock", "price": 100.0, "source": "alphavantage", "asOf": "2025-11-24"}
+    docs = {"px::alphavantage::AAPL::usd": _cache_doc(old, stale_in=-60, expires_in=-1)}
+
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many', return_value=docs), \
+         patch('app.services.aggregator.set_cache_many'):
+        mock_stock.return_value = {"05. price": "150.25", "07. latest trading day": "2025-11-25"}
+        result = asyncio.run(aggregate_with_cache("AAPL"))
+
+    assert result["meta"]["cache"] == "miss"
+    assert result["assets"][0]["price"] == 150.25
+
+
+def test_open_circuit_serves_last_known_good():
+    """With the upstream's circuit open, the last saved price is served and flagged."""
+    from app.adapters.circuit import CircuitOpen
+
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock, \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many'):
+        mock_stock.return_value = {"05. price": "150.25", "07. latest trading day": "2025-11-25"}
+        asyncio.run(aggregate_with_cache("AAPL"))
+
+        mock_stock.side_effect = CircuitOpen("alphavantage", 30)
+        result = asyncio.run(aggregate_with_cache("AAPL"))
+
+    asset = result["assets"][0]
+    assert asset["price"] == 150.25
+    assert asset["lastKnownGood"] is True
+    assert len(result["meta"]["warnings"]) == 1
+    assert "AAPL: alphavantage unavailable" in result["meta"]["warnings"][0]
+
+
+def test_open_circuit_without_last_known_good_still_fails():
+    """Nothing saved for the symbol -> the upstream error surfaces as before."""
+    from app.adapters.circuit import CircuitOpen
+
+    with patch('app.services.aggregator.fetch_quote_async', side_effect=CircuitOpen("alphavantage", 30)), \
+         patch('app.services.aggregator.get_cache_many', return_value={}), \
+         patch('app.services.aggregator.set_cache_many'):
+        with pytest.raises(CircuitOpen):
+            asyncio.run(aggregate_with_cache("AAPL"))
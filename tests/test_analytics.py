@@ -0,0 +1,66 @@
+import numpy as np
+
+from app.core.series import Series
+from app.services import analytics_service as analytics
+
+DAY = analytics.DAY_MS
+
+
+def test_daily_closes_keeps_last_point_of_each_day():
+    s = Series(np.array([0, 3600_000, DAY + 5, DAY + 10]), np.array([1.0, 2.0, 3.0, 4.0]))
+    closes = analytics.daily_closes(s)
+    assert closes.t.tolist() == [0, DAY]
+    assert closes.y.tolist() == [2.0, 4.0]
+
+
+def test_calendar_follows_stock_trading_days_and_fills_crypto():
+    stock = Series(np.array([0, 3 * DAY]), np.array([10.0, 11.0]))  # Fri, Mon
+    coin = Series(np.array([0, DAY, 2 * DAY]), np.array([1.0, 2.0, 3.0]))  # no Monday close yet
+    calendar = analytics.build_calendar([stock, coin], [True, False])
+    assert calendar.tolist() == [0, 3 * DAY]
+    prices = analytics.align(calendar, [stock, coin])
+    assert prices.tolist() == [[10.0, 1.0], [11.0, 3.0]]
+
+
+def test_compute_matches_definitions():
+    prices = np.array([[100.0, 10.0], [110.0, 9.0], [99.0, 9.9], [121.0, 9.0]])
+    stats = analytics.compute(prices, vol_window=2, periods_per_year=252)
+    assert np.isnan(stats.returns[0]).all()
+    assert np.allclose(stats.returns[1], [0.1, -0.1])
+    expected_vol = np.std([0.1, -0.1], ddof=1) * np.sqrt(252)
+    assert np.isclose(stats.volatility[2, 0], expected_vol)
+    assert np.isnan(stats.volatility[1]).all()
+    assert np.isclose(stats.max_drawdown[0], 99 / 110 - 1)
+    assert np.isclose(stats.total_return[1], -0.1)
+    assert np.isclose(stats.correlation[0, 0], 1.0)
+    assert stats.correlation[0, 1] < 0
+
+
+def test_analytics_endpoint(client):
+    r = client.get("/analytics", params={"symbols": "bitcoin,AAPL,MSFT", "days": 30, "vol_window": 5})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["symbols"] == ["bitcoin", "AAPL", "MSFT"]
+    assert len(data["calendar"]) == 30
+    aapl = data["series"]["AAPL"]
+    assert aapl["returns"][0] is None and aapl["returns"][1] is not None
+    assert aapl["volatility"][4] is None and aapl["volatility"][5] is not None
+    assert aapl["maxDrawdown"] == 0.0
+    assert len(data["correlation"]) == 3
+    assert data["correlationSamples"][1][2] == 29  # days both stocks have a return
+    assert data["meta"]["periodsPerYear"] == 252
+
+
+def test_analytics_requires_symbols(client):
+    assert client.get("/analytics", params={"symbols": " , "}).status_code == 400
+
+
+def test_correlation_is_pairwise_complete():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.01, size=(40, 3))
+    returns[:30, 2] = np.nan  # short history
+    corr, n = analytics.pairwise_correlation(returns)
+    assert n.tolist() == [[40, 40, 10], [40, 40, 10], [10, 10, 10]]
+    assert np.isclose(corr[0, 1], np.corrcoef(returns[:, 0], returns[:, 1])[0, 1])
+    assert np.isclose(corr[0, 2], np.corrcoef(returns[30:, 0], returns[30:, 2])[0, 1])
+    assert np.allclose(np.diag(corr), 1.0)
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timezone
 
 
@@ -9,7 +10,7 @@ def test_list_assets_empty():
     db = get_db()
     db.assets.delete_many({})
     
-    result = list_assets()
+    result = asyncio.run(list_assets())
     assert isinstance(result, list)
     assert len(result) == 0
 
@@ -22,7 +23,7 @@ def test_add_asset_crypto():
     db = get_db()
     db.assets.delete_many({})
     
-    result = add_asset("BTC", "crypto", "Bitcoin")
+    result = asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     
     assert result["symbol"] == "BTC"
     assert result["type"] == "crypto"
@@ -40,7 +41,7 @@ def test_add_asset_stock():
     db = get_db()
     db.assets.delete_many({})
     
-    result = add_asset("AAPL", "stock", "Apple Inc.")
+    result = asyncio.run(add_asset("AAPL", "stock", "Apple Inc."))
     
     assert result["symbol"] == "AAPL"
     assert result["type"] == "stock"
@@ -56,7 +57,7 @@ def test_add_asset_strips_whitespace():
     db = get_db()
     db.assets.delete_many({})
     
-    result = add_asset("  BTC  ", "  crypto  ", "Bitcoin")
+    result = asyncio.run(add_asset("  BTC  ", "  crypto  ", "Bitcoin"))
     
     assert result["symbol"] == "BTC"
     assert result["type"] == "crypto"
@@ -70,7 +71,7 @@ def test_add_asset_lowercase_type():
     db = get_db()
     db.assets.delete_many({})
     
-    result = add_asset("ETH", "CRYPTO", "Ethereum")
+    result = asyncio.run(add_asset("ETH", "CRYPTO", "Ethereum"))
     
     assert result["type"] == "crypto"
 
@@ -83,7 +84,7 @@ def test_add_asset_without_name():
     db = get_db()
     db.assets.delete_many({})
     
-    result = add_asset("XRP", "crypto")
+    result = asyncio.run(add_asset("XRP", "crypto"))
     
     assert result["symbol"] == "XRP"
     assert result["type"] == "crypto"
@@ -99,11 +100,11 @@ def test_add_asset_upsert_behavior():
     db.assets.delete_many({})
     
     # Add first time
-    first = add_asset("BTC", "crypto", "Bitcoin")
+    first = asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     first_added_at = first["addedAt"]
     
     # Try to add again with different name
-    second = add_asset("BTC", "crypto", "Bitcoin Updated")
+    second = asyncio.run(add_asset("BTC", "crypto", "Bitcoin Updated"))
     
     # Should return existing asset, not overwrite
     assert second["symbol"] == "BTC"
@@ -119,10 +120,10 @@ def test_update_asset_success():
     db.assets.delete_many({})
     
     # Create asset
-    add_asset("BTC", "crypto", "Bitcoin")
+    asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     
     # Update it
-    result = update_asset("BTC", {"name": "Bitcoin Updated", "active": False})
+    result = asyncio.run(update_asset("BTC", {"name": "Bitcoin Updated", "active": False}))
     
     assert result["symbol"] == "BTC"
     assert result["name"] == "Bitcoin Updated"
@@ -139,14 +140,14 @@ def test_update_asset_adds_updated_at():
     db.assets.delete_many({})
     
     # Create asset
-    original = add_asset("BTC", "crypto", "Bitcoin")
+    original = asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     original_updated = original["updatedAt"]
     
     # Wait a moment and update
     import time
     time.sleep(0.01)
     
-    result = update_asset("BTC", {"name": "Updated"})
+    result = asyncio.run(update_asset("BTC", {"name": "Updated"}))
     
     # updatedAt should be newer
     assert result["updatedAt"] > original_updated
@@ -160,7 +161,7 @@ def test_update_asset_nonexistent():
     db = get_db()
     db.assets.delete_many({})
     
-    result = update_asset("NONEXISTENT", {"name": "Test"})
+    result = asyncio.run(update_asset("NONEXISTENT", {"name": "Test"}))
     
     assert result is None
 
@@ -174,10 +175,10 @@ def test_delete_asset_success():
     db.assets.delete_many({})
     
     # Create asset
-    add_asset("BTC", "crypto", "Bitcoin")
+    asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     
     # Delete it
-    result = delete_asset("BTC")
+    result = asyncio.run(delete_asset("BTC"))
     
     assert result == 1  # One document deleted
 
@@ -190,7 +191,7 @@ def test_delete_asset_nonexistent():
     db = get_db()
     db.assets.delete_many({})
     
-    result = delete_asset("NONEXISTENT")
+    result = asyncio.run(delete_asset("NONEXISTENT"))
     
     assert result == 0  # No documents deleted
 
@@ -205,16 +206,33 @@ def test_list_assets_multiple():
     db.assets.delete_many({})
     
     # Add multiple assets with slight delays
-    add_asset("BTC", "crypto", "Bitcoin")
+    asyncio.run(add_asset("BTC", "crypto", "Bitcoin"))
     time.sleep(0.01)
-    add_asset("ETH", "crypto", "Ethereum")
+    asyncio.run(add_asset("ETH", "crypto", "Ethereum"))
     time.sleep(0.01)
-    add_asset("AAPL", "stock", "Apple")
+    asyncio.run(add_asset("AAPL", "stock", "Apple"))
     
-    result = list_assets()
+    result = asyncio.run(list_assets())
     
     assert len(result) == 3
     # Should be sorted by addedAt descending (most recent first)
     assert result[0]["symbol"] == "AAPL"
     assert result[1]["symbol"] == "ETH"
     assert result[2]["symbol"] == "BTC"
+
+
+def test_list_active_assets_filters_inactive_and_type():
+    """list_active_assets returns active assets, optionally of one type."""
+    from app.db.mongo import get_db
+    from app.services.assets_service import add_asset, list_active_assets, update_asset
+
+    db = get_db()
+    db.assets.delete_many({})
+
+    asyncio.run(add_asset("bitcoin", "crypto"))
+    asyncio.run(add_asset("AAPL", "stock"))
+    asyncio.run(add_asset("MSFT", "stock"))
+    asyncio.run(update_asset("MSFT", {"active": False}))
+
+    assert {a["symbol"] for a in asyncio.run(list_active_assets())} == {"bitcoin", "AAPL"}
+    assert [a["symbol"] for a in asyncio.run(list_active_assets("stock"))] == ["AAPL"]
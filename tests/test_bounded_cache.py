@@ -0,0 +1,62 @@
+from prometheus_client import REGISTRY
+
+from app.core.bounded_cache import BoundedCache, approx_size
+
+
+def _evictions(name, reason):
+    return REGISTRY.get_sample_value("inproc_cache_evictions_total", {"cache": name, "reason": reason}) or 0.0
+
+
+def test_lru_eviction_by_entries():
+    c = BoundedCache("test_entries", max_entries=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1  # a is now most recent
+    before = _evictions("test_entries", "entries")
+    c.put("c", 3)
+    assert len(c) == 2
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert _evictions("test_entries", "entries") == before + 1
+
+
+def test_byte_budget_evicts_oldest_and_skips_oversized_values():
+    value = "x" * 1000
+    per_entry = approx_size("k0") + approx_size(value)
+    c = BoundedCache("test_bytes", max_entries=100, max_bytes=per_entry * 3)
+    for i in range(5):
+        c.put(f"k{i}", value)
+    assert len(c) == 3 and c.bytes <= c.max_bytes
+    assert c.get("k0") is None and c.get("k4") == value
+    c.put("huge", "x" * 10_000)
+    assert c.get("huge") is None and len(c) == 3
+
+
+def test_ttl_and_per_entry_override():
+    c = BoundedCache("test_ttl", max_entries=10, ttl=60)
+    c.put("default", 1, now=1000.0)
+    c.put("short", 2, ttl=5, now=1000.0)
+    c.put("never", 3, ttl=0, now=1000.0)  # already expired: not stored
+    assert c.get("short", now=1004.0) == 2
+    assert c.get("short", now=1006.0) is None
+    assert c.get("default", now=1059.0) == 1
+    assert c.get("default", now=1061.0) is None
+    assert c.get("never", now=1000.0) is None
+    assert len(c) == 0 and c.bytes == 0
+
+
+def test_replacing_a_key_keeps_byte_count_exact():
+    c = BoundedCache("test_replace", max_entries=10)
+    c.put("k", [1, 2, 3])
+    c.put("k", [1])
+    assert c.bytes == approx_size("k") + approx_size([1])
+    c.invalidate(["k"])
+    assert c.bytes == 0
+
+
+def test_size_exported_on_metrics(client):
+    c = BoundedCache("test_metrics", max_entries=10)
+    c.put("a", "value")
+    body = client.get("/metrics").text
+    assert 'inproc_cache_entries{cache="test_metrics"} 1.0' in body
+    assert 'inproc_cache_bytes{cache="cache_l1"}' in body
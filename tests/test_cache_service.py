@@ -1,6 +1,7 @@
+import asyncio
 import time
 from datetime import datetime, timedelta, timezone
-from app.services.cache_service import get_cache, set_cache
+from app.services.cache_service import get_cache, set_cache, cache_state
 
 
 def test_set_cache_stores_properly():
@@ -9,10 +10,10 @@ def test_set_cache_stores_properly():
     test_payload = {"symbol": "BTC", "price": 50000.0}
     
     # Set cache with 60 second TTL
-    set_cache(test_key, test_payload, ttl_seconds=60)
+    asyncio.run(set_cache(test_key, test_payload, ttl_seconds=60))
     
     # Retrieve the cached entry
-    result = get_cache(test_key)
+    result = asyncio.run(get_cache(test_key))
     
     assert result is not None
     assert result["key"] == test_key
@@ -32,13 +33,13 @@ def test_get_cache_returns_expired_document_before_ttl_cleanup():
     test_payload = {"data": "temp"}
     
     # Set a cache entry with very short TTL
-    set_cache(test_key, test_payload, ttl_seconds=1)
+    asyncio.run(set_cache(test_key, test_payload, ttl_seconds=1))
     
     # Wait for it to expire
     time.sleep(1.1)
     
     # Our fake cache still returns it (like MongoDB before TTL cleanup job runs)
-    result = get_cache(test_key)
+    result = asyncio.run(get_cache(test_key))
     assert result is not None  # Entry still exists
     assert result["key"] == test_key
     assert result["payload"] == test_payload
@@ -46,5 +47,81 @@ def test_get_cache_returns_expired_document_before_ttl_cleanup():
 
 def test_get_cache_returns_none_for_nonexistent_key():
     """Test that get_cache returns None for keys that don't exist."""
-    result = get_cache("nonexistent_key_12345")
+    result = asyncio.run(get_cache("nonexistent_key_12345"))
     assert result is None
+
+
+def test_cache_state_soft_and_hard_ttl():
+    """Entries are fresh until staleAt, stale until expiresAt, then expired."""
+    now = datetime.now(timezone.utc)
+    doc = {
+        "key": "k",
+        "payload": {},
+        "staleAt": now + timedelta(seconds=10),
+        "expiresAt": now + timedelta(seconds=70),
+    }
+    assert cache_state(doc, now) == "fresh"
+    assert cache_state(doc, now + timedelta(seconds=30)) == "stale"
+    assert cache_state(doc, now + timedelta(seconds=70)) == "expired"
+    assert cache_state(None, now) == "expired"
+
+
+def test_cache_state_without_soft_ttl():
+    """Entries written before staleAt existed stay fresh until expiresAt."""
+    now = datetime.now(timezone.utc)
+    doc = {"key": "k", "payload": {}, "expiresAt": now + timedelta(seconds=5)}
+    assert cache_state(doc, now) == "fresh"
+    assert cache_state(doc, now + timedelta(seconds=6)) == "expired"
+
+
+def _doc(key, expires_in=60):
+    return {
+        "key": key,
+        "payload": {"v": key},
+        "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+    }
+
+
+def test_l1_cache_lru_eviction():
+    """The L1 tier is bounded; the least recently used key is evicted first."""
+    from app.services.cache_service import L1Cache
+
+    l1 = L1Cache(max_entries=2, max_age=60)
+    l1.put(_doc("a"))
+    l1.put(_doc("b"))
+    assert l1.get("a")["payload"] == {"v": "a"}  # a is now most recent
+    l1.put(_doc("c"))
+    assert len(l1) == 2
+    assert l1.get("b") is None
+    assert l1.get("a") is not None and l1.get("c") is not None
+    assert l1.stats["l1Misses"] == 1
+
+
+def test_l1_cache_honours_expires_at_and_max_age():
+    """L1 copies go away at the Mongo expiresAt or after max_age, whichever is first."""
+    from app.services.cache_service import L1Cache
+
+    l1 = L1Cache(max_entries=10, max_age=5)
+    now = datetime.now(timezone.utc)
+    l1.put(_doc("short", expires_in=2), now=now)
+    l1.put(_doc("long", expires_in=600), now=now)
+    l1.put(_doc("gone", expires_in=-1), now=now)  # already expired: never stored
+
+    assert l1.get("short", now=now + timedelta(seconds=1)) is not None
+    assert l1.get("short", now=now + timedelta(seconds=3)) is None
+    assert l1.get("long", now=now + timedelta(seconds=4)) is not None
+    assert l1.get("long", now=now + timedelta(seconds=6)) is None
+    assert l1.get("gone", now=now) is None
+
+
+def test_l1_cache_invalidate():
+    """invalidate() drops selected keys or the whole tier."""
+    from app.services.cache_service import L1Cache
+
+    l1 = L1Cache(max_entries=10, max_age=60)
+    for k in ("a", "b", "c"):
+        l1.put(_doc(k))
+    l1.invalidate(["a"])
+    assert l1.get("a") is None and l1.get("b") is not None
+    l1.invalidate()
+    assert len(l1) == 0
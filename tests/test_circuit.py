@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.adapters.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, is_upstream_failure
+
+
+def _breaker(**kw):
+    opts = dict(window=10, min_calls=4, failure_ratio=0.5, slow_call_seconds=1, slow_ratio=0.8, open_seconds=60)
+    opts.update(kw)
+    return CircuitBreaker("test", **opts)
+
+
+def _status_error(code):
+    req = httpx.Request("GET", "https://example.test/")
+    return httpx.HTTPStatusError("err", request=req, response=httpx.Response(code, request=req))
+
+
+def _fail(breaker, exc):
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+def test_opens_after_failure_ratio_and_short_circuits():
+    """Enough upstream failures open the circuit; later calls fail without running."""
+    breaker = _breaker()
+    for _ in range(4):
+        _fail(breaker, httpx.ConnectTimeout("slow"))
+    assert breaker.state == OPEN
+
+    ran = []
+    with pytest.raises(CircuitOpen) as exc:
+        with breaker.guard():
+            ran.append(1)
+    assert ran == []
+    assert exc.value.retry_after == 60
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_caller_errors_do_not_count():
+    """404s and other non-upstream errors are recorded as healthy calls."""
+    breaker = _breaker()
+    for _ in range(6):
+        _fail(breaker, _status_error(404))
+        _fail(breaker, ValueError("bad symbol"))
+    assert breaker.state == CLOSED
+    assert is_upstream_failure(_status_error(503))
+    assert is_upstream_failure(_status_error(429))
+    assert not is_upstream_failure(_status_error(404))
+
+
+def test_slow_calls_open_the_circuit():
+    """A window of calls that all exceed the slow threshold opens it too."""
+    breaker = _breaker(min_calls=2)
+    breaker.record(False, 2.0)
+    breaker.record(False, 2.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    """After the cool-down one probe goes through: success closes, failure reopens."""
+    breaker = _breaker(min_calls=1, open_seconds=0.05)
+    _fail(breaker, httpx.ConnectError("down"))
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    _fail(breaker, httpx.ConnectError("still down"))
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_only_one_probe_while_half_open():
+    """Concurrent callers don't pile onto a recovering upstream."""
+    breaker = _breaker(min_calls=1, open_seconds=0.01)
+    _fail(breaker, httpx.ConnectError("down"))
+    time.sleep(0.02)
+
+    async def probe():
+        async with breaker.guard():
+            await asyncio.sleep(0.05)
+
+    async def other():
+        await asyncio.sleep(0.01)
+        async with breaker.guard():
+            pass
+
+    async def run():
+        return await asyncio.gather(probe(), other(), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first is None
+    assert isinstance(second, CircuitOpen)
+    assert breaker.state == CLOSED
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import app.services.coin_list_service as coins
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "bitdao", "symbol": "bit", "name": "BitDAO"},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_process(monkeypatch):
+    """Each test starts like a newly started worker: nothing in memory."""
+    monkeypatch.setattr(coins, "_state", {**coins._state, "items": [], "fetchedAt": 0.0, "index": None})
+
+
+def _seed_snapshot(age_seconds, etag='"v1"'):
+    coins.put_snapshot(coins.SNAPSHOT_KEY, {
+        "items": COINS,
+        "ranks": [["bitcoin", 1]],
+        "fetchedAt": datetime.now(timezone.utc) - timedelta(seconds=age_seconds),
+        "etag": etag,
+        "lastModified": None,
+    })
+
+
+def test_cold_start_serves_from_snapshot():
+    """A restarted worker answers from the Mongo snapshot without downloading."""
+    _seed_snapshot(age_seconds=60)
+    with patch.object(coins, "fetch_coin_list", side_effect=AssertionError("no download")):
+        coins.warm_up()
+        assert coins.suggest_crypto("bit", 1) == [{"id": "bitcoin", "symbol": "BTC", "name": "Bitcoin"}]
+
+
+def test_stale_list_is_served_while_refreshing():
+    """Past max age the current list is returned at once and refreshed behind it."""
+    _seed_snapshot(age_seconds=coins.COIN_LIST_MAX_AGE_SECONDS + 60)
+    with patch.object(coins, "refresh_in_background") as bg, \
+         patch.object(coins, "fetch_coin_list", side_effect=AssertionError("no inline download")):
+        assert [c["id"] for c in coins.suggest_crypto("bit", 5)] == ["bitcoin", "bitdao"]
+    bg.assert_called_once()
+
+
+def test_refresh_revalidates_and_keeps_list_on_304():
+    """An unchanged upstream list costs a 304; only the timestamp moves."""
+    _seed_snapshot(age_seconds=coins.COIN_LIST_MAX_AGE_SECONDS + 60)
+    coins.load_snapshot()
+    before = coins._state["fetchedAt"]
+
+    with patch.object(coins, "fetch_coin_list", return_value=(None, {"etag": '"v1"', "lastModified": None})) as fetch:
+        assert coins.refresh() is False
+    fetch.assert_called_once_with('"v1"', None)
+    assert coins._state["items"] == COINS
+    assert coins._state["fetchedAt"] > before
+    assert not coins.is_stale()
+    assert coins._snapshot_fetched_at() == pytest.approx(coins._state["fetchedAt"], abs=1)
+
+
+def test_first_download_is_persisted():
+    """With no snapshot the list is downloaded once and saved for the next worker."""
+    with patch.object(coins, "fetch_coin_list", return_value=(COINS, {"etag": '"v2"', "lastModified": None})), \
+         patch.object(coins, "fetch_market_ranks", return_value={"bitcoin": 1}):
+        assert coins.get_coin_list() == COINS
+
+    coins._state = {**coins._state, "items": [], "fetchedAt": 0.0}
+    assert coins.load_snapshot() is True
+    assert coins._state["etag"] == '"v2"'
+    assert coins._state["ranks"] == {"bitcoin": 1}
+
+
+def test_fetch_coin_list_sends_validators(monkeypatch):
+    """The adapter revalidates with If-None-Match and reports a 304 as no items."""
+    from app.adapters import coingecko, http_client
+
+    seen = {}
+
+    def handler(request):
+        seen["inm"] = request.headers.get("if-none-match")
+        return httpx.Response(304, headers={"etag": '"v1"'})
+
+    monkeypatch.setitem(http_client._sync_clients, "coingecko", httpx.Client(transport=httpx.MockTransport(handler)))
+    items, validators = coingecko.fetch_coin_list(etag='"v1"')
+    assert items is None
+    assert seen["inm"] == '"v1"'
+    assert validators["etag"] == '"v1"'
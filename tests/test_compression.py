@@ -0,0 +1,77 @@
+import gzip
+import json
+
+import numpy as np
+
+from app.core import compression
+from app.core.compression import negotiate_encoding
+from app.core.responses import json_bytes
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("") is None
+
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_json_bytes_matches_stdlib():
+    payload = {"symbol": "bitcoin", "price": 43210.5, "ok": True, "none": None, "pts": [{"t": 1, "y": 2.5}], "name": "Café"}
+    assert json.loads(json_bytes(payload)) == payload
+    assert json.loads(json_bytes({"y": np.array([1.5, 2.0])})) == {"y": [1.5, 2.0]}
+
+
+def test_json_fallback_matches_orjson(monkeypatch):
+    from app.core import responses
+
+    payload = {"mean": float("nan"), "max": float("inf"), "y": np.array([1.5, np.nan]), "n": np.int64(3)}
+    fast = json.loads(json_bytes(payload))
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(json_bytes(payload)) == fast == {"mean": None, "max": None, "y": [1.5, None], "n": 3}
+
+
+def test_large_json_is_gzipped_with_weak_etag(client):
+    params = {"id": "bitcoin", "days": 30}
+    r = client.get("/history/crypto", params=params, headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.num_bytes_downloaded < len(r.content)  # httpx decoded it
+    assert r.json()["symbol"] == "bitcoin"
+    etag = r.headers["etag"]
+    assert etag.startswith('W/"')
+
+    again = client.get("/history/crypto", params=params, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_small_or_unaccepted_bodies_are_not_compressed(client):
+    r = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+
+    r = client.get("/history/crypto", params={"id": "bitcoin"}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers and r.headers["etag"].startswith('"')
+
+
+def test_gzip_is_deterministic():
+    body = b"x" * 5000
+    assert compression.compress(body, "gzip") == compression.compress(body, "gzip")
+    assert gzip.decompress(compression.compress(body, "gzip")) == body
+
+
+def test_complete_body_gets_content_length():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    app = Starlette(routes=[Route("/", lambda request: PlainTextResponse("abc" * 1000))])
+    app.add_middleware(compression.CompressionMiddleware)
+    r = TestClient(app).get("/", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) == r.num_bytes_downloaded < 3000
+    assert r.text == "abc" * 1000
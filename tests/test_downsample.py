@@ -0,0 +1,32 @@
+import numpy as np
+
+from app.core.downsample import downsample, lttb_indices
+from app.core.series import Series
+
+
+def test_short_series_is_returned_unchanged():
+    series = Series.from_points({"t": i, "y": float(i)} for i in range(5))
+    assert downsample(series, 10) is series
+
+
+def test_keeps_endpoints_and_requested_size():
+    t = np.arange(1000, dtype=np.float64)
+    y = np.sin(t / 50)
+    idx = lttb_indices(t, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_keeps_spikes_that_striding_would_drop():
+    y = np.zeros(1000)
+    y[333], y[777] = 50.0, -40.0
+    idx = lttb_indices(np.arange(1000, dtype=np.float64), y, 20)
+    assert 333 in idx and 777 in idx
+
+
+def test_downsample_returns_original_points():
+    points = [{"t": i * 1000, "y": float(i % 7)} for i in range(500)]
+    out = downsample(Series.from_points(points), 50)
+    assert len(out) == 50
+    assert all(p in points for p in out.to_points())
@@ -6,6 +6,7 @@ def test_history_crypto(client):
     assert isinstance(data["series"], list)
     assert len(data["series"]) == 30
 
+
 def test_history_crypto_default_days(client):
     """Test history/crypto with default days parameter."""
     r = client.get("/history/crypto", params={"id": "ethereum"})
@@ -14,6 +15,7 @@ def test_history_crypto_default_days(client):
     assert data["symbol"] == "ethereum"
     assert isinstance(data["series"], list)
 
+
 def test_history_stock(client):
     r = client.get("/history/stock", params={"symbol": "AAPL"})
     assert r.status_code == 200
@@ -22,10 +24,54 @@ def test_history_stock(client):
     assert isinstance(data["series"], list)
     assert len(data["series"]) == 30
 
+
 def test_history_stock_different_symbol(client):
     """Test history/stock with different stock symbol."""
     r = client.get("/history/stock", params={"symbol": "MSFT"})
     assert r.status_code == 200
     data = r.json()
     assert data["symbol"] == "MSFT"
-    assert isinstance(data["series"], list)
\ No newline at end of file
+    assert isinstance(data["series"], list)
+
+
+def test_history_max_points_downsamples(client):
+    r = client.get("/history/crypto", params={"id": "bitcoin", "days": 30, "max_points": 10})
+    assert r.status_code == 200
+    series = r.json()["series"]
+    assert len(series) == 10
+    r = client.get("/history/stock", params={"symbol": "AAPL", "points": 5})
+    assert len(r.json()["series"]) == 5
+
+
+def test_history_max_points_must_be_at_least_3(client):
+    r = client.get("/history/stock", params={"symbol": "AAPL", "max_points": 2})
+    assert r.status_code == 422
+
+
+def test_history_columnar_and_delta_formats(client):
+    points = client.get("/history/stock", params={"symbol": "AAPL"}).json()["series"]
+    r = client.get("/history/stock", params={"symbol": "AAPL", "format": "columnar"})
+    assert r.json()["series"] == {"t": [p["t"] for p in points], "y": [p["y"] for p in points]}
+    r = client.get("/history/stock", params={"symbol": "AAPL"},
+                   headers={"Accept": "application/vnd.aggregator.delta+json"})
+    assert r.headers["content-type"].startswith("application/vnd.aggregator.delta+json")
+    delta = r.json()["series"]
+    assert delta["t0"] == points[0]["t"]
+    assert len(delta["dt"]) == len(points) - 1
+    assert delta["t0"] + sum(delta["dt"]) == points[-1]["t"]
+
+
+def test_history_binary_format(client):
+    from app.core.series import decode_binary
+    points = client.get("/history/crypto", params={"id": "bitcoin"}).json()["series"]
+    r = client.get("/history/crypto", params={"id": "bitcoin"},
+                   headers={"Accept": "application/vnd.aggregator.series"})
+    assert r.headers["content-type"] == "application/vnd.aggregator.series"
+    assert r.headers["x-interval"] == "1h"
+    assert len(r.content) == 4 + 16 * len(points)
+    assert decode_binary(r.content).to_points() == points
+
+
+def test_history_unknown_format_is_rejected(client):
+    r = client.get("/history/stock", params={"symbol": "AAPL", "format": "xml"})
+    assert r.status_code == 422
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.services.history_service as history
+
+HOUR = history.HOUR_MS
+DAY = history.DAY_MS
+NOW = 1_700_000_000_000 - 1_700_000_000_000 % DAY + 10 * HOUR  # 10:00 UTC
+
+
+class FakeChart:
+    """CoinGecko market_chart stand-in: hourly points up to the current minute."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, coin_id, days=30, vs="usd"):
+        self.calls.append(days)
+        start = NOW - days * DAY
+        return [{"t": t, "y": float(t // HOUR)} for t in range(start, NOW, HOUR)] + [{"t": NOW, "y": -1.0}]
+
+
+@pytest.fixture
+def chart(monkeypatch):
+    fake = FakeChart()
+    monkeypatch.setattr(history, "fetch_market_chart_async", fake)
+    monkeypatch.setattr(history, "_now_ms", lambda: NOW)
+    return fake
+
+
+def _stored():
+    return history.get_db().price_history.count_documents({})
+
+
+def test_closed_bars_buckets_and_drops_open_bar():
+    points = [{"t": 0, "y": 1.0}, {"t": HOUR // 2, "y": 2.0}, {"t": HOUR, "y": 3.0}]
+    assert history.closed_bars(points, "1h", HOUR + 1) == [{"t": 0, "y": 2.0}]
+
+
+def test_first_view_stores_window_and_second_is_served_from_store(chart):
+    _, first = asyncio.run(history.crypto_history("bitcoin", days=2))
+    _, second = asyncio.run(history.crypto_history("bitcoin", days=2))
+    assert chart.calls == [3]  # since midnight two days ago
+    assert first.to_points() == second.to_points()
+    assert first.t[0] == NOW - NOW % DAY - 2 * DAY
+    assert first.t[-1] == NOW - HOUR  # the forming bar is not stored
+    assert _stored() == 3 * 24  # everything fetched, not just the window
+
+
+def test_new_bar_fetches_only_points_after_last_stored(chart, monkeypatch):
+    asyncio.run(history.crypto_history("bitcoin", days=2))
+    before = _stored()
+    later = NOW + 2 * HOUR
+    monkeypatch.setattr(history, "_now_ms", lambda: later)
+
+    async def since_last(coin_id, days=30, vs="usd"):
+        chart.calls.append(days)
+        return [{"t": t, "y": 1.0} for t in range(NOW - HOUR, later + 1, HOUR)]
+
+    monkeypatch.setattr(history, "fetch_market_chart_async", since_last)
+    _, series = asyncio.run(history.crypto_history("bitcoin", days=2))
+    assert chart.calls == [3, 1]
+    assert _stored() == before + 2  # 10:00 and 11:00, no duplicate of 09:00
+    assert series.t[-1] == later - HOUR
+
+
+def test_longer_window_backfills_once(chart):
+    asyncio.run(history.crypto_history("bitcoin", days=2))
+    _, series = asyncio.run(history.crypto_history("bitcoin", days=5))
+    asyncio.run(history.crypto_history("bitcoin", days=5))
+    assert chart.calls == [3, 6]
+    assert series.t[0] == NOW - NOW % DAY - 5 * DAY
+    assert len(set(series.t.tolist())) == len(series)
+
+
+def test_view_joining_a_narrower_sync_backfills_its_own_range(chart):
+    async def both():
+        return await asyncio.gather(history.crypto_history("bitcoin", days=2), history.crypto_history("bitcoin", days=5))
+
+    (_, short), (_, long) = asyncio.run(both())
+    assert chart.calls == [3, 6]
+    assert short.t[0] == NOW - NOW % DAY - 2 * DAY
+    assert long.t[0] == NOW - NOW % DAY - 5 * DAY
+
+
+def test_old_window_is_daily_and_keeps_hourly_view_intact(chart):
+    interval, _ = asyncio.run(history.crypto_history("bitcoin", start=NOW - 200 * DAY, end=NOW - 150 * DAY))
+    assert interval == "1d"
+    interval, series = asyncio.run(history.crypto_history("bitcoin", days=30))
+    assert interval == "1h"
+    assert chart.calls == [200, 31]
+    assert ((series.t[1:] - series.t[:-1]) == HOUR).all()  # hourly bars, none stored as daily
+
+
+def test_hourly_catch_up_is_capped_at_90_days(chart, monkeypatch):
+    asyncio.run(history.crypto_history("bitcoin", days=2))
+    key = history._crypto_series("bitcoin", "1h").key
+    from_t = history._get_meta(key)["fromT"]
+    monkeypatch.setattr(history, "_now_ms", lambda: NOW + 100 * DAY)
+
+    async def recent(coin_id, days=30, vs="usd"):
+        chart.calls.append(days)
+        return [{"t": NOW + 100 * DAY - HOUR, "y": 1.0}]
+
+    monkeypatch.setattr(history, "fetch_market_chart_async", recent)
+    interval, _ = asyncio.run(history.crypto_history("bitcoin", days=2))
+    assert interval == "1h"
+    assert chart.calls == [3, 90]  # not 100, which CoinGecko would answer with daily points
+    assert history._get_meta(key)["fromT"] == from_t
+
+
+def test_upstream_failure_serves_stored_bars(chart, monkeypatch):
+    asyncio.run(history.crypto_history("bitcoin", days=2))
+    monkeypatch.setattr(history, "_now_ms", lambda: NOW + 3 * HOUR)
+
+    async def down(*args, **kwargs):
+        raise httpx.ConnectTimeout("down")
+
+    monkeypatch.setattr(history, "fetch_market_chart_async", down)
+    _, series = asyncio.run(history.crypto_history("bitcoin", days=2))
+    assert series.t[-1] == NOW - HOUR
+    with pytest.raises(httpx.ConnectTimeout):
+        asyncio.run(history.crypto_history("ethereum", days=2))
+
+
+def test_stock_default_is_last_30_bars():
+    series = asyncio.run(history.stock_history("aapl"))
+    assert len(series) == 30
+    assert history.get_db().history_meta.find_one({"key": "alphavantage:AAPL:1d"})["fromT"] == 0
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.http_cache import Freshness, none_match, strong_etag
+from app.services.aggregator import _lifetime
+
+
+def test_cache_control_from_freshness():
+    assert Freshness().cache_control == "no-cache"
+    assert Freshness(30).cache_control == "public, max-age=30"
+    assert Freshness(0, 300).cache_control == "public, max-age=0, stale-while-revalidate=300"
+
+
+def test_if_none_match_parsing():
+    etag = strong_etag("a", b"\x00\x01", {"k": 1})
+    assert etag.startswith('"') and etag == strong_etag("a", b"\x00\x01", {"k": 1})
+    assert etag != strong_etag("a", b"\x00\x02", {"k": 1})
+    assert none_match(f'"other", {etag}', etag)
+    assert none_match(f"W/{etag}", etag)
+    assert none_match("*", etag)
+    assert not none_match(None, etag) and not none_match('"other"', etag)
+
+
+def test_entry_lifetime():
+    now = datetime.now(timezone.utc)
+    doc = {"storedAt": now, "staleAt": now + timedelta(seconds=60), "expiresAt": now + timedelta(seconds=360)}
+    assert _lifetime(doc, now, 60) == Freshness(60, 300)
+    assert _lifetime(doc, now + timedelta(seconds=160), 60) == Freshness(0, 200)
+    # a shorter window ends freshness earlier
+    assert _lifetime(doc, now, 30) == Freshness(30, 330)
+
+
+def test_aggregate_etag_and_304(client):
+    url = "/aggregate?symbols=bitcoin,AAPL&window=120"
+    client.get(url)  # miss: fetched live and cached
+    r1 = client.get(url)
+    etag = r1.headers["etag"]
+    max_age = int(r1.headers["cache-control"].split("max-age=")[1].split(",")[0])
+    assert 0 < max_age <= 120 and "stale-while-revalidate=300" in r1.headers["cache-control"]
+
+    r2 = client.get(url, headers={"If-None-Match": etag})
+    assert r2.status_code == 304 and r2.content == b""
+    assert r2.headers["etag"] == etag
+
+    # a different set of symbols is a different payload
+    r3 = client.get("/aggregate?symbols=bitcoin&window=120", headers={"If-None-Match": etag})
+    assert r3.status_code == 200 and r3.headers["etag"] != etag
+
+
+def test_history_etag_per_format(client):
+    params = {"id": "bitcoin", "days": 30}
+    r1 = client.get("/history/crypto", params=params)
+    assert "Accept" in r1.headers["vary"].split(", ") and "max-age=" in r1.headers["cache-control"]
+    r2 = client.get("/history/crypto", params=params, headers={"If-None-Match": r1.headers["etag"]})
+    assert r2.status_code == 304 and "Accept" in r2.headers["vary"].split(", ")
+
+    r3 = client.get("/history/crypto", params={**params, "format": "columnar"},
+                    headers={"If-None-Match": r1.headers["etag"]})
+    assert r3.status_code == 200
+
+
+def test_closed_history_window_is_long_lived(client):
+    end = client.get("/history/stock", params={"symbol": "AAPL"}).json()["series"][-3]["t"]
+    r = client.get("/history/stock", params={"symbol": "AAPL", "start": end - 10 * 86400000, "end": end})
+    assert r.headers["cache-control"] == "public, max-age=86400"
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+
+from app.adapters import http_client
+
+
+def test_async_client_is_shared_per_host():
+    """The same pooled client is reused for a host, and hosts get separate pools."""
+    http_client._async_clients.clear()
+    a = http_client.get_async_client("coingecko")
+    b = http_client.get_async_client("coingecko")
+    c = http_client.get_async_client("alphavantage")
+    assert a is b
+    assert a is not c
+    asyncio.run(http_client.aclose_clients())
+
+
+def test_aclose_clients_closes_and_forgets_pools():
+    """aclose_clients closes every client; the next call builds a fresh one."""
+    http_client._async_clients.clear()
+    http_client._sync_clients.clear()
+    a = http_client.get_async_client("coingecko")
+    s = http_client.get_sync_client("coingecko")
+
+    asyncio.run(http_client.aclose_clients())
+
+    assert a.is_closed and s.is_closed
+    assert http_client._async_clients == {} and http_client._sync_clients == {}
+    fresh = http_client.get_async_client("coingecko")
+    assert fresh is not a and not fresh.is_closed
+    asyncio.run(http_client.aclose_clients())
+
+
+def test_quote_async_uses_pooled_client(monkeypatch):
+    """fetch_quote_async goes through the shared Alpha Vantage client."""
+    from app.adapters import alphavantage as av
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["symbol"])
+        return httpx.Response(200, json={"Global Quote": {"05. price": "1.00"}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client._async_clients, "alphavantage", client)
+
+    # conftest replaces the module attribute with a fake; exercise the real parser path
+    quote = asyncio.run(av._get_async(av._quote_params("IBM"), av.PRIORITY_QUOTE))
+    assert av._parse_quote(quote) == {"05. price": "1.00"}
+    assert calls == ["IBM"]
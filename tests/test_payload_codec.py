@@ -0,0 +1,71 @@
+import pytest
+from bson.binary import Binary
+
+from app.core import payload_codec
+from app.core.payload_codec import PayloadCodec, PayloadCodecError, decode, parse_codec, parse_codecs
+from app.services import cache_service
+
+MATCHES = {"matches": [
+    {"symbol": f"AB{i}", "name": f"Company {i} Holdings Inc", "type": "Equity", "region": "United States"}
+    for i in range(20)
+]}
+
+
+def test_bson_codec_stores_payload_as_is():
+    value, enc = PayloadCodec("bson").encode(MATCHES)
+    assert value is MATCHES and enc is None
+    assert decode(value, enc) is MATCHES
+
+
+def test_json_zlib_compresses_only_above_threshold():
+    codec = parse_codec("json+zlib", min_bytes=1024)
+    small = {"symbol": "AAPL", "price": 1.5}
+
+    value, enc = codec.encode(small)
+    assert enc == "json" and isinstance(value, Binary)
+    assert decode(value, enc) == small
+
+    value, enc = codec.encode(MATCHES)
+    assert enc == "json+zlib"
+    assert len(value) < len(payload_codec._json_dumps(MATCHES)) / 3
+    assert decode(value, enc) == MATCHES
+
+
+def test_unencodable_payload_falls_back_to_bson():
+    from datetime import datetime, timezone
+
+    payload = {"at": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+    value, enc = parse_codec("json").encode(payload)
+    assert value is payload and enc is None
+
+
+def test_missing_optional_packages_fall_back(monkeypatch):
+    monkeypatch.delitem(payload_codec._SERIALIZERS, "msgpack", raising=False)
+    monkeypatch.delitem(payload_codec._COMPRESSORS, "zstd", raising=False)
+    assert parse_codec("msgpack+zstd") == PayloadCodec("json", "zlib", 1024)
+    with pytest.raises(PayloadCodecError):
+        decode(b"\x00", "msgpack")
+
+
+def test_parse_codecs_validates_spec():
+    codecs = parse_codecs("px=json, suggest=json+zlib", min_bytes=10)
+    assert codecs["*"] == PayloadCodec("bson", None, 10)
+    assert codecs["suggest"] == PayloadCodec("json", "zlib", 10)
+    for bad in ("px=xml", "px=json+lz4", "px=bson+zlib", "json"):
+        with pytest.raises(ValueError):
+            parse_codecs(bad)
+
+
+def test_cache_documents_round_trip_per_namespace(monkeypatch):
+    monkeypatch.setattr(cache_service, "_codecs", parse_codecs("suggest=json+zlib"))
+    doc = {"key": "suggest::stocks::ab", "payload": MATCHES, "expiresAt": None}
+
+    stored = cache_service._stored(doc)
+    assert stored["enc"] == "json+zlib" and isinstance(stored["payload"], Binary)
+    assert cache_service._loaded({"_id": 1, **stored}) == doc
+
+    plain = cache_service._stored({"key": "px::coingecko::bitcoin::usd", "payload": {"price": 1.0}})
+    assert plain["enc"] is None and plain["payload"] == {"price": 1.0}
+
+    # an entry written by a worker with a codec this one lacks reads as a miss
+    assert cache_service._loaded({**stored, "enc": "json+lz4"}) is None
@@ -0,0 +1,86 @@
+import asyncio
+from unittest.mock import patch
+
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, RateLimited
+from app.services.prefetcher import WatchlistPrefetcher
+
+
+def _assets(type_, symbols):
+    return [{"symbol": s, "type": type_, "active": True} for s in symbols]
+
+
+def test_crypto_ids_are_batched_and_cached():
+    """Watched coins are fetched a batch per call and written to the cache."""
+    calls = []
+
+    async def fake_price(ids, vs):
+        calls.append(list(ids))
+        return {i: {"usd": 1.0} for i in ids}
+
+    prefetcher = WatchlistPrefetcher(intervals={"crypto": 30}, crypto_batch=2)
+    with patch('app.services.prefetcher.list_active_assets', return_value=_assets("crypto", ["bitcoin", "Ethereum", "solana"])), \
+         patch('app.services.aggregator.fetch_simple_price_async', fake_price):
+        assert asyncio.run(prefetcher.run_once("crypto")) == 3
+        assert calls == [["bitcoin", "ethereum"], ["solana"]]
+
+        # entries outlive the next tick, so nothing is due yet
+        assert asyncio.run(prefetcher.run_once("crypto")) == 0
+        assert len(calls) == 2
+
+
+def test_watched_symbols_are_cache_hits():
+    """A user read after a prefetch is served from the cache."""
+    from app.services.aggregator import aggregate_with_cache
+
+    prefetcher = WatchlistPrefetcher(intervals={"stock": 300})
+    with patch('app.services.prefetcher.list_active_assets', return_value=_assets("stock", ["aapl"])):
+        asyncio.run(prefetcher.run_once("stock"))
+    with patch('app.services.aggregator.fetch_quote_async') as mock_stock:
+        result = asyncio.run(aggregate_with_cache("AAPL"))
+    assert result["meta"]["cache"] == "hit"
+    mock_stock.assert_not_called()
+
+
+def test_stocks_use_background_priority_and_stop_when_rate_limited():
+    """Quotes go out at background priority; once the budget is gone the tick ends."""
+    calls = []
+
+    async def fake_quote(symbol, priority):
+        calls.append((symbol, priority))
+        raise RateLimited("alphavantage", 12)
+
+    prefetcher = WatchlistPrefetcher(intervals={"stock": 300})
+    with patch('app.services.prefetcher.list_active_assets', return_value=_assets("stock", ["AAPL", "MSFT"])), \
+         patch('app.services.aggregator.fetch_quote_async', fake_quote):
+        assert asyncio.run(prefetcher.run_once("stock")) == 0
+    assert calls == [("AAPL", PRIORITY_BACKGROUND)]
+
+
+def test_prefetched_entry_is_fresh_only_within_the_callers_window():
+    """A prefetch writes a long soft TTL; a caller asking for 60s still sees the entry go stale after 60s."""
+    from datetime import datetime, timedelta, timezone
+
+    import app.services.aggregator as agg
+    from app.services.aggregator import aggregate_with_cache
+
+    stored = datetime.now(timezone.utc) - timedelta(seconds=100)
+    docs = {"px::alphavantage::AAPL::usd": {
+        "payload": {"symbol": "AAPL", "type": "stock", "price": 100.0, "source": "alphavantage", "asOf": "2025-11-24"},
+        "storedAt": stored,
+        "staleAt": stored + timedelta(seconds=WatchlistPrefetcher(intervals={"stock": 300})._ttl("stock")),
+        "expiresAt": stored + timedelta(seconds=900),
+    }}
+
+    async def run():
+        fresh = await aggregate_with_cache("AAPL", window=300)
+        stale = await aggregate_with_cache("AAPL", window=60)
+        await asyncio.gather(*agg._background)
+        return fresh, stale
+
+    with patch('app.services.aggregator.get_cache_many', return_value=docs), \
+         patch('app.services.aggregator.fetch_quote_async') as mock_stock:
+        mock_stock.return_value = {"05. price": "101.00", "07. latest trading day": "2025-11-25"}
+        fresh, stale = asyncio.run(run())
+    assert fresh["meta"]["cache"] == "hit"
+    assert stale["meta"]["cache"] == "stale"
+    mock_stock.assert_called_once_with("AAPL", priority=PRIORITY_BACKGROUND)
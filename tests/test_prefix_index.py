@@ -0,0 +1,67 @@
+import time
+
+from app.core.prefix_index import PrefixIndex
+
+COINS = [
+    {"id": "bitdao", "symbol": "bit", "name": "BitDAO"},
+    {"id": "bitcoin-cash", "symbol": "bch", "name": "Bitcoin Cash"},
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+    {"id": "ethena", "symbol": "ena", "name": "Ethena"},
+    {"id": "bridged-eth", "symbol": "eth", "name": "Bridged Ether"},
+    {"id": "bitfoo", "symbol": "bfo", "name": "Bitfoo"},
+]
+RANKS = {"bitcoin": 1, "ethereum": 2, "ethena": 30, "bitcoin-cash": 15, "bitdao": 90}
+
+
+def _index(**kw):
+    return PrefixIndex(
+        COINS,
+        terms=lambda c: (c["name"], c["symbol"]),
+        rank=lambda c: RANKS.get(c["id"]),
+        tiebreak=lambda c: (len(c["name"]), c["name"]),
+        **kw,
+    )
+
+
+def _ids(results):
+    return [c["id"] for c in results]
+
+
+def test_popular_coin_ranks_first():
+    """'bit' finds Bitcoin before coins that merely match or list earlier."""
+    assert _ids(_index().search("bit", 10)) == ["bitcoin", "bitcoin-cash", "bitdao", "bitfoo"]
+
+
+def test_exact_match_boosts_rank():
+    """An exact symbol match beats a slightly more popular prefix match."""
+    assert _ids(_index().search("eth", 10))[:2] == ["ethereum", "ethena"]
+    # among unranked coins an exact match still comes first
+    assert _ids(_index().search("eth", 10))[2] == "bridged-eth"
+
+
+def test_case_limit_and_no_match():
+    index = _index()
+    assert _ids(index.search("  BIT ", 2)) == ["bitcoin", "bitcoin-cash"]
+    assert index.search("zzz", 10) == []
+    assert index.search("", 10) == []
+
+
+def test_precomputed_short_prefixes_match_full_search():
+    """Results served from the build-time table equal a fresh ranking."""
+    precomputed = _index(precompute_len=2)
+    fresh = _index(precompute_len=0)
+    for prefix in ("b", "bi", "e", "et"):
+        assert precomputed.search(prefix, 5) == fresh.search(prefix, 5)
+
+
+def test_suggest_crypto_uses_index(monkeypatch):
+    """suggest_crypto ranks through the index built alongside the coin list."""
+    import app.services.coin_list_service as coins
+
+    monkeypatch.setattr(coins, "_state", {**coins._state})
+    coins._install(COINS, RANKS, time.time(), {})
+    assert coins.suggest_crypto("bit", limit=2) == [
+        {"id": "bitcoin", "symbol": "BTC", "name": "Bitcoin"},
+        {"id": "bitcoin-cash", "symbol": "BCH", "name": "Bitcoin Cash"},
+    ]
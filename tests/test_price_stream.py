@@ -0,0 +1,163 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.adapters.ratelimit import PRIORITY_BACKGROUND, PRIORITY_QUOTE, TokenBucketScheduler
+from app.api import routes_stream
+from app.services.price_stream import PriceHub, Subscription
+
+
+def _asset(symbol, price):
+    return {"symbol": symbol, "type": "crypto", "price": price, "source": "coingecko", "asOf": "2025-01-01T00:00:00"}
+
+
+def test_one_upstream_call_per_tick_for_all_subscribers():
+    calls = []
+
+    async def fake_price(ids, vs):
+        calls.append(list(ids))
+        return {i: {"usd": 100.0} for i in ids}
+
+    async def scenario():
+        hub = PriceHub(intervals={"crypto": 15})
+        a = hub.subscribe("bitcoin,ethereum")
+        b = hub.subscribe("bitcoin")
+        assert await hub.poll_once("crypto") == 2
+        assert sorted(u["symbol"] for u in await a.next(0)) == ["bitcoin", "ethereum"]
+        assert [u["price"] for u in await b.next(0)] == [100.0]
+
+        # unchanged prices aren't sent again (and come from the cache)
+        assert await hub.poll_once("crypto") == 0
+        assert await b.next(0) == []
+
+        # a late subscriber gets the last known price at once
+        c = hub.subscribe("ethereum")
+        assert [u["symbol"] for u in await c.next(0)] == ["ethereum"]
+
+    with patch("app.services.aggregator.fetch_simple_price_async", fake_price):
+        asyncio.run(scenario())
+    assert calls == [["bitcoin", "ethereum"]]
+
+
+def test_changes_are_fanned_out_and_conflated():
+    async def scenario():
+        hub = PriceHub(intervals={"crypto": 15})
+        sub = hub.subscribe("bitcoin")
+        assert hub.publish([_asset("bitcoin", 1.0), _asset("solana", 5.0)]) == 1  # nobody watches solana
+        assert hub.publish([_asset("bitcoin", 1.0)]) == 0
+        hub.publish([_asset("bitcoin", 2.0)])
+        hub.publish([_asset("bitcoin", 3.0)])
+        # a slow reader gets the latest price, not every tick
+        assert [u["price"] for u in await sub.next(0)] == [3.0]
+
+        hub.unsubscribe(sub)
+        assert hub.symbols("crypto") == []
+
+    asyncio.run(scenario())
+
+
+def test_subscription_limits():
+    hub = PriceHub(intervals={"crypto": 15})
+    with pytest.raises(ValueError):
+        hub.subscribe(" , ")
+    with patch("app.services.price_stream.STREAM_MAX_SYMBOLS", 2):
+        with pytest.raises(ValueError):
+            hub.subscribe("a,b,c")
+
+
+def test_stock_symbols_are_capped_and_checked_per_subscription(monkeypatch):
+    from app.services import stock_list_service
+
+    hub = PriceHub(intervals={"stock": 60})
+    monkeypatch.setattr("app.services.price_stream.STREAM_MAX_STOCK_SYMBOLS", 2)
+    monkeypatch.setattr(stock_list_service, "is_listed", lambda s: s != "ZZZZ")
+    hub.subscribe("AAPL,MSFT,bitcoin")
+    with pytest.raises(ValueError):
+        hub.subscribe("TSLA,NVDA,AMD")  # too many for one stream
+    with pytest.raises(ValueError):
+        hub.subscribe("ZZZZ")  # not in the listing
+    with pytest.raises(ValueError):
+        hub.subscribe("NOT A TICKER!")
+    # other streams are unaffected by what one client asked for
+    hub.subscribe("TSLA,NVDA")
+    assert sorted(hub.symbols("stock")) == ["AAPL", "MSFT", "NVDA", "TSLA"]
+
+
+def test_ticker_rejected_upstream_is_dropped():
+    from app.adapters.alphavantage import UnknownSymbol
+
+    async def fake_quote(symbol, priority):
+        if symbol == "FAKE":
+            raise UnknownSymbol("Invalid API call.")
+        return {"05. price": "10.00", "07. latest trading day": "2025-09-30"}
+
+    async def scenario():
+        hub = PriceHub(intervals={"stock": 60})
+        sub = hub.subscribe("FAKE,AAPL")
+        assert await hub.poll_once("stock") == 1
+        assert [u["symbol"] for u in await sub.next(0)] == ["AAPL"]
+        assert hub.symbols("stock") == ["AAPL"]
+        with pytest.raises(ValueError):
+            hub.subscribe("FAKE")
+        hub.unsubscribe(sub)
+        assert hub.symbols("stock") == []
+
+    with patch("app.services.aggregator.fetch_quote_async", fake_quote):
+        asyncio.run(scenario())
+
+
+def test_stock_poll_leaves_the_quote_reserve():
+    """Stock polls run at background priority, so they can't take the tokens kept for quotes."""
+    bucket = TokenBucketScheduler(
+        "alphavantage", rate=1 / 60, burst=3,
+        max_wait={PRIORITY_QUOTE: 5, PRIORITY_BACKGROUND: 0}, reserve={PRIORITY_BACKGROUND: 2},
+    )
+    calls = []
+
+    async def fake_quote(symbol, priority):
+        await bucket.acquire(priority)
+        calls.append((symbol, priority))
+        return {"05. price": "10.00", "07. latest trading day": "2025-09-30"}
+
+    async def scenario():
+        hub = PriceHub(intervals={"stock": 60})
+        sub = hub.subscribe("AAPL,MSFT,TSLA")
+        assert await hub.poll_once("stock") == 1
+        assert [u["symbol"] for u in await sub.next(0)] == ["AAPL"]
+        # the two reserved tokens are still there for real quotes
+        await bucket.acquire(PRIORITY_QUOTE, max_wait=0)
+        await bucket.acquire(PRIORITY_QUOTE, max_wait=0)
+
+    with patch("app.services.aggregator.fetch_quote_async", fake_quote):
+        asyncio.run(scenario())
+    assert calls == [("AAPL", PRIORITY_BACKGROUND)]
+
+
+def test_event_stream_format(monkeypatch):
+    hub = PriceHub(intervals={"crypto": 15})
+    monkeypatch.setattr(routes_stream, "hub", hub)
+    monkeypatch.setattr(routes_stream, "STREAM_HEARTBEAT_SECONDS", 0)
+
+    class Request:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 2
+
+    async def scenario():
+        sub = hub.subscribe("bitcoin")
+        hub.publish([_asset("bitcoin", 42.5)])
+        return [chunk async for chunk in routes_stream._events(Request(), sub)]
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0] == b"retry: 3000\n\n"
+    assert chunks[1].startswith(b"event: price\ndata: {") and b'"price":42.5' in chunks[1]
+    assert chunks[2] == b": keep-alive\n\n"
+    assert hub.symbols("crypto") == []  # unsubscribed when the client went away
+
+
+def test_stream_rejects_bad_symbols(client):
+    assert client.get("/stream/prices", params={"symbols": ","}).status_code == 400
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.adapters.ratelimit import (
+    PRIORITY_HISTORY,
+    PRIORITY_QUOTE,
+    PRIORITY_SEARCH,
+    RateLimited,
+    TokenBucketScheduler,
+)
+
+
+def _bucket(rate=10.0, burst=2, max_wait=None, reserve=None):
+    return TokenBucketScheduler(
+        "test",
+        rate=rate,
+        burst=burst,
+        max_wait=max_wait or {PRIORITY_QUOTE: 5, PRIORITY_HISTORY: 5, PRIORITY_SEARCH: 5},
+        reserve=reserve,
+    )
+
+
+def test_burst_is_served_immediately():
+    """Calls within the burst don't wait."""
+    bucket = _bucket(rate=0.001, burst=3)
+
+    async def run():
+        for _ in range(3):
+            await bucket.acquire(PRIORITY_QUOTE)
+
+    asyncio.run(run())
+    assert bucket.tokens() < 1
+
+
+def test_fails_fast_with_retry_after():
+    """When the wait would exceed the class's max wait, raise instead of queueing."""
+    bucket = _bucket(rate=1 / 60, burst=1, max_wait={PRIORITY_SEARCH: 1})
+
+    async def run():
+        await bucket.acquire(PRIORITY_SEARCH)
+        await bucket.acquire(PRIORITY_SEARCH)
+
+    with pytest.raises(RateLimited) as exc:
+        asyncio.run(run())
+    assert 50 <= exc.value.retry_after <= 60
+
+
+def test_queued_calls_are_served_by_priority():
+    """With the bucket empty, queued quotes go before history, history before search."""
+    bucket = _bucket(rate=50.0, burst=1)
+    order = []
+
+    async def call(priority, name):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    async def run():
+        await bucket.acquire(PRIORITY_QUOTE)  # empty the bucket
+        tasks = [
+            asyncio.ensure_future(call(PRIORITY_SEARCH, "search")),
+            asyncio.ensure_future(call(PRIORITY_HISTORY, "history")),
+            asyncio.ensure_future(call(PRIORITY_QUOTE, "quote")),
+        ]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["quote", "history", "search"]
+
+
+def test_reserve_keeps_tokens_for_quotes():
+    """Typeahead can't take the last reserved tokens; quotes still can."""
+    bucket = _bucket(rate=0.001, burst=3, max_wait={PRIORITY_QUOTE: 0, PRIORITY_SEARCH: 0},
+                     reserve={PRIORITY_SEARCH: 2})
+
+    async def run():
+        await bucket.acquire(PRIORITY_SEARCH)  # 3 -> 2
+        with pytest.raises(RateLimited):
+            await bucket.acquire(PRIORITY_SEARCH)
+        await bucket.acquire(PRIORITY_QUOTE)  # 2 -> 1
+        await bucket.acquire(PRIORITY_QUOTE)  # 1 -> 0
+
+    asyncio.run(run())
+
+
+def test_drain_and_try_acquire():
+    """drain() empties the bucket; the sync path fails fast on an empty bucket."""
+    bucket = _bucket(rate=0.001, burst=2)
+    bucket.try_acquire(PRIORITY_QUOTE)
+    bucket.drain()
+    with pytest.raises(RateLimited):
+        bucket.try_acquire(PRIORITY_QUOTE)
+
+
+def test_route_returns_429_with_retry_after(client, monkeypatch):
+    """A RateLimited from the adapter layer becomes 429 + Retry-After."""
+    import app.api.routes_stocks as routes_stocks
+
+    async def limited(symbol):
+        raise RateLimited("alphavantage", 12.2)
+
+    monkeypatch.setattr(routes_stocks, "fetch_global_quote", limited)
+    r = client.get("/stocks/quote", params={"symbol": "AAPL"})
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "13"
@@ -1,14 +1,34 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core import request_logging, request_metrics
+from app.core.request_logging import RequestLogWriter, log_writer
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    log_writer._queue.clear()
+
+
+def _dropped(reason):
+    return REGISTRY.get_sample_value("request_logs_dropped_total", {"reason": reason}) or 0.0
+
+
 def test_request_logging_middleware(client):
     """Test that requests are logged to the database."""
     # Make a request to any endpoint
     r = client.get("/health")
     assert r.status_code == 200
-    
-    # The middleware should log the request to MongoDB
-    # We can verify by checking the database
-    from app.db.mongo import get_db
-    db = get_db()
-    
+
+    # The record is queued, not written inline; the background task would flush it
+    assert len(log_writer) == 1
+    asyncio.run(log_writer.flush())
+
+    from app.db import mongo
+    db = mongo.get_db()
+
     # Find the most recent log entry
     logs = list(db.req_logs.find().sort("createdAt", -1).limit(1))
     assert len(logs) > 0
@@ -23,22 +43,124 @@ def test_request_logging_middleware(client):
 
 def test_request_logging_handles_db_failure(client, monkeypatch):
     """Test that the app doesn't crash if logging fails."""
-    from app.db import mongo
-    
     def mock_get_db_error():
         class MockCollection:
-            def insert_one(self, doc):
+            async def insert_many(self, docs, ordered=True):
+                raise Exception("Database connection failed")
+
+            async def bulk_write(self, requests, ordered=True):
                 raise Exception("Database connection failed")
         
         class MockDB:
             req_logs = MockCollection()
+            req_rollups = MockCollection()
         
         return MockDB()
     
-    # Mock get_db to raise an error
-    monkeypatch.setattr(mongo, "get_db", mock_get_db_error)
+    # Mock get_async_db to raise an error
+    monkeypatch.setattr(request_logging, "get_async_db", mock_get_db_error)
+    monkeypatch.setattr(request_metrics, "get_async_db", mock_get_db_error)
     
     # The request should still succeed even if logging fails
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json() == {"status": "ok"}
+
+    before = _dropped("error")
+    asyncio.run(log_writer.flush())
+    assert _dropped("error") == before + 1
+
+
+def _docs(n):
+    return [{"path": f"/{i}"} for i in range(n)]
+
+
+def _recorder(batches):
+    async def write(batch):
+        batches.append(batch)
+    return write
+
+
+def test_batches_are_written_with_insert_many(monkeypatch):
+    batches = []
+    monkeypatch.setattr(RequestLogWriter, "_write", staticmethod(_recorder(batches)))
+    writer = RequestLogWriter(batch_size=2, max_queue=10)
+
+    async def run():
+        for doc in _docs(5):
+            await writer.submit(doc)
+        await writer.flush()
+
+    asyncio.run(run())
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_size_trigger_wakes_background_task(monkeypatch):
+    batches = []
+    monkeypatch.setattr(RequestLogWriter, "_write", staticmethod(_recorder(batches)))
+    writer = RequestLogWriter(batch_size=3, flush_seconds=60, max_queue=10)
+
+    async def run():
+        writer.start()
+        for doc in _docs(3):
+            await writer.submit(doc)
+        for _ in range(50):
+            if batches:
+                break
+            await asyncio.sleep(0.01)
+        await writer.submit({"path": "/late"})
+        await writer.stop()  # flushes the remainder
+
+    asyncio.run(run())
+    assert [len(b) for b in batches] == [3, 1]
+
+
+def test_stop_waits_for_the_batch_being_written(monkeypatch):
+    started, batches = [], []
+
+    async def slow_write(batch):
+        started.append(batch)
+        await asyncio.sleep(0.05)
+        batches.append(batch)
+
+    monkeypatch.setattr(RequestLogWriter, "_write", staticmethod(slow_write))
+    writer = RequestLogWriter(batch_size=2, flush_seconds=60, max_queue=10)
+
+    async def run():
+        writer.start()
+        for doc in _docs(3):
+            await writer.submit(doc)
+        while not started:  # the first batch is out of the queue, mid-insert
+            await asyncio.sleep(0.001)
+        await writer.stop()
+
+    asyncio.run(run())
+    assert sorted(d["path"] for b in batches for d in b) == ["/0", "/1", "/2"]
+
+
+@pytest.mark.parametrize("policy,kept", [("drop_newest", ["/0", "/1"]), ("drop_oldest", ["/2", "/3"])])
+def test_overflow_drop_policies(policy, kept):
+    writer = RequestLogWriter(max_queue=2, overflow=policy)
+    before = _dropped("overflow")
+
+    async def run():
+        for doc in _docs(4):
+            await writer.submit(doc)
+
+    asyncio.run(run())
+    assert [d["path"] for d in writer._queue] == kept
+    assert _dropped("overflow") == before + 2
+
+
+def test_overflow_block_writes_before_queueing(monkeypatch):
+    batches = []
+    monkeypatch.setattr(RequestLogWriter, "_write", staticmethod(_recorder(batches)))
+    writer = RequestLogWriter(batch_size=2, max_queue=2, overflow="block")
+
+    async def run():
+        for doc in _docs(3):
+            await writer.submit(doc)
+
+    asyncio.run(run())
+    assert [[d["path"] for d in b] for b in batches] == [["/0", "/1"]]
+    assert [d["path"] for d in writer._queue] == ["/2"]
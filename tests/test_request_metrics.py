@@ -0,0 +1,120 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.core import latency_sketch, request_metrics
+from app.db import mongo
+from app.core.request_logging import log_writer
+
+T0 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _log(ms, at=T0, route="/history/stock", status=200, method="GET"):
+    return {"method": method, "path": route, "route": route, "status": status, "durationMs": ms, "createdAt": at}
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(1)
+    values = sorted(rng.lognormvariate(4, 1) for _ in range(5000))
+    sketch = {}
+    for v in values:
+        b = latency_sketch.bucket(v)
+        sketch[b] = sketch.get(b, 0) + 1
+    est = latency_sketch.quantiles(sketch, [0.5, 0.95, 0.99])
+    for q, value in est.items():
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(value - exact) / exact <= latency_sketch.SKETCH_RELATIVE_ACCURACY + 1e-9
+
+
+def test_sub_millisecond_durations_share_zero_bucket():
+    assert latency_sketch.bucket(0) == latency_sketch.ZERO_BUCKET
+    assert latency_sketch.quantiles({"z": 3}, [0.5]) == {0.5: 0.0}
+    assert latency_sketch.quantiles({}, [0.5]) == {}
+
+
+def test_rollups_merge_across_batches_and_minutes():
+    asyncio.run(request_metrics.save_rollups([_log(10), _log(20), _log(500, status=502)]))
+    asyncio.run(request_metrics.save_rollups([_log(30), _log(40, at=T0 + timedelta(minutes=1))]))
+    db = mongo.get_db()
+    assert db.req_rollups.count_documents({}) == 3  # 12:00/200, 12:00/502, 12:01/200
+    doc = db.req_rollups.find_one({"minute": T0, "status": 200})
+    assert doc["count"] == 3 and doc["sumMs"] == 60 and doc["maxMs"] == 30
+
+    summary = asyncio.run(request_metrics.latency_summary(T0, T0 + timedelta(minutes=5)))
+    assert summary["count"] == 5
+    assert summary["maxMs"] == 500
+    assert summary["meanMs"] == 120.0
+    assert abs(summary["p50Ms"] - 30) <= 30 * latency_sketch.SKETCH_RELATIVE_ACCURACY
+    assert summary["routes"][0]["route"] == "/history/stock"
+
+    only_ok = asyncio.run(request_metrics.latency_summary(T0, T0 + timedelta(minutes=1), status=200))
+    assert only_ok["count"] == 3
+
+
+def test_latency_endpoint_reads_rollups_of_flushed_logs(client):
+    log_writer._queue.clear()
+    for _ in range(3):
+        client.get("/health")
+    asyncio.run(log_writer.flush())
+    data = client.get("/logs/latency", params={"minutes": 5, "route": "/health"}).json()
+    assert data["count"] == 3
+    assert data["p99Ms"] is not None
+    assert data["routes"] == [{**data["routes"][0], "method": "GET", "route": "/health", "count": 3}]
+
+
+def test_rollups_count_batches_whose_raw_insert_failed(monkeypatch):
+    """Documented: rollups count served requests; the raw-log gap shows as dropped "error"."""
+    from prometheus_client import REGISTRY
+    from app.core import request_logging
+
+    class FailingLogs:
+        async def insert_many(self, docs, ordered=True):
+            raise Exception("insert failed")
+
+    monkeypatch.setattr(request_logging, "get_async_db", lambda: type("DB", (), {"req_logs": FailingLogs()})())
+    before = REGISTRY.get_sample_value("request_logs_dropped_total", {"reason": "error"}) or 0.0
+
+    asyncio.run(request_logging.RequestLogWriter._write([_log(10), _log(20)]))
+    assert mongo.get_db().req_rollups.find_one({"minute": T0})["count"] == 2
+    assert mongo.get_db().req_logs.count_documents({}) == 0
+    assert REGISTRY.get_sample_value("request_logs_dropped_total", {"reason": "error"}) == before + 2
+
+
+def test_rollups_use_unrounded_durations_and_raw_logs_keep_int_ms():
+    logs = [{**_log(0), "elapsedMs": 0.4}, {**_log(1), "elapsedMs": 1.6}]
+    asyncio.run(log_writer._write(logs))
+    doc = mongo.get_db().req_rollups.find_one({"minute": T0})
+    assert doc["sumMs"] == 2.0 and doc["maxMs"] == 1.6
+    assert doc["h"] == {latency_sketch.ZERO_BUCKET: 1, latency_sketch.bucket(1.6): 1}
+    raw = mongo.get_db().req_logs.find_one({"durationMs": 1}, {"_id": 0})
+    assert "elapsedMs" not in raw
+
+
+def test_read_plan_uses_the_coarsest_rollup_that_tiles_each_part():
+    start = datetime(2025, 1, 1, 22, 58, 30, tzinfo=timezone.utc)
+    end = datetime(2025, 1, 4, 1, 2, tzinfo=timezone.utc)
+    day, hour = timedelta(days=1), timedelta(hours=1)
+    h23 = datetime(2025, 1, 1, 23, tzinfo=timezone.utc)
+    d1, d3 = datetime(2025, 1, 2, tzinfo=timezone.utc), datetime(2025, 1, 4, tzinfo=timezone.utc)
+    assert request_metrics.read_plan(start, end) == [
+        ("minute", "req_rollups", start.replace(second=0), h23),
+        ("hour", "req_rollups_hourly", h23, d1),
+        ("day", "req_rollups_daily", d1, d3),
+        ("hour", "req_rollups_hourly", d3, d3 + hour),
+        ("minute", "req_rollups", d3 + hour, end),
+    ]
+    assert request_metrics.read_plan(T0, T0 + timedelta(minutes=5)) == [("minute", "req_rollups", T0, T0 + timedelta(minutes=5))]
+    assert [p[0] for p in request_metrics.read_plan(T0, T0 + 30 * day)] == ["hour", "day", "hour"]
+
+
+def test_long_windows_read_daily_rollups():
+    logs = [_log(10, at=T0 + timedelta(days=d, minutes=m)) for d in range(3) for m in (0, 90)]
+    asyncio.run(request_metrics.save_rollups(logs))
+    db = mongo.get_db()
+    assert db.req_rollups_daily.count_documents({}) == 3
+    assert db.req_rollups_hourly.count_documents({}) == 6
+    summary = asyncio.run(request_metrics.latency_summary(T0 - timedelta(days=1), T0 + timedelta(days=3)))
+    assert summary["count"] == 6 and summary["meanMs"] == 10.0
+    # a window cut mid-hour still counts exactly, from the per-minute rollups at its ends
+    partial = asyncio.run(request_metrics.latency_summary(T0 + timedelta(minutes=30), T0 + timedelta(days=2, minutes=30)))
+    assert partial["count"] == 4
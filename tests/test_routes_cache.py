@@ -99,3 +99,27 @@ def test_cache_clear_empty_keys_list(client):
     response = client.post("/cache/clear", json={"keys": []})
     assert response.status_code == 400
     assert "Provide" in response.json()["detail"]
+
+
+def test_cache_status_reports_l1_and_l2(client):
+    """/cache/status exposes L1 size and the L1/L2 hit ratios."""
+    response = client.get("/cache/status")
+    data = response.json()
+    assert set(data["l1"]) >= {"size", "maxEntries", "hits", "misses", "hitRatio"}
+    assert set(data["l2"]) >= {"hits", "misses", "hitRatio"}
+
+
+def test_cache_clear_invalidates_l1(client):
+    """POST /cache/clear also drops the in-process L1 copies."""
+    from datetime import datetime, timezone, timedelta
+    from app.services import cache_service
+
+    for key in ("key1", "key2"):
+        cache_service._l1.put({"key": key, "payload": {}, "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=60)})
+
+    client.post("/cache/clear", json={"keys": ["key1"]})
+    assert cache_service._l1.get("key1") is None
+    assert cache_service._l1.get("key2") is not None
+
+    client.post("/cache/clear", json={"all": True})
+    assert len(cache_service._l1) == 0
@@ -25,36 +25,47 @@ def test_suggest_crypto_empty_query(client):
     assert r.status_code == 422  # FastAPI validation error
 
 
+def test_suggest_limit_is_bounded(client):
+    """An unbounded limit would let clients fill the typeahead cache."""
+    assert client.get("/suggest/crypto", params={"q": "bit", "limit": 100000}).status_code == 422
+    assert client.get("/suggest/stocks", params={"q": "app", "limit": 0}).status_code == 422
+
+
+def _mock_alphavantage(monkeypatch, handler):
+    """Route the shared Alpha Vantage client through an in-memory transport."""
+    import httpx
+    from app.adapters import http_client
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client._async_clients, "alphavantage", client)
+
+
 def test_suggest_stocks_success(client, monkeypatch):
     """Test GET /suggest/stocks returns stock suggestions."""
-    import requests
-    from unittest.mock import Mock
-    
-    # Mock the requests.get call
-    mock_response = Mock()
-    mock_response.json.return_value = {
-        "bestMatches": [
-            {
-                "1. symbol": "AAPL",
-                "2. name": "Apple Inc.",
-                "3. type": "Equity",
-                "4. region": "United States"
-            },
-            {
-                "1. symbol": "AAPA",
-                "2. name": "Another Apple",
-                "3. type": "Equity",
-                "4. region": "United States"
-            }
-        ]
-    }
-    mock_response.raise_for_status = Mock()
-    
-    def mock_get(url, params=None, timeout=None):
-        return mock_response
-    
-    monkeypatch.setattr(requests, "get", mock_get)
-    
+    import httpx
+
+    def handler(request):
+        assert request.url.params["function"] == "SYMBOL_SEARCH"
+        assert request.url.params["keywords"] == "aap"
+        return httpx.Response(200, json={
+            "bestMatches": [
+                {
+                    "1. symbol": "AAPL",
+                    "2. name": "Apple Inc.",
+                    "3. type": "Equity",
+                    "4. region": "United States"
+                },
+                {
+                    "1. symbol": "AAPA",
+                    "2. name": "Another Apple",
+                    "3. type": "Equity",
+                    "4. region": "United States"
+                }
+            ]
+        })
+
+    _mock_alphavantage(monkeypatch, handler)
+
     r = client.get("/suggest/stocks", params={"q": "aap"})
     assert r.status_code == 200
     data = r.json()
@@ -62,25 +73,22 @@ def test_suggest_stocks_success(client, monkeypatch):
     assert len(data) == 2
     assert data[0]["symbol"] == "AAPL"
     assert data[0]["name"] == "Apple Inc."
+    assert data[0]["type"] == "Equity"
 
 
 def test_suggest_stocks_with_limit(client, monkeypatch):
     """Test GET /suggest/stocks respects limit parameter."""
-    import requests
-    from unittest.mock import Mock
-    
-    mock_response = Mock()
-    mock_response.json.return_value = {
+    import httpx
+
+    payload = {
         "bestMatches": [
             {"1. symbol": "AAPL", "2. name": "Apple Inc.", "3. type": "Equity", "4. region": "US"},
             {"1. symbol": "AAPA", "2. name": "Another", "3. type": "Equity", "4. region": "US"},
             {"1. symbol": "AAP", "2. name": "Third", "3. type": "Equity", "4. region": "US"}
         ]
     }
-    mock_response.raise_for_status = Mock()
-    
-    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: mock_response)
-    
+    _mock_alphavantage(monkeypatch, lambda request: httpx.Response(200, json=payload))
+
     r = client.get("/suggest/stocks", params={"q": "aa", "limit": 2})
     assert r.status_code == 200
     data = r.json()
@@ -89,18 +97,27 @@ def test_suggest_stocks_with_limit(client, monkeypatch):
 
 def test_suggest_stocks_api_error(client, monkeypatch):
     """Test GET /suggest/stocks handles API errors."""
-    import requests
-    
-    def mock_get_error(*args, **kwargs):
+    def handler(request):
         raise Exception("Network error")
-    
-    monkeypatch.setattr(requests, "get", mock_get_error)
-    
+
+    _mock_alphavantage(monkeypatch, handler)
+
     r = client.get("/suggest/stocks", params={"q": "aap"})
     assert r.status_code == 502
     assert "Network error" in r.json()["detail"]
 
 
+def test_suggest_stocks_rate_limited(client, monkeypatch):
+    """Test GET /suggest/stocks surfaces the Alpha Vantage rate-limit note as a 400."""
+    import httpx
+
+    _mock_alphavantage(monkeypatch, lambda request: httpx.Response(200, json={"Note": "slow down"}))
+
+    r = client.get("/suggest/stocks", params={"q": "aap"})
+    assert r.status_code == 400
+    assert "rate limit" in r.json()["detail"]
+
+
 def test_suggest_stocks_empty_query(client):
     """Test GET /suggest/stocks with missing query parameter."""
     r = client.get("/suggest/stocks")
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight, SINGLEFLIGHT_CALLS
+
+
+def _count(flight, role):
+    return SINGLEFLIGHT_CALLS.labels(flight, role)._value.get()
+
+
+def test_do_coalesces_concurrent_callers():
+    """Concurrent callers for one key share a single call and its result."""
+    flight = SingleFlight("test-do")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"price": 1.0}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("AAPL", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"price": 1.0} for r in results)
+    assert _count("test-do", "leader") == 1
+    assert _count("test-do", "coalesced") == 4
+    assert flight.in_flight() == 0
+
+
+def test_do_shares_errors_and_forgets_key():
+    """An upstream error reaches every waiter; the next call starts a new flight."""
+    flight = SingleFlight("test-err")
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rate limit hit")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.do("k", failing))
+    assert len(calls) == 2
+
+
+def test_do_many_joins_overlapping_batches():
+    """Keys already in flight are joined; only the remainder is fetched."""
+    flight = SingleFlight("test-many")
+    batches = []
+
+    async def fetch(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(0.02)
+        return {k: k.upper() for k in keys}
+
+    async def run():
+        first = asyncio.ensure_future(flight.do_many(["bitcoin", "ethereum"], fetch))
+        await asyncio.sleep(0)  # let the first batch register
+        second = await flight.do_many(["bitcoin", "solana"], fetch)
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert batches == [["bitcoin", "ethereum"], ["solana"]]
+    assert first == {"bitcoin": "BITCOIN", "ethereum": "ETHEREUM"}
+    assert second == {"bitcoin": "BITCOIN", "solana": "SOLANA"}
+    assert _count("test-many", "coalesced") == 1
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import app.services.stock_list_service as stocks
+from app.adapters.alphavantage import AlphaVantageError, _parse_listings
+
+LISTING_CSV = (
+    "symbol,name,exchange,assetType,ipoDate,delistingDate,status\r\n"
+    "A,Agilent Technologies Inc,NYSE,Stock,1999-11-18,null,Active\r\n"
+    "AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active\r\n"
+    "APP,Applovin Corp - Class A,NASDAQ,Stock,2021-04-15,null,Active\r\n"
+    "APLE,Apple Hospitality REIT Inc,NYSE,Stock,2015-05-18,null,Active\r\n"
+    "OLD,Old Corp,NYSE,Stock,2000-01-01,2020-01-01,Delisted\r\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_process(monkeypatch):
+    monkeypatch.setattr(stocks, "_state", {"items": [], "fetchedAt": 0.0, "index": None})
+
+
+def test_parse_listings_keeps_active_rows():
+    items = _parse_listings(LISTING_CSV)
+    assert [it["symbol"] for it in items] == ["A", "AAPL", "APP", "APLE"]
+    assert items[1] == {"symbol": "AAPL", "name": "Apple Inc", "exchange": "NASDAQ", "type": "Stock"}
+    with pytest.raises(AlphaVantageError):
+        _parse_listings('{"Information": "invalid API call"}')
+
+
+def test_suggestions_come_from_local_index():
+    """Known prefixes never touch SYMBOL_SEARCH; exact tickers rank first."""
+    stocks._install(_parse_listings(LISTING_CSV), time.time())
+    with patch.object(stocks, "symbol_search_async", AsyncMock(side_effect=AssertionError("upstream"))):
+        app_matches = asyncio.run(stocks.suggest_stocks("app", 10))
+        a_matches = asyncio.run(stocks.suggest_stocks("A", 2))
+    assert [m["symbol"] for m in app_matches] == ["APP", "AAPL", "APLE"]
+    assert app_matches[1] == {
+        "symbol": "AAPL", "name": "Apple Inc", "type": "Stock", "region": "United States", "currency": "USD",
+    }
+    assert [m["symbol"] for m in a_matches] == ["A", "APP"]
+
+
+def test_unknown_prefix_falls_back_to_cached_upstream_search():
+    """Prefixes missing from the listing go upstream once, then come from the cache."""
+    stocks._install(_parse_listings(LISTING_CSV), time.time())
+    upstream = AsyncMock(return_value=[{"symbol": "TSCO.LON", "name": "Tesco PLC"}])
+    with patch.object(stocks, "symbol_search_async", upstream):
+        first = asyncio.run(stocks.suggest_stocks("tesco", 5))
+        second = asyncio.run(stocks.suggest_stocks("Tesco", 5))
+    assert first == second == [{"symbol": "TSCO.LON", "name": "Tesco PLC"}]
+    upstream.assert_awaited_once_with("tesco")
+
+
+def test_refresh_snapshots_listing_for_other_workers():
+    with patch.object(stocks, "fetch_listing_status", return_value=_parse_listings(LISTING_CSV)) as fetch:
+        stocks.refresh()
+        stocks.refresh()  # fresh now; no second download
+    fetch.assert_called_once()
+    assert not stocks.is_stale()
+
+    stocks._state = {"items": [], "fetchedAt": 0.0, "index": None}
+    assert stocks.load_snapshot() is True
+    assert len(stocks._state["items"]) == 4
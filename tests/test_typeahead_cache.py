@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+from app.core.prefix_index import PrefixIndex
+from app.core.typeahead_cache import TypeaheadCache
+
+TICKERS = [
+    {"symbol": "AAPL", "name": "Apple Inc"},
+    {"symbol": "APP", "name": "Applovin Corp"},
+    {"symbol": "APLE", "name": "Apple Hospitality REIT"},
+    {"symbol": "AMZN", "name": "Amazon.com Inc"},
+]
+
+
+def _index():
+    return PrefixIndex(
+        TICKERS,
+        terms=lambda t: (t["symbol"], t["name"]),
+        tiebreak=lambda t: (len(t["symbol"]), t["symbol"]),
+        precompute_len=0,
+    )
+
+
+def _lookup(cache, index, prefix, limit, compute=None, version=1):
+    return cache.get_or_compute("stocks", prefix, limit, compute or index.search_ids, index.narrow, version=version)
+
+
+def test_longer_prefix_is_narrowed_from_complete_result():
+    """'appl' after 'ap' filters the cached set instead of searching again."""
+    index, cache = _index(), TypeaheadCache(max_entries=16)
+    compute = MagicMock(side_effect=index.search_ids)
+
+    _lookup(cache, index, "ap", 10, compute)
+    narrowed = _lookup(cache, index, "appl", 10, compute)
+    app = _lookup(cache, index, " APP ", 2, compute)
+
+    assert compute.call_count == 1
+    assert narrowed == index.search_ids("appl", 10)[0]
+    # re-ranked for the longer prefix: APP is now an exact match
+    assert app == index.search_ids("app", 2)[0]
+    assert index.items[app[0]]["symbol"] == "APP"
+
+
+def test_truncated_result_is_not_reused_for_narrowing():
+    """A top-N that may have missed matches only answers its own key."""
+    index, cache = _index(), TypeaheadCache(max_entries=16)
+    compute = MagicMock(side_effect=index.search_ids)
+
+    _lookup(cache, index, "a", 2, compute)  # 4 matches, only 2 kept
+    _lookup(cache, index, "a", 2, compute)
+    _lookup(cache, index, "am", 2, compute)
+    assert compute.call_count == 2
+
+
+def test_lru_eviction_and_versions():
+    index, cache = _index(), TypeaheadCache(max_entries=2)
+    compute = MagicMock(side_effect=index.search_ids)
+
+    _lookup(cache, index, "aapl", 5, compute)
+    _lookup(cache, index, "amzn", 5, compute)
+    _lookup(cache, index, "aapl", 5, compute)  # hit, now most recent
+    _lookup(cache, index, "aple", 5, compute)  # evicts amzn
+    assert len(cache) == 2
+    _lookup(cache, index, "amzn", 5, compute)
+    assert compute.call_count == 4
+
+    # results of another index version are never reused
+    _lookup(cache, index, "aapl", 5, compute, version=2)
+    assert compute.call_count == 5
+
+
+def test_entries_are_bounded_by_bytes():
+    index = _index()
+    cache = TypeaheadCache(max_entries=100, max_bytes=1000, name="typeahead_test")
+    for prefix in ("a", "aa", "aap", "aapl", "am", "amz", "amzn", "ap", "app", "apl"):
+        _lookup(cache, index, prefix, 5)
+    assert 0 < cache.bytes <= 1000
+    assert len(cache) < 10